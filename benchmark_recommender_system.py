@@ -0,0 +1,707 @@
+"""
+Benchmark of the k-nearest neighbours recommender system
+Times every stage of the pipeline (create_utility_matrix, adjust_ratings,
+k_nearest_neighbours, list_of_movies_user_id_has_not_seen,
+average_rating_of_movies_user_has_not_seen and create_recommendation_list)
+on the bundled ratings and on synthetic ratings of any size. Every scale
+runs in its own process so its peak memory is not mixed with the others.
+On Linux the peak memory is reset before every stage, so peak_rss_mb is
+the peak of that stage. Elsewhere it can not be reset and peak_rss_mb is
+the peak of the process so far.
+The results are saved as JSON and can be compared with an earlier run
+to catch regressions. For example:
+
+    python benchmark_recommender_system.py --scales bundled 1000000
+        --output new.json --baseline old.json
+
+With --compare-formats it times loading the .csv files against loading
+the column files written by convert_to_columns instead, and with 
+--compare-batching it load tests AsyncRecommender with many clients at
+once, answering every request on its own and in batches. Every run also 
+times importing the recommender_system package in a new interpreter.
+
+    python benchmark_recommender_system.py --compare-batching
+        --requests 500 --concurrency 32
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+import recommender_system as recommender
+from recommender_system import ratings_files
+
+try:
+    import resource
+except ImportError:
+    resource=None
+
+# the files Linux reads the peak resident memory from and resets it with
+STATUS_FILE_NAME='/proc/self/status'
+CLEAR_REFS_FILE_NAME='/proc/self/clear_refs'
+
+# the directory of the recommender_system package and the bundled files
+REPOSITORY_DIRECTORY=os.path.dirname(os.path.abspath(__file__))
+
+# the share of each half star rating in the bundled ratings
+RATING_VALUES=np.arange(1,11)/2
+RATING_SHARES=np.array([0.0136,0.0279,0.0178,0.0749,0.055,\
+                        0.1988,0.1303,0.266,0.0848,0.131])
+
+GENRES=['Action','Adventure','Animation','Children','Comedy','Crime',\
+        'Documentary','Drama','Fantasy','Film-Noir','Horror','IMAX',\
+        'Musical','Mystery','Romance','Sci-Fi','Thriller','War','Western']
+
+# the number of ratings, users and movies of the bundled ratings, which
+# the synthetic ratings are scaled from
+BUNDLED_RATINGS=100836
+BUNDLED_USERS=610
+BUNDLED_MOVIES=9724
+
+# the number of synthetic ratings written at a time
+GENERATOR_CHUNK_SIZE=10**6
+
+def power_law_shares(number,exponent,random_generator):
+    """ Returns an array with the share of each of number items when
+    the item of rank r gets a share proportional to 1/r**exponent.
+    The ranks are shuffled so popularity does not follow the id
+
+    Args:
+        number: integer of how many items there are
+
+        exponent: float of how fast popularity falls with rank
+
+        random_generator: numpy random Generator
+    """
+
+    shares=1/np.arange(1,number+1)**exponent
+
+    return random_generator.permutation(shares/shares.sum())
+
+def generate_synthetic_ratings\
+    (number_of_ratings,file_name,movie_id_file_name,seed=0,\
+     user_exponent=0.9,movie_exponent=1.1):
+    """ Writes number_of_ratings synthetic ratings to file_name and a
+    matching movie list to movie_id_file_name, in the same layout as
+    ratings_list.csv and movies_ids.csv.
+
+    The numbers of users and movies grow with the number of ratings
+    from the bundled ratings (users linearly and movies with its square
+    root). How many ratings users give and movies get follows a power
+    law, and the ratings follow the share of each half star in the
+    bundled ratings. The ratings are written a chunk at a time so any
+    size fits in memory. A user can rate a movie twice, in which case
+    the last rating counts, as for the real files.
+
+    Args:
+        number_of_ratings: integer of how many ratings to write
+
+        file_name: string for the ratings file name
+
+        movie_id_file_name: string for the movie id file name
+
+        seed: integer for the random numbers
+
+        user_exponent, movie_exponent: floats of how fast the number of
+        ratings falls with the rank of a user and a movie
+    """
+
+    random_generator=np.random.default_rng(seed)
+
+    # gets the number of users and movies for this many ratings
+    scale=number_of_ratings/BUNDLED_RATINGS
+    number_of_users=max(2,int(BUNDLED_USERS*scale))
+    number_of_movies=max(2,int(BUNDLED_MOVIES*scale**0.5))
+
+    user_shares=power_law_shares(number_of_users,user_exponent,\
+                                 random_generator)
+    movie_shares=power_law_shares(number_of_movies,movie_exponent,\
+                                  random_generator)
+
+    # writes the movie list with made up titles and genres
+    pd.DataFrame({'movieId':np.arange(1,number_of_movies+1),\
+                  'title':['Movie %d (%d)'%(movie_id,1950+movie_id%70)\
+                           for movie_id in range(1,number_of_movies+1)],\
+                  'genres':['|'.join(random_generator.choice\
+                           (GENRES,random_generator.integers(1,4),\
+                            replace=False))\
+                           for movie_id in range(number_of_movies)]}).\
+        to_csv(movie_id_file_name,index=False)
+
+    # writes the ratings a chunk at a time
+    for start in range(0,number_of_ratings,GENERATOR_CHUNK_SIZE):
+
+        size=min(GENERATOR_CHUNK_SIZE,number_of_ratings-start)
+
+        pd.DataFrame({'userId':random_generator.choice\
+                      (number_of_users,size,p=user_shares)+1,\
+                      'movieId':random_generator.choice\
+                      (number_of_movies,size,p=movie_shares)+1,\
+                      'rating':random_generator.choice\
+                      (RATING_VALUES,size,p=RATING_SHARES/RATING_SHARES.sum()),\
+                      'timestamp':random_generator.integers\
+                      (828124615,1537799250,size)}).\
+            to_csv(file_name,mode='w' if start==0 else 'a',\
+                   header=start==0,index=False)
+
+def reset_peak_memory():
+    """ Resets the peak resident memory of this process to its current
+    resident memory. Returns True if it was reset, which only Linux
+    can do, and False otherwise
+    """
+
+    try:
+
+        with open(CLEAR_REFS_FILE_NAME,'w') as file:
+
+            file.write('5')
+
+    except OSError:
+
+        return False
+
+    return True
+
+def peak_memory_mb():
+    """ Returns the peak resident memory of this process in megabytes
+    since reset_peak_memory last reset it, or since the process started
+    where it can not be reset, or None where it can not be read
+    """
+
+    # Linux keeps the peak that reset_peak_memory resets in VmHWM
+    try:
+
+        with open(STATUS_FILE_NAME) as file:
+
+            for line in file:
+
+                if line.startswith('VmHWM:'):
+
+                    return int(line.split()[1])/2**10
+
+    except OSError:
+
+        pass
+
+    if resource is None:
+
+        return None
+
+    peak=resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    # macOS gives bytes and Linux kilobytes
+    if sys.platform=='darwin':
+
+        return peak/2**20
+
+    return peak/2**10
+
+def time_stage(results,stage,items,function,*args):
+    """ Returns the value of function(*args) after adding to results the
+    wall time, the number of items per second and the peak memory while
+    it ran, which is the peak of the process so far where the peak can
+    not be reset
+
+    Args:
+        results: list of dictionaries with the results of the stages
+
+        stage: string for the name of the stage
+
+        items: integer of how many items (ratings or users) the stage
+        works on
+
+        function: the function to time
+
+        args: the arguments of function
+    """
+
+    reset_peak_memory()
+
+    start_time=time.perf_counter()
+    value=function(*args)
+    seconds=time.perf_counter()-start_time
+
+    results.append({'stage':stage,'seconds':seconds,'items':items,\
+                    'items_per_second':items/seconds if seconds>0 else None,\
+                    'peak_rss_mb':peak_memory_mb()})
+
+    return value
+
+def benchmark_import():
+    """ Returns a dictionary with the time it takes to import the
+    recommender_system package in a new interpreter, which does not
+    import numpy, pandas or scipy until they are needed
+    """
+
+    output=subprocess.run\
+        ([sys.executable,'-c','import time; start_time=time.perf_counter(); '\
+          'import recommender_system; '\
+          'print(time.perf_counter()-start_time)'],\
+         cwd=REPOSITORY_DIRECTORY,check=True,capture_output=True,\
+         text=True).stdout
+    seconds=float(output)
+
+    return {'stage':'import recommender_system','seconds':seconds,\
+            'items':1,'items_per_second':1/seconds,\
+            'peak_rss_mb':None}
+
+def benchmark_scale\
+    (file_name,movie_id_file_name,number_of_users,sparse_matrix,\
+     number_of_workers,highest_rating=5,k_nearest=10,\
+     minimum_movies_both_users_have_to_watch=1,weight_on_taste=0.2,\
+     weigh_by_popularity=True,seed=0,compact_matrix=False):
+    """ Returns a list of dictionaries with the results of every stage of
+    the pipeline on the ratings in file_name. The stages that recommend
+    to a user are run for number_of_users users drawn at random and
+    their times are added up
+
+    Args:
+        file_name: string for the ratings file name
+
+        movie_id_file_name: string for the movie id file name
+
+        number_of_users: integer of how many users to recommend to
+
+        sparse_matrix: boolean which says whether the utility matrix is
+        sparse
+
+        number_of_workers: integer of how many processes recommend to
+        the users in the recommend_parallel stage. The stage is skipped
+        if it is 1 or less
+
+        highest_rating, k_nearest, minimum_movies_both_users_have_to_watch,
+        weight_on_taste, weigh_by_popularity: the parameters of the
+        recommender system
+
+        seed: integer for drawing the users
+
+        compact_matrix: boolean which says whether the adjusted utility
+        matrix is made compact before recommending, which is then also
+        timed
+    """
+
+    results=[]
+
+    # gets the number of ratings without counting the header
+    with open(file_name) as file:
+
+        number_of_ratings=sum(1 for line in file)-1
+
+    utility_matrix,user_index_to_id,movie_index_to_id,\
+        user_id_to_index,movie_id_to_index=time_stage\
+        (results,'create_utility_matrix',number_of_ratings,\
+         recommender.create_utility_matrix,file_name,highest_rating,\
+         True,sparse_matrix)
+
+    utility_matrix=time_stage\
+        (results,'adjust_ratings',number_of_ratings,\
+         recommender.adjust_ratings,utility_matrix,highest_rating)
+
+    # checks if the matrix should be compact
+    if compact_matrix:
+
+        utility_matrix=time_stage\
+            (results,'create_compact_utility_matrix',number_of_ratings,\
+             recommender.create_compact_utility_matrix,utility_matrix,\
+             highest_rating)
+
+    # draws the users to recommend to
+    user_ids=np.random.default_rng(seed).choice\
+        (list(user_index_to_id.values()),\
+         min(number_of_users,len(user_index_to_id)),replace=False).tolist()
+
+    # reads the movie catalogue before timing so every stage is timed
+    # on its own
+    recommender.get_movie_catalogue(movie_id_file_name)
+
+    stages={'k_nearest_neighbours':0,\
+            'list_of_movies_user_id_has_not_seen':0,\
+            'average_rating_of_movies_user_has_not_seen':0,\
+            'create_recommendation_list':0}
+    stage_results=[]
+
+    # loops over the users and adds up the time of every stage
+    for user_id in user_ids:
+
+        k_nearest_dict=time_stage\
+            (stage_results,'k_nearest_neighbours',1,\
+             recommender.k_nearest_neighbours,utility_matrix,\
+             user_index_to_id,k_nearest,user_id,highest_rating,\
+             minimum_movies_both_users_have_to_watch,weight_on_taste,\
+             user_id_to_index)[0]
+
+        movies_user_id_has_not_seen=time_stage\
+            (stage_results,'list_of_movies_user_id_has_not_seen',1,\
+             recommender.list_of_movies_user_id_has_not_seen,\
+             utility_matrix,user_index_to_id,movie_index_to_id,\
+             k_nearest_dict,user_id,highest_rating,user_id_to_index)
+
+        average_ratings=time_stage\
+            (stage_results,'average_rating_of_movies_user_has_not_seen',1,\
+             recommender.average_rating_of_movies_user_has_not_seen,\
+             utility_matrix,movies_user_id_has_not_seen,user_index_to_id,\
+             movie_index_to_id,k_nearest_dict,user_id,highest_rating,\
+             weigh_by_popularity)
+
+        time_stage\
+            (stage_results,'create_recommendation_list',1,\
+             recommender.create_recommendation_list,average_ratings,\
+             movie_index_to_id,movie_id_file_name)
+
+    # adds up the time of every stage over the users and keeps the
+    # highest peak memory of the stage
+    for stage in stages:
+
+        seconds=sum(result['seconds'] for result in stage_results\
+                    if result['stage']==stage)
+        peaks=[result['peak_rss_mb'] for result in stage_results\
+               if result['stage']==stage and \
+               result['peak_rss_mb'] is not None]
+
+        results.append({'stage':stage,'seconds':seconds,\
+                        'items':len(user_ids),\
+                        'items_per_second':len(user_ids)/seconds\
+                        if seconds>0 else None,\
+                        'peak_rss_mb':max(peaks) if peaks else None})
+
+    # times the whole pipeline for all the users at once
+    time_stage\
+        (results,'recommend_many',len(user_ids),\
+         lambda: list(recommender.recommend_many\
+         (utility_matrix,user_index_to_id,movie_index_to_id,user_ids,\
+          k_nearest,highest_rating,minimum_movies_both_users_have_to_watch,\
+          weight_on_taste,weigh_by_popularity,movie_id_file_name,\
+          user_id_to_index)))
+
+    # checks if the parallel driver should be timed
+    if number_of_workers>1:
+
+        time_stage\
+            (results,'recommend_parallel',len(user_ids),\
+             recommender.recommend_parallel,utility_matrix,\
+             user_index_to_id,movie_index_to_id,user_ids,k_nearest,\
+             highest_rating,minimum_movies_both_users_have_to_watch,\
+             weight_on_taste,weigh_by_popularity,movie_id_file_name,\
+             user_id_to_index,number_of_workers)
+
+    return results
+
+def benchmark_formats(file_name,movie_id_file_name):
+    """ Returns a list of dictionaries with the time it takes to load the
+    ratings and the movies from the .csv files and from column files, 
+    and to build the utility matrix from each. The column files are 
+    written first, and the time that takes is also given
+
+    Args:
+        file_name: string for the ratings file name
+
+        movie_id_file_name: string for the movie id file name
+    """
+
+    results=[]
+
+    # gets the number of ratings and movies without counting the header
+    with open(file_name) as file:
+
+        number_of_ratings=sum(1 for line in file)-1
+
+    with open(movie_id_file_name) as file:
+
+        number_of_movies=sum(1 for line in file)-1
+
+    # reads every column into memory, including the memory-mapped ones
+    def load_all(name):
+
+        return {column:np.array(values) for column,values in\
+                recommender.read_columns(name).items()}
+
+    for file_format in ['csv','columns']:
+
+        # checks if the column files should be written first
+        if file_format=='columns':
+
+            time_stage(results,'convert_to_columns',number_of_ratings,\
+                       recommender.convert_to_columns,file_name)
+            recommender.convert_to_columns(movie_id_file_name)
+
+        ratings_files.USE_COLUMN_FILES=file_format=='columns'
+
+        time_stage(results,'load_ratings (%s)'%file_format,\
+                   number_of_ratings,load_all,file_name)
+        time_stage(results,'load_movies (%s)'%file_format,\
+                   number_of_movies,load_all,movie_id_file_name)
+        time_stage(results,'create_utility_matrix (%s)'%file_format,\
+                   number_of_ratings,recommender.create_utility_matrix,\
+                   file_name,5,False,True)
+
+    return results
+
+def benchmark_batching\
+    (file_name,movie_id_file_name,number_of_requests,concurrency,seed=0):
+    """ Returns a list of dictionaries with the requests per second and
+    the p50 and p99 latency in milliseconds of an AsyncRecommender that
+    concurrency clients send number_of_requests requests to, for users
+    drawn at random. Every request is answered on its own and then in
+    batches, with and without the tables of create_user_statistics. The
+    cache is turned off so every request is computed
+
+    Args:
+        file_name: string for the ratings file name
+
+        movie_id_file_name: string for the movie id file name
+
+        number_of_requests: integer of how many requests to send
+
+        concurrency: integer of how many clients send requests at once
+
+        seed: integer for drawing the users
+    """
+
+    results=[]
+
+    # sends the requests from concurrency clients, each sending the next
+    # one as soon as it got its answer
+    async def load_test(async_recommender,user_ids):
+
+        await async_recommender.load()
+
+        requests=iter(user_ids)
+        latencies=[]
+
+        async def client():
+
+            for user_id in requests:
+
+                start_time=time.perf_counter()
+                await async_recommender.recommend(user_id)
+                latencies.append(time.perf_counter()-start_time)
+
+        start_time=time.perf_counter()
+        await asyncio.gather(*[client() for client_number \
+                               in range(concurrency)])
+
+        return [time.perf_counter()-start_time,latencies]
+
+    for use_user_statistics in [False,True]:
+
+        model=recommender.Recommender\
+            (file_name,movie_id_file_name,\
+             use_user_statistics=use_user_statistics,cache_size=0).load()
+
+        user_ids=np.random.default_rng(seed).choice\
+            (list(model.user_index_to_id.values()),\
+             number_of_requests).tolist()
+
+        for batching in [False,True]:
+
+            async_recommender=recommender.AsyncRecommender\
+                (model,batching=batching)
+            reset_peak_memory()
+            seconds,latencies=asyncio.run\
+                (load_test(async_recommender,user_ids))
+            async_recommender.close()
+
+            stats=async_recommender.stats()
+            p50,p99=(np.percentile(latencies,[50,99])*1000).tolist()
+
+            results.append({'stage':'async recommend (%s, %s)'%\
+                            ('batched' if batching else 'one at a time',\
+                             'statistics' if use_user_statistics else \
+                             'full scan'),\
+                            'seconds':seconds,'items':number_of_requests,\
+                            'items_per_second':number_of_requests/seconds,\
+                            'peak_rss_mb':peak_memory_mb(),\
+                            'p50_ms':p50,'p99_ms':p99,\
+                            'mean_batch_size':stats['batched_requests']/\
+                            stats['batches'] if stats['batches'] else None})
+
+    return results
+
+def scale_files(scale,data_directory,seed):
+    """ Returns the ratings and movie id file names of scale, which is
+    'bundled' for the bundled files or a number of synthetic ratings.
+    The synthetic files are generated the first time they are needed
+
+    Args:
+        scale: string with 'bundled' or the number of ratings
+
+        data_directory: string of the directory of the synthetic files
+
+        seed: integer for the random numbers
+    """
+
+    if scale=='bundled':
+
+        return [os.path.join(REPOSITORY_DIRECTORY,'ratings_list.csv'),\
+                os.path.join(REPOSITORY_DIRECTORY,'movies_ids.csv')]
+
+    file_name=os.path.join(data_directory,'ratings_%s_%d.csv'%(scale,seed))
+    movie_id_file_name=os.path.join\
+        (data_directory,'movies_%s_%d.csv'%(scale,seed))
+
+    # checks if the files still need to be generated
+    if not os.path.exists(file_name):
+
+        os.makedirs(data_directory,exist_ok=True)
+        generate_synthetic_ratings\
+            (int(scale),file_name,movie_id_file_name,seed)
+
+    return [file_name,movie_id_file_name]
+
+def compare_results(results,baseline_results,tolerance):
+    """ Returns a list of dictionaries for the stages that are slower
+    than in baseline_results by more than tolerance (0.2 is 20%)
+
+    Args:
+        results: list of dictionaries with the results of this run
+
+        baseline_results: list of dictionaries with earlier results
+
+        tolerance: float of how much slower a stage can be
+    """
+
+    # finds the earlier seconds of every scale and stage
+    baseline_seconds={(result['scale'],result['sparse'],\
+                       result.get('compact',False),result['stage']):\
+                      result['seconds'] for result in baseline_results}
+
+    regressions=[]
+
+    for result in results:
+
+        key=(result['scale'],result['sparse'],result.get('compact',False),\
+             result['stage'])
+
+        # checks if the stage got slower
+        if key in baseline_seconds and baseline_seconds[key]>0 and \
+            result['seconds']>baseline_seconds[key]*(1+tolerance):
+
+            regressions.append({'scale':result['scale'],\
+                                'stage':result['stage'],\
+                                'baseline_seconds':baseline_seconds[key],\
+                                'seconds':result['seconds']})
+
+    return regressions
+
+def main():
+    """ Runs the benchmark from the command line """
+
+    parser=argparse.ArgumentParser\
+        (description='Benchmark every stage of the recommender system.')
+    parser.add_argument('--scales',nargs='+',default=['bundled'],\
+        help="'bundled' and/or numbers of synthetic ratings")
+    parser.add_argument('--users',type=int,default=20,\
+        help='number of users to recommend to at every scale')
+    parser.add_argument('--dense',action='store_true',\
+        help='use the dense utility matrix instead of the sparse one')
+    parser.add_argument('--compact',action='store_true',\
+        help='make the utility matrix compact after adjusting it')
+    parser.add_argument('--workers',type=int,default=1,\
+        help='number of processes for the recommend_parallel stage')
+    parser.add_argument('--seed',type=int,default=0)
+    parser.add_argument('--data-directory',default='benchmark_data',\
+        help='directory for the synthetic ratings')
+    parser.add_argument('--output',default='benchmark_results.json',\
+        help='file to save the results in')
+    parser.add_argument('--baseline',\
+        help='earlier results to compare with')
+    parser.add_argument('--tolerance',type=float,default=0.2,\
+        help='how much slower a stage can be than the baseline')
+    parser.add_argument('--compare-formats',action='store_true',\
+        help='compare loading the .csv files with loading column files, '\
+        'which are written next to them')
+    parser.add_argument('--compare-batching',action='store_true',\
+        help='load test answering concurrent requests one at a time and '\
+        'in batches')
+    parser.add_argument('--requests',type=int,default=500,\
+        help='number of requests of the load test')
+    parser.add_argument('--concurrency',type=int,default=32,\
+        help='number of clients of the load test')
+    parser.add_argument('--run-scale',nargs=2,\
+        metavar=('FILE_NAME','MOVIE_ID_FILE_NAME'),help=argparse.SUPPRESS)
+    arguments=parser.parse_args()
+
+    # checks if this process runs a single scale for the main process
+    if arguments.run_scale:
+
+        # checks if the file formats are compared instead of the stages
+        if arguments.compare_formats:
+
+            results=benchmark_formats(*arguments.run_scale)
+
+        # checks if batching requests is load tested instead
+        elif arguments.compare_batching:
+
+            results=benchmark_batching\
+                (arguments.run_scale[0],arguments.run_scale[1],\
+                 arguments.requests,arguments.concurrency,arguments.seed)
+
+        else:
+
+            results=[benchmark_import()]+benchmark_scale\
+                (arguments.run_scale[0],arguments.run_scale[1],\
+                 arguments.users,not arguments.dense,arguments.workers,\
+                 seed=arguments.seed,compact_matrix=arguments.compact)
+
+        json.dump(results,sys.stdout)
+
+        return
+
+    results=[]
+
+    # runs every scale in its own process
+    for scale in arguments.scales:
+
+        file_name,movie_id_file_name=scale_files\
+            (scale,arguments.data_directory,arguments.seed)
+
+        output=subprocess.run\
+            ([sys.executable,os.path.abspath(__file__),'--run-scale',\
+              file_name,movie_id_file_name,'--users',str(arguments.users),\
+              '--workers',str(arguments.workers),'--seed',\
+              str(arguments.seed)]+(['--dense'] if arguments.dense else [])+\
+             (['--compare-formats'] if arguments.compare_formats else [])+\
+             (['--compare-batching','--requests',str(arguments.requests),\
+               '--concurrency',str(arguments.concurrency)] \
+              if arguments.compare_batching else [])+\
+             (['--compact'] if arguments.compact else []),\
+             check=True,capture_output=True,text=True).stdout
+
+        # keeps the last line, which is the JSON of the results
+        for result in json.loads(output.strip().splitlines()[-1]):
+
+            result.update({'scale':scale,'sparse':not arguments.dense,\
+                           'compact':arguments.compact})
+            results.append(result)
+
+    print(pd.DataFrame(results)[['scale','stage','seconds','items',\
+        'items_per_second','peak_rss_mb']].to_string(index=False))
+
+    with open(arguments.output,'w') as file:
+
+        json.dump(results,file,indent=1)
+
+    # checks if the results should be compared with earlier ones
+    if arguments.baseline:
+
+        with open(arguments.baseline) as file:
+
+            regressions=compare_results\
+                (results,json.load(file),arguments.tolerance)
+
+        if regressions:
+
+            print('\nSlower than the baseline:')
+            print(pd.DataFrame(regressions).to_string(index=False))
+            sys.exit(1)
+
+if __name__=='__main__':
+
+    main()
@@ -8,487 +8,33 @@ in adjusted ratings of each user from user_id and the number
 of movies both of them saw. Then, the system takes all the movies 
 user_id has not seen and weighs them their average rating and 
 by the number of k most similar other users who saw them
+
+The functions are in the recommender_system package, and this script
+runs them one step at a time for user_id with the knobs below. 
+Recommender in the package keeps the same model in memory, and 
+python -m recommender_system recommends from the command line
 """
 
 import pandas as pd
-import numpy as np
-import copy
-
-def create_utility_matrix(file_name,highest_rating):
-    """ Returns an array utility_matrix with user id 
-    (represented as an index number) for the rows and movie id 
-    (represented as an index number) for the columns. 
-    Each cell in utility_matrix is a user rating of a specific movie. 
-    Also returns dictionaries user_index_to_id and movie_index_to_id
-    which map a user_index in the matrix to their id and a movie index
-    in the matrix to their id.
-        
-    Args:
-        file_name: string used to read the .csv file
-        
-        highest_rating: float which is the highest possible rating
-        a user can give a movie
-    """
-    
-    # gets the file as a DataFrame
-    df=pd.read_csv(file_name)
-        
-    # creates a dictionary mapping indeces to id's
-    user_index_to_id={}
-    movie_index_to_id={}
-    
-    # keeps track of the key that will be used in the matrix
-    count_user_index=0
-    count_movie_index=0
-    
-    # iterating over all the rows in df to find the number of
-    # user_ids and number of movie_ids which are important for knowing
-    # the utility matrix dimensions
-    for key, row in df.iterrows():
-                
-        # checks if user_id is already in the dictionary
-        if row[0] not in user_index_to_id.values():
-            
-            # adds row[0] to the dictionary and the key is just a count-up           
-            user_index_to_id[str(count_user_index)]=row[0]
-            
-            # raises the count by 1
-            count_user_index+=1
-                        
-        # checks if movie_id is a value in the dictionary
-        if row[1] not in movie_index_to_id.values():
-            
-            # adds row[1] to the dictionary and the key is just a count-up
-            movie_index_to_id[str(count_movie_index)]=row[1]
-                        
-            count_movie_index+=1        
-        
-    # initializes the utility matrix with all cells equal to 20*highest_rating
-    utility_matrix=np.ones((count_user_index,count_movie_index))*\
-        -(20*highest_rating)
-                            
-    # keeps track of the indeces of df
-    count_index=0
-        
-    # iterating over all the rows in df
-    for key, row in df.iterrows():
-                
-        # finds the row of the curernt index
-        index_1=df.iloc[count_index]
-                   
-        # increases count_index by 1
-        count_index+=1
-        
-        # gets the user and movie indeces based on the id of the
-        # user and movie from df
-        user_index=int(list(user_index_to_id.keys())\
-                   [list(user_index_to_id.values()).index(index_1[0])])
-        movie_index=int(list(movie_index_to_id.keys())\
-                    [list(movie_index_to_id.values()).index(index_1[1])])
-        
-        # gives the value of the rating associated with
-        # the cell in df to the utility matrix at indeces user_index
-        # and movie_index
-        utility_matrix[user_index,movie_index]=\
-            float(index_1[2])
-        
-    return [utility_matrix,user_index_to_id,movie_index_to_id]
-
-def adjust_ratings(utility_matrix,highest_rating):
-    """ Returns updated array called utility_matrix which adjusts the ratings
-    of a user up if they never rated any movie a 5. So for instance,
-    of the highest rating is 4 and the highest rating possible is 5,
-    then all ratings are raised by 1
-    
-    Args:
-        utility_matrix: an array of preferences for users and movies
-        
-        highest_rating: float which is the highest rating possible
-    """
-    
-    # loops over all the rows in the matrix
-    for row in range(len(utility_matrix)):
-        
-        # adjusts the ratings of the current row
-        # by adding the highest rating possible and subtracting the 
-        # highest the user has ranked
-        utility_matrix[row,:]=utility_matrix[row,:]+\
-            highest_rating-np.amax(utility_matrix[row,:])
-            
-    utility_matrix[utility_matrix<-16*highest_rating]=-20*highest_rating
-                        
-    return utility_matrix
-                    
-def k_nearest_neighbours\
-    (utility_matrix,user_index_to_id,k_nearest,user_id,highest_rating,\
-     minimum_movies_both_users_have_to_watch,weight_on_taste):
-    """ Returns a list called k_nearest_dict, which lists the
-    users who have the most overlapping preferences with user_id,
-    whom we are recommending movies to.
-    It also returns an array with the number of movies
-    each k nearest neighbours saw that user_id also saw
-    
-    Args:
-        utility_matrix: array of preferences for users and movies
-        
-        user_index_to_id: array that maps user index to user_id
-        
-        k_nearest: integer which is telling us how 
-        
-        many neighbours to look for with similar preferences
-        
-        user_id: integer of the user_id we are recommending to   
-        
-        highest_rating: float that indicates what is the highest possbile 
-        movie rating
-        
-        minimum_movies_both_users_have_to_watch: integer of how
-        many movies both user have to watch to consider adding the user
-        as a nearest neighbour
-        
-        weight_on_taste: float between 0 and 1 which determines the
-        amount of weight the code puts on how similar the taste is for
-        movies that were rated. 1-weight_on_taste is the weight on
-        the number of overlapping movies that the users watched
-    """
-    
-    # gets the user index based on the id of the user
-    user_index=int(list(user_index_to_id.keys())\
-        [list(user_index_to_id.values()).index(user_id)])
-    
-    # creates a dictionary with user_index as key and with value that is the
-    # distance in movie preferences
-    k_nearest_dict={}
-    k_nearest_array=np.ones(k_nearest)*10000000000
-    k_nearest_index_array=np.ones(k_nearest)*-1
-    k_nearest_overlap_array=np.zeros(k_nearest)
-    
-    # loops over all the rows in utility_matrix
-    for row in range(len(utility_matrix)):
-                
-        # checks if the user_id is different than the one given
-        if row!=user_index:
-                
-            # gets the row for the user_id we are interested in
-            user_preferences=\
-                copy.deepcopy(utility_matrix[user_index,:])
-                                       
-            user_preferences[user_preferences>=0]=1
-                        
-            # sets all the cells that are greater than 90 to 0
-            # these are movies that user_index has the not seen
-            user_preferences[user_preferences<-16*highest_rating]=0
-                        
-            # gets the user preferences 
-            user_compared_preferences=\
-                copy.deepcopy(utility_matrix[row,:])
-           
-            user_compared_preferences\
-                [user_compared_preferences>=0]=1
-            
-            # sets all the cells that are less than -90 to 0
-            # these are movies that row had the not seen
-            # but the other user has
-            user_compared_preferences\
-                [user_compared_preferences<-16*highest_rating]=0
-            
-            # counts the number of overlaps
-            number_of_movies_both_saw=\
-                np.sum((user_compared_preferences!=0) & \
-                       (user_preferences!=0))
-                                                
-            # gets the row for the user_id we are interested in
-            user_preferences=\
-                copy.deepcopy(utility_matrix[user_index,:])
-            
-            # gets the user preferences 
-            user_compared_preferences=\
-                copy.deepcopy(utility_matrix[row,:])
-            
-            # subtracts one vector from another
-            distance=np.subtract\
-                (user_preferences,user_compared_preferences)
-             
-            # excludes the movies without overlap                         
-            distance[distance<-16*highest_rating]=0
-            distance[distance>16*highest_rating]=0
-                                    
-            # measures the distance in preferences
-            distance_scalar=np.sum(list(np.array(distance)**2))
-                                                
-            # checks if both users saww any of the same movies
-            if number_of_movies_both_saw>0: 
-            
-                objective_function=\
-                    weight_on_taste*(1-1/(1+distance_scalar))+\
-                    (1-weight_on_taste)*(1/(1+number_of_movies_both_saw))
-                    
-            else:
-                
-                objective_function=max(k_nearest_array)+1.0
-            
-            # finds the location of the minimum point
-            loc=np.argmax(k_nearest_array)
-                                
-            # checks if the distance/number_of_movies_both_saw
-            # is greater than the minimum value in the array
-            # and if they had any overlap
-            if objective_function<\
-                max(k_nearest_array) and \
-                number_of_movies_both_saw>\
-                minimum_movies_both_users_have_to_watch:
-                
-                # finds the location of the minimum point
-                loc=np.argmax(k_nearest_array)
-                
-                # replaces the minimum with the current distance in taste
-                k_nearest_array[loc]=\
-                    objective_function
-                
-                # saves the index of the user in the array by
-                # replacing the index of the user with the least 
-                # overlaps with the user of interest
-                k_nearest_index_array[loc]=\
-                    row
-                    
-                k_nearest_overlap_array[loc]=\
-                    number_of_movies_both_saw
-                                                                               
-    # loops over the number of nearest neighbours
-    for index in range(len(k_nearest_index_array)):
-        
-        # checke that there was a neighbour to look at
-        if k_nearest_index_array[index]!=-1:
-          
-            # adds to the dictionary the index as key and the values
-            # are the number of overlaps
-            k_nearest_dict\
-                [k_nearest_index_array[index]]=\
-                k_nearest_array[index]
-          
-    return [k_nearest_dict,k_nearest_overlap_array]
-                
-def list_of_movies_user_id_has_not_seen\
-    (utility_matrix,user_index_to_id,movie_index_to_id,
-     k_nearest,user_id,highest_rating):
-    """ Returns a list called movies_user_id_hasnt_seen 
-    which lists the movie indeces that the k_nearest neighbours saw,
-    but user_id did not
-    
-    Args:
-        utility_matrix: array with user index and movie index for movie preferences
-        
-        user_index_to_id: dictionary that maps user_index to user_id
-        
-        movie_index_to_id: dictionary that maps movie_index to movie_id
-        
-        k_nearest: dictionary of the overlapping movies
-        
-        user_id: integer of the id of the user we are recommending movies to
-        
-        highest_rating: the highest possible rating for a movie
-    """
-    
-    # initiates the list
-    movies_user_id_hasnt_seen=[]
-    
-    # gets the user index for keys that are equal to user_id
-    user_index=int(list(user_index_to_id.keys())\
-               [list(user_index_to_id.values()).index(user_id)])
-    
-    # gets the preferences of the user with user_id
-    user_preferences=copy.deepcopy(utility_matrix[user_index,:])
-    
-    # loops over all the rows in the matrix
-    for user_index in k_nearest:
-                                                   
-        # gets the user preferences 
-        user_compared_preferences=\
-            copy.deepcopy(utility_matrix[int(user_index),:])
-                
-        # adds the two vectors together
-        distance=np.subtract(user_preferences,user_compared_preferences)
-        
-        # sets all the cells that are greater than -higher_rating to 0.
-        # these are movies that user with index row had the not seen
-        distance[distance>-highest_rating]=0
-                        
-        # sets all the cells that are less than -90 to 0
-        # these are movies that user_id had the not seen
-        # but user_index has seen
-        distance[distance<-16*highest_rating]=1
-                
-        # looping the overlapped vectors
-        for movie_index in range(len(distance)):
-                
-            # checks if user_index has not seen the movie yet
-            if distance[movie_index]==1:
-                
-                # checks if the movie was already added to the
-                # list of movies user_id has not seen
-                if movie_index not in movies_user_id_hasnt_seen:
-                
-                    # adds the movie_index to the list of 
-                    # movies user_id has not yet seen but that
-                    # the k_nearest neighbours have
-                    movies_user_id_hasnt_seen.append(movie_index)
-                    
-    return movies_user_id_hasnt_seen
-
-def average_rating_of_movies_user_has_not_seen\
-    (utility_matrix,movies_user_id_hasnt_seen,user_index_to_id,\
-     movie_index_to_id,k_nearest_dict,user_id,highest_rating,\
-     weigh_by_popularity):
-    """ Returns the average rating of a movie the k_nearest neighbours gave
-    to a movie that user_id has not seen yet and someone in the 
-    k_neighbours liked
-    
-    Args:
-        utility_matrix: array of utility matrix based on user index and
-        movie index which corresponds to a rating
-        
-        movies_user_id_hasnt_seen: a list of movie_indeces that user_id
-        has not yet seen, but were seen the k_nearest neighbours
-        
-        user_index_to_id: dictionary that maps user_index to user_id
-        
-        movie_index_to_id: dictionarythat maps movie_index to movie_id
-        
-        k_nearest_dict: dictionary of k_neaerest neighbours and how
-        similar they are to user_id in their preferences over movies
-        they both saw
-                
-        user_id: integer which the id of the user we are recommending movies to
-        
-        highest_rating: flaot which is the highest rating possible for a movie
-        
-        weight_by_populariy: boolean which say whether to weight the 
-        recommendation by the amount of k_nearest neighbours who saw the movie
-    """
-    
-    # initiates a dictionary for movie_index as a kay and 
-    # average rating as a value
-    average_ratings={}
-    
-    # loops over all movie indeces that user_id has not seen
-    # and one of the k_nearest neighbours liked
-    for movie_index in movies_user_id_hasnt_seen:
-    
-        count=0
-        rating=0
-                        
-        # loops over all the k_nearest neighbours indeces
-        for user_index in k_nearest_dict:
-                                        
-            # gets the preferences of the neighbour user_index
-            user_preferences=\
-                copy.deepcopy(utility_matrix[int(user_index),:])
-                    
-            # checks if the user has seen movie_index
-            if user_preferences[int(movie_index)]!=-20*highest_rating:
-                
-                # adds the rating of the user to rating
-                rating+=user_preferences[int(movie_index)]
-                
-                # add one more count to
-                count+=1
-                
-        # compute the average rating of movie_index
-        rating=rating/count
-        
-        if (weigh_by_popularity==True) and (len(k_nearest_dict)-1)>0:
-                                
-            # adds the average rating to the list after 
-            # adjusting it to the number
-            # of neighbours who watch and the average rating
-            average_ratings[movie_index]=\
-                (rating+highest_rating*((count-1)/ \
-                (len(k_nearest_dict)-1)))/ \
-                (2*highest_rating)
-                
-        else:
-            
-            # adds the average rating to the list
-            average_ratings[movie_index]=rating
-        
-    return average_ratings
+import time
 
-def create_recommendation_list\
-    (average_ratings,movie_index_to_id,\
-    movie_id_file_name='movies_ids.csv'):
-    """ Returns sorted list top_10_movies from highest to lower 
-    of movies with their rating
-    
-    Args:
-        average_ratings: dictionary with movie_index as key 
-        and its rating as value
-        movie_index_to_id: dictionary with movie_index as key 
-        and movie_id as value
-        movie_id_file_name: string for the name of the movie_id file
-    """
-        
-    # read the movies_id and names as a DataFrame
-    movie_id_to_name=pd.read_csv(movie_id_file_name)
-    
-    # initiates the recommendation dictionary
-    recommendation_dict={}
-        
-    # loops over all average rating
-    for movie_index in average_ratings:
-                
-        # gets the movie_ide based on the movie index
-        movie_id=int(movie_index_to_id[str(int(movie_index))])
-        
-        # gets the movie info for movie id
-        movie_info=\
-             movie_id_to_name\
-             [movie_id_to_name\
-             [movie_id_to_name.columns[0]]==movie_id]
-         
-        # gets the name of the movie with movie_id
-        movie_title=movie_info[movie_info.columns[1]].values[0]
-                                  
-        # checks if the movie is not already in the recommendation list
-        if movie_title[0][0] not in recommendation_dict:
-                          
-            recommendation_dict\
-                [movie_title]=\
-                average_ratings[movie_index]
-    
-    recommendation_df=pd.DataFrame({
-            'title':list(recommendation_dict.keys()), 
-            'avg_rating': list(recommendation_dict.values())})
-    
-    top_10_movies=recommendation_df.sort_values\
-        (by='avg_rating',ascending=False).head(10)
-        
-    return top_10_movies['title'].tolist()
+from recommender_system import profiling
+from recommender_system.neighbours import APPROXIMATE_SAMPLED_MOVIES,\
+    APPROXIMATE_SHORTLIST_SIZE,approximate_k_nearest_neighbours,\
+    approximate_recall,create_co_rating_index,create_user_statistics,\
+    k_nearest_neighbours
+from recommender_system.ratings_files import convert_to_columns
+from recommender_system.recommendations import TOP_N,\
+    create_genre_index,create_recommendation_list,genre_movie_indeces,\
+    get_movie_catalogue,recommend_many,recommend_parallel,\
+    top_movies_rated_by_user_id,unseen_movie_scores
+from recommender_system.snapshots import load_model_snapshot,\
+    save_model_snapshot
+from recommender_system.time_windows import SECONDS_PER_DAY,create_time_model
+from recommender_system.utility_matrix import adjust_ratings,\
+    create_compact_utility_matrix,create_utility_matrix,\
+    stream_utility_matrix
 
-def top_movies_rated_by_user_id(user_id,file_name,movie_id_file_name):
-    """ Returns the list of top 10 rated movies by user_id
-    
-    Args:
-        user_id: integer referring to the user id
-        file_name: string for the file name
-        movie_id_file_name: string for the movie id file name    
-    """
-    
-    # reads the rating .csv file
-    df_rating=pd.read_csv(file_name)
-    
-    # get the movies sorted by ratings for user id=user_id and gives the
-    # top 10
-    user_ratings=df_rating[df_rating.userId==user_id].\
-        sort_values(by='rating',ascending=False).head(10)
-    
-    # reads the movies list into a dataframe
-    df_movies=pd.read_csv(movie_id_file_name)
-    
-    # merges the movie_ids with the titles
-    user_ratings=user_ratings.merge(df_movies[['movieId','title']])
-    
-    return user_ratings['title'].tolist()
-        
 # user_id we are recommending movies to
 user_id=99
 
@@ -512,64 +58,307 @@ movie_id_file_name='movies_ids.csv'
 # of most similar users who have watch the movie
 weigh_by_popularity=True
 
-# checks if we need to create a utility matrix
-utility_matrix_exists=False
+# the number of movies recommended
+top_n=TOP_N
+
+# the genres one of which every recommended movie has, such as ['Comedy'].
+# None recommends movies of every genre
+genres=None
+
+# the directory the adjusted utility matrix is saved in and loaded from.
+# No snapshot is used if it is None
+snapshot_directory='utility_matrix_snapshot'
+
+# checks whether to store the utility matrix as a sparse matrix, which
+# only keeps the movies each user has seen
+use_sparse_utility_matrix=False
+
+# checks whether to read the ratings file in chunks, which also makes the
+# utility matrix sparse, and how many bytes it can use. None means no limit
+use_streaming_ingestion=False
+streaming_memory_budget=None
+
+# checks whether to keep the ratings as int8 with a bitmap of the seen
+# movies once the utility matrix is built and adjusted
+use_compact_utility_matrix=False
+
+# checks whether to build the tables of create_user_statistics, so the
+# neighbours are found without comparing the rows of every user
+use_user_statistics=False
+
+# the number of days before the latest rating a rating can be given to be
+# kept in the model, and the number of days it takes the weight of a 
+# rating in the distances and scores to halve. None keeps every rating
+# with the same weight. The model is then sparse and is not compact or
+# saved as a snapshot, and with a half life the movies recommended to 
+# every user are not split between processes
+time_window_days=None
+half_life_days=None
+
+# checks whether to convert file_name and movie_id_file_name to column 
+# files, which are read instead of them from then on
+convert_files_to_columns=False
 
 # the weight to give to overlap in taste vs overlap in the number of
 # movies watched
 weight_on_taste=0.2
 
+# checks whether to also recommend movies to every user
+recommend_for_all_users=False
+
+# the number of processes used to recommend movies to every user
+number_of_workers=1
+
+# checks whether to look for the neighbours only among a shortlist of 
+# users who agree on a sample of the movies user_id saw, and how many
+# movies are sampled and users are shortlisted
+use_approximate_neighbours=False
+number_of_sampled_movies=APPROXIMATE_SAMPLED_MOVIES
+shortlist_size=APPROXIMATE_SHORTLIST_SIZE
+
+# checks whether to print the recall of the shortlist against the
+# exact neighbours
+report_approximate_recall=False
+
+# checks whether to record how long every stage takes and how many users
+# and movies the stages go through, and whether to print them as 'json'
+# or in the 'prometheus' text format
+profile_stages=False
+profile_format='json'
+
+# starts recording the stages
+if profile_stages:
+    
+    profiling.enable_profiling()
+
+# checks if the .csv files should be converted to column files
+if convert_files_to_columns:
+    
+    convert_to_columns(file_name)
+    convert_to_columns(movie_id_file_name)
+
+# checks if we need to create a utility matrix
+utility_matrix_exists=False
+
+# the streamed utility matrix is always sparse
+if use_streaming_ingestion:
+    
+    use_sparse_utility_matrix=True
+    
+# the timestamps and weights of the ratings are only kept in memory
+time_model=None
+use_time_model=time_window_days is not None or half_life_days is not None
+
+if use_time_model:
+    
+    use_sparse_utility_matrix=True
+    use_compact_utility_matrix=False
+    snapshot_directory=None
+    
+# the weights of a half life are in the tables of the statistics
+if half_life_days is not None:
+    
+    use_user_statistics=True
+
+# checks if there is a snapshot to load
+if snapshot_directory is not None:
+    
+    # calls a function that maps the utility matrix and the dictionaries
+    # from the snapshot, unless ratings_list.csv changed since it was saved
+    snapshot=load_model_snapshot\
+        (snapshot_directory,file_name,highest_rating,\
+         use_sparse_utility_matrix)
+    
+    # checks if the snapshot is up to date
+    if snapshot is not None:
+        
+        utility_matrix,user_index_to_id,movie_index_to_id,\
+            user_id_to_index,movie_id_to_index,rating_shifts=snapshot
+        
+        utility_matrix_exists=True
+
 # checks if there is a need to create utility_matrix
 if not utility_matrix_exists:
                   
-    # calls a function that creates two dictionaries mapping user index to
-    # user id and movie index to movie id and also creates an array called
-    # utility_matrix that maps user index and movie index to a rating.
-    utility_matrix,user_index_to_id,movie_index_to_id=\
-        create_utility_matrix(file_name,highest_rating)  
+    # checks if only the ratings of a window of time are kept, or they
+    # are weighted by how recent they are
+    if use_time_model:
+        
+        # calls a function that creates the same dictionaries and sparse
+        # utility_matrix as create_utility_matrix from the ratings in the
+        # window and keeps when every rating was given
+        utility_matrix,user_index_to_id,movie_index_to_id,\
+            user_id_to_index,movie_id_to_index,time_model=\
+            create_time_model\
+            (file_name,highest_rating,\
+             None if time_window_days is None \
+             else time_window_days*SECONDS_PER_DAY,\
+             None if half_life_days is None \
+             else half_life_days*SECONDS_PER_DAY)
+            
+    # checks if the ratings file should be read in chunks
+    elif use_streaming_ingestion:
+        
+        # calls a function that creates the same dictionaries and sparse
+        # utility_matrix as create_utility_matrix a chunk at a time
+        utility_matrix,user_index_to_id,movie_index_to_id,\
+            user_id_to_index,movie_id_to_index=\
+            stream_utility_matrix(file_name,highest_rating,\
+                                  return_reverse_maps=True,\
+                                  memory_budget=streaming_memory_budget,\
+                                  report_progress=True)
+            
+    else:
+        
+        # calls a function that creates two dictionaries mapping user 
+        # index to user id and movie index to movie id and also creates 
+        # an array called utility_matrix that maps user index and movie 
+        # index to a rating.
+        utility_matrix,user_index_to_id,movie_index_to_id,\
+            user_id_to_index,movie_id_to_index=\
+            create_utility_matrix(file_name,highest_rating,\
+                                  return_reverse_maps=True,\
+                                  sparse_matrix=use_sparse_utility_matrix)
         
     # calls a function that adjusts the ratings of users who never give a 
     # the highest possible rating
-    utility_matrix=\
+    utility_matrix,rating_shifts=\
         adjust_ratings\
         (utility_matrix,\
-        highest_rating)
+        highest_rating,\
+        return_shifts=True)
+    
+    # saves the utility matrix so the next run can load it
+    if snapshot_directory is not None:
+        
+        save_model_snapshot\
+            (snapshot_directory,utility_matrix,user_index_to_id,\
+             movie_index_to_id,highest_rating,file_name,rating_shifts)
                 
-# calls a function that returns a dictionary of all the user indecs and
-# distance in taste of the neighbours with the most similar tastes
-k_nearest_dict,k_nearest_overlap_array=\
-    k_nearest_neighbours\
-    (utility_matrix,user_index_to_id,\
-     k_nearest,user_id,highest_rating,\
-     minimum_movies_both_users_have_to_watch,\
-     weight_on_taste)
+# checks if the utility matrix should be compact
+if use_compact_utility_matrix:
+    
+    # calls a function that stores the ratings as int8 and which movies
+    # were seen as a bitmap
+    utility_matrix=create_compact_utility_matrix\
+        (utility_matrix,highest_rating)
+                
+# calls a function that counts the movies and adds up the ratings of 
+# every user and indexes the users who saw each movie
+user_statistics=create_user_statistics\
+    (utility_matrix,highest_rating,time_model) if use_user_statistics else None
+                
+# calls a function that indexes the movies of every genre and keeps the
+# movies of genres
+movie_indeces=None if genres is None else genre_movie_indeces\
+    (create_genre_index(get_movie_catalogue(movie_id_file_name),\
+                        movie_index_to_id),genres)
+                
+# checks if the neighbours are looked for among a shortlist only
+if use_approximate_neighbours or report_approximate_recall:
+    
+    # calls a function that indexes the users who saw each movie
+    co_rating_index=create_co_rating_index(utility_matrix,highest_rating)
+
+# checks if the neighbours are looked for among a shortlist only
+if use_approximate_neighbours:
+    
+    # calls a function that returns the same dictionary as 
+    # k_nearest_neighbours, but only compares user_id with a shortlist 
+    # of users
+    k_nearest_dict,k_nearest_overlap_array=\
+        approximate_k_nearest_neighbours\
+        (utility_matrix,user_index_to_id,co_rating_index,\
+         k_nearest,user_id,highest_rating,\
+         minimum_movies_both_users_have_to_watch,\
+         weight_on_taste,user_id_to_index,\
+         number_of_sampled_movies,shortlist_size)
+    
+else:
+    
+    # calls a function that returns a dictionary of all the user indecs and
+    # distance in taste of the neighbours with the most similar tastes
+    k_nearest_dict,k_nearest_overlap_array=\
+        k_nearest_neighbours\
+        (utility_matrix,user_index_to_id,\
+         k_nearest,user_id,highest_rating,\
+         minimum_movies_both_users_have_to_watch,\
+         weight_on_taste,user_id_to_index,\
+         user_statistics)
+
+# checks if the recall of the shortlist should be reported
+if report_approximate_recall:
+    
+    # calls a function that compares the approximate neighbours with the
+    # exact ones of every user for a few shortlist settings
+    approximate_recall_report=pd.DataFrame\
+        ([approximate_recall\
+          (utility_matrix,user_index_to_id,co_rating_index,k_nearest,\
+           highest_rating,minimum_movies_both_users_have_to_watch,\
+           weight_on_taste,None,user_id_to_index,\
+           sampled_movies,shortlist)\
+          for sampled_movies,shortlist in [(16,50),(64,100),(128,200)]])
+    
+    print(approximate_recall_report.to_string())
         
-# calls a function that  finds all the movies that the k_nearest neighbours
-# saw but the user_id has not
-movies_user_id_has_not_seen=\
-    list_of_movies_user_id_has_not_seen\
+# calls a function that finds all the movies that the k_nearest neighbours
+# saw but the user_id has not and calculates their average ratings,
+# which can be based also on how many neighbours saw it
+movies_user_id_has_not_seen,average_ratings=\
+    unseen_movie_scores\
     (utility_matrix,user_index_to_id,\
-    movie_index_to_id,k_nearest_dict,user_id,\
-    highest_rating)
-              
-# calls a function that calculates the average ratings of
-# all the movies the user has not seen which can be based also
-# on how many neighbours saw it
-average_ratings=\
-    average_rating_of_movies_user_has_not_seen\
-    (utility_matrix,movies_user_id_has_not_seen,\
-    user_index_to_id,movie_index_to_id,\
     k_nearest_dict,user_id,highest_rating,\
-    weigh_by_popularity)
+    weigh_by_popularity,user_id_to_index,\
+    time_model,movie_indeces)
     
 # generates the recommeded movies sorted by highest ratings to lowest ratings
 recommendation_list=\
     create_recommendation_list\
     (average_ratings,\
     movie_index_to_id,\
-    movie_id_file_name)
+    movie_id_file_name,\
+    top_n=top_n)
     
 # calls a function that gives back the top 10 rated movies
 # of user_id
 top_10_list=top_movies_rated_by_user_id\
     (user_id,file_name,movie_id_file_name)
+
+# checks if we need to recommend movies to every user
+if recommend_for_all_users:
+    
+    start_time=time.perf_counter()
+    
+    # checks if the users should be split between processes, which do 
+    # not weigh the ratings
+    if number_of_workers>1 and half_life_days is None:
+        
+        # calls a function that recommends movies to all the users 
+        # with a pool of processes
+        all_recommendations=dict(recommend_parallel\
+            (utility_matrix,user_index_to_id,movie_index_to_id,\
+             list(user_index_to_id.values()),k_nearest,highest_rating,\
+             minimum_movies_both_users_have_to_watch,weight_on_taste,\
+             weigh_by_popularity,movie_id_file_name,user_id_to_index,\
+             number_of_workers,top_n=top_n,movie_indeces=movie_indeces))
+        
+    else:
+        
+        # calls a function that recommends movies to all the users at 
+        # once and keeps them in a dictionary with user_id as key
+        all_recommendations=dict(recommend_many\
+            (utility_matrix,user_index_to_id,movie_index_to_id,\
+             list(user_index_to_id.values()),k_nearest,highest_rating,\
+             minimum_movies_both_users_have_to_watch,weight_on_taste,\
+             weigh_by_popularity,movie_id_file_name,user_id_to_index,\
+             top_n=top_n,user_statistics=user_statistics,\
+             movie_indeces=movie_indeces))
+        
+    # keeps how long it took to recommend movies to every user
+    all_recommendations_seconds=time.perf_counter()-start_time
+
+# prints how long every stage took and the items it went through
+if profile_stages:
+    
+    print(profiling.profiler.to_prometheus() \
+          if profile_format=='prometheus' else profiling.profiler.to_json())
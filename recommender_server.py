@@ -0,0 +1,485 @@
+"""
+Recommendation server for the k-nearest neighbours recommender system
+Loads a Recommender once at startup (from the snapshot when it is up to
+date) and answers requests such as
+
+    GET /recommend?user_id=99&k=10&weight_on_taste=0.2
+
+with the list of recommended movie titles as JSON. The other knobs of the
+script can be given as minimum, weigh_by_popularity and approximate, the
+number of titles as n and the genres the titles can have, separated by
+commas, as genre. Requests for the same user and knobs that
+arrive while one is being computed wait for it and share its result.
+GET /stats gives the number of requests, how many failed and were 
+coalesced, the p50 and p99 latency of the latest ones and the counters
+of the cache of recommendations. A request that fails is answered with
+a 500 error.
+When the server is started with --profile, GET /metrics gives how long
+every stage of the recommender system took and how many users and
+movies it went through in the Prometheus text format, and /stats
+gives them as well.
+
+    python recommender_server.py --port 8000 --profile
+    python recommender_server.py --load-test 500 --concurrency 8
+"""
+
+import argparse
+import collections
+import http.server
+import json
+import os
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from recommender_system import Recommender,profiling
+
+# the directory of the bundled files and the snapshot
+REPOSITORY_DIRECTORY=os.path.dirname(os.path.abspath(__file__))
+
+# the model shared by every request, filled in by load_model
+model={}
+
+# the computations in progress, keyed by the user and the knobs
+in_flight={}
+in_flight_lock=threading.Lock()
+
+# the number of latest requests the latency percentiles are taken over
+LATENCY_WINDOW=10000
+
+# the latency in seconds of the latest answered requests, how many 
+# requests were answered and failed, and how many shared the result of
+# another one
+request_stats={'latencies':collections.deque(maxlen=LATENCY_WINDOW),\
+               'requests':0,'errors':0,'coalesced':0}
+request_stats_lock=threading.Lock()
+
+def load_model(file_name=None,movie_id_file_name=None,cache_size=None,\
+               cache_ttl=None):
+    """ Returns the dictionary model after filling it in with a loaded
+    Recommender of file_name, whose utility matrix is kept in the
+    snapshot next to this file
+
+    Args:
+        file_name: string for the ratings file name, None for the
+        bundled ratings
+
+        movie_id_file_name: string for the movie id file name, None for
+        the bundled movies
+
+        cache_size: integer of how many entries the cache holds, None
+        for the default of the recommender system
+
+        cache_ttl: float of how many seconds an entry is cached, None
+        for the default of the recommender system
+    """
+
+    recommender=Recommender\
+        (file_name or os.path.join(REPOSITORY_DIRECTORY,'ratings_list.csv'),\
+         movie_id_file_name or \
+         os.path.join(REPOSITORY_DIRECTORY,'movies_ids.csv'),\
+         snapshot_directory=os.path.join\
+         (REPOSITORY_DIRECTORY,'utility_matrix_snapshot'),\
+         cache_size=cache_size,cache_ttl=cache_ttl)
+
+    model['recommender']=recommender.load()
+
+    return model
+
+def recommend\
+    (user_id,k_nearest,weight_on_taste,\
+     minimum_movies_both_users_have_to_watch,weigh_by_popularity,\
+     approximate,top_n,genres=None):
+    """ Returns the recommendation_list of user_id computed with the
+    Recommender of the model, the same as the script gives for the same
+    knobs. The exact recommendations are cached
+
+    Args:
+        user_id: integer of the user id
+
+        k_nearest: integer of how many neighbours to look for
+
+        weight_on_taste: float between 0 and 1 which determines the
+        amount of weight on how similar the taste is
+
+        minimum_movies_both_users_have_to_watch: integer of how
+        many movies both user have to watch to consider adding the user
+        as a nearest neighbour
+
+        weigh_by_popularity: boolean which say whether to weight the
+        recommendation by the amount of k_nearest neighbours who saw
+        the movie
+
+        approximate: boolean which says whether the neighbours are only
+        looked for among a shortlist of users
+
+        top_n: integer of how many titles to return
+
+        genres: tuple of the genres one of which every title has, None
+        for titles of every genre
+    """
+
+    return model['recommender'].recommend\
+        (user_id,k_nearest,weight_on_taste,\
+         minimum_movies_both_users_have_to_watch,weigh_by_popularity,\
+         top_n,approximate,genres)
+
+def coalesced_recommend(key):
+    """ Returns recommend(*key), computed only once for requests with the
+    same key that arrive while it is being computed
+
+    Args:
+        key: tuple of the arguments of recommend
+    """
+
+    with in_flight_lock:
+
+        # checks if the same request is already being computed
+        computation=in_flight.get(key)
+        is_leader=computation is None
+
+        if is_leader:
+
+            computation={'done':threading.Event(),'result':None,\
+                         'error':None}
+            in_flight[key]=computation
+
+    # checks if this request has to wait for the result of another one
+    if not is_leader:
+
+        with request_stats_lock:
+
+            request_stats['coalesced']+=1
+
+        computation['done'].wait()
+
+    else:
+
+        try:
+
+            computation['result']=recommend(*key)
+
+        except Exception as error:
+
+            computation['error']=error
+
+        finally:
+
+            with in_flight_lock:
+
+                del in_flight[key]
+
+            computation['done'].set()
+
+    if computation['error'] is not None:
+
+        raise computation['error']
+
+    return computation['result']
+
+def parse_boolean(value):
+    """ Returns the boolean of a query value such as 1, true or no
+
+    Args:
+        value: string from the query
+    """
+
+    if value.lower() in ('1','true','yes'):
+
+        return True
+
+    if value.lower() in ('0','false','no'):
+
+        return False
+
+    raise ValueError('not a boolean: %s'%value)
+
+def latency_percentiles():
+    """ Returns a dictionary with the number of requests, how many failed
+    and were coalesced, the p50 and p99 latency in milliseconds of the
+    latest LATENCY_WINDOW requests and the counters of the cache
+    """
+
+    with request_stats_lock:
+
+        latencies=np.array(request_stats['latencies'])
+        stats={name:request_stats[name] \
+               for name in ('requests','errors','coalesced')}
+
+    stats['cache']=model['recommender'].recommendation_cache.stats()
+
+    if len(latencies)>0:
+
+        stats['p50_ms'],stats['p99_ms']=\
+            (np.percentile(latencies,[50,99])*1000).tolist()
+
+    # adds the stages of the recommender system while they are profiled
+    if profiling.profiler is not None:
+
+        stats['profile']=profiling.profiler.to_dict()
+
+    return stats
+
+class RecommendationHandler(http.server.BaseHTTPRequestHandler):
+    """ Answers /recommend, /stats and /metrics requests """
+
+    def send_json(self,status,body):
+        """ Sends body as JSON with the HTTP status """
+
+        self.send_content(status,json.dumps(body).encode(),\
+                          'application/json')
+
+    def send_content(self,status,content,content_type):
+        """ Sends the bytes content of content_type with the HTTP
+        status """
+
+        self.send_response(status)
+        self.send_header('Content-Type',content_type)
+        self.send_header('Content-Length',str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def do_GET(self):
+        """ Answers a GET request """
+
+        start_time=time.perf_counter()
+        url=urllib.parse.urlparse(self.path)
+
+        if url.path=='/stats':
+
+            self.send_json(200,latency_percentiles())
+
+            return
+
+        if url.path=='/metrics':
+
+            if profiling.profiler is None:
+
+                self.send_json(404,{'error':'the stages are not profiled, '\
+                                    'start the server with --profile'})
+
+            else:
+
+                self.send_content\
+                    (200,profiling.profiler.to_prometheus().encode(),\
+                     'text/plain; version=0.0.4')
+
+            return
+
+        if url.path!='/recommend':
+
+            self.send_json(404,{'error':'unknown path %s'%url.path})
+
+            return
+
+        query=dict(urllib.parse.parse_qsl(url.query))
+        recommender=model['recommender']
+
+        # reads the knobs, with the defaults of the script
+        try:
+
+            user_id=int(query['user_id'])
+            key=(user_id,\
+                 int(query.get('k',recommender.k_nearest)),\
+                 float(query.get('weight_on_taste',\
+                                 recommender.weight_on_taste)),\
+                 int(query.get('minimum',recommender.\
+                               minimum_movies_both_users_have_to_watch)),\
+                 parse_boolean(query.get('weigh_by_popularity',\
+                               str(recommender.weigh_by_popularity))),\
+                 parse_boolean(query.get('approximate','false')),\
+                 int(query.get('n',recommender.top_n)),\
+                 tuple(sorted(set(query['genre'].split(',')))) \
+                 if 'genre' in query else None)
+
+        except (KeyError,ValueError) as error:
+
+            self.send_json(400,{'error':'bad query: %s'%error})
+
+            return
+
+        if not 0<=key[2]<1 or key[1]<1 or key[6]<1:
+
+            self.send_json(400,{'error':'k and n have to be at least 1 and '\
+                                'weight_on_taste in [0,1)'})
+
+            return
+
+        if key[7] is not None and \
+            not set(key[7])<=set(recommender.genres()):
+
+            self.send_json(400,{'error':'unknown genre, the genres are %s'\
+                                %', '.join(recommender.genres())})
+
+            return
+
+        if not recommender.has_user(user_id):
+
+            self.send_json(404,{'error':'unknown user_id %d'%user_id})
+
+            return
+
+        try:
+
+            recommendation_list=coalesced_recommend(key)
+
+        except Exception as error:
+
+            recommendation_list=None
+
+            self.send_json(500,{'error':'recommending failed: %r'%error})
+
+        with request_stats_lock:
+
+            request_stats['latencies'].append\
+                (time.perf_counter()-start_time)
+            request_stats['requests']+=1
+            request_stats['errors']+=recommendation_list is None
+
+        if recommendation_list is not None:
+
+            self.send_json(200,{'user_id':user_id,\
+                                'recommendations':recommendation_list})
+
+    def log_message(self,format,*args):
+        """ Keeps the requests out of the terminal """
+
+        pass
+
+def start_server(host,port):
+    """ Returns a server answering requests on host and port from a
+    background thread
+
+    Args:
+        host: string of the address to listen on
+
+        port: integer of the port to listen on, 0 for any free port
+    """
+
+    server=http.server.ThreadingHTTPServer\
+        ((host,port),RecommendationHandler)
+    server.daemon_threads=True
+
+    threading.Thread(target=server.serve_forever,daemon=True).start()
+
+    return server
+
+def load_test(url,user_ids,number_of_requests,concurrency,seed=0):
+    """ Returns a dictionary with the p50 and p99 latency in milliseconds
+    seen by the clients and the requests per second, after sending
+    number_of_requests requests for users drawn from user_ids by
+    concurrency clients at once
+
+    Args:
+        url: string of the server, such as http://127.0.0.1:8000
+
+        user_ids: list of the user ids to draw from
+
+        number_of_requests: integer of how many requests to send
+
+        concurrency: integer of how many requests are sent at once
+
+        seed: integer for drawing the users
+    """
+
+    requested_user_ids=np.random.default_rng(seed).choice\
+        (user_ids,number_of_requests).tolist()
+
+    def timed_request(user_id):
+
+        start_time=time.perf_counter()
+
+        with urllib.request.urlopen\
+            ('%s/recommend?user_id=%d'%(url,user_id)) as response:
+
+            response.read()
+
+        return time.perf_counter()-start_time
+
+    start_time=time.perf_counter()
+
+    with ThreadPoolExecutor(concurrency) as executor:
+
+        latencies=list(executor.map(timed_request,requested_user_ids))
+
+    seconds=time.perf_counter()-start_time
+    p50,p99=(np.percentile(latencies,[50,99])*1000).tolist()
+
+    return {'requests':number_of_requests,'concurrency':concurrency,\
+            'p50_ms':p50,'p99_ms':p99,\
+            'requests_per_second':number_of_requests/seconds}
+
+def main():
+    """ Runs the server, or a load test against it, from the command
+    line """
+
+    parser=argparse.ArgumentParser\
+        (description='Serve recommendations from a warm model.')
+    parser.add_argument('--host',default='127.0.0.1')
+    parser.add_argument('--port',type=int,default=8000)
+    parser.add_argument('--load-test',type=int,metavar='REQUESTS',\
+        help='send this many requests to the server and print the '\
+        'latency instead of serving')
+    parser.add_argument('--concurrency',type=int,default=8,\
+        help='number of clients of the load test')
+    parser.add_argument('--users',type=int,default=50,\
+        help='number of distinct users the load test asks for')
+    parser.add_argument('--ratings',help='ratings file, the bundled one '\
+        'if it is not given')
+    parser.add_argument('--movies',help='movie id file, the bundled one '\
+        'if it is not given')
+    parser.add_argument('--cache-size',type=int,\
+        help='number of entries of the cache of recommendations')
+    parser.add_argument('--cache-ttl',type=float,\
+        help='number of seconds a recommendation is cached')
+    parser.add_argument('--profile',action='store_true',\
+        help='record how long every stage takes, served on /metrics')
+    arguments=parser.parse_args()
+
+    load_model(arguments.ratings,arguments.movies,arguments.cache_size,\
+               arguments.cache_ttl)
+
+    # starts recording the stages of the recommender system
+    if arguments.profile:
+
+        profiling.enable_profiling()
+
+    # checks if the server should only be load tested
+    if arguments.load_test:
+
+        server=start_server(arguments.host,0)
+        url='http://%s:%d'%server.server_address[:2]
+
+        user_ids=list(model['recommender'].user_index_to_id.values())\
+            [:arguments.users]
+
+        print(json.dumps(load_test\
+            (url,user_ids,arguments.load_test,arguments.concurrency)))
+        print(json.dumps(latency_percentiles()))
+
+        server.shutdown()
+
+        return
+
+    server=http.server.ThreadingHTTPServer\
+        ((arguments.host,arguments.port),RecommendationHandler)
+    server.daemon_threads=True
+
+    print('serving on http://%s:%d'%(arguments.host,arguments.port))
+
+    try:
+
+        server.serve_forever()
+
+    except KeyboardInterrupt:
+
+        server.server_close()
+
+if __name__=='__main__':
+
+    main()
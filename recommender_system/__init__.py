@@ -0,0 +1,119 @@
+"""
+k-nearest neighbours recommender system
+The system recommends movies that a user_id has not yet seen based on 
+how similar they are in taste to other users. Recommender keeps a model
+in memory and answers queries on it:
+
+    from recommender_system import Recommender
+
+    recommender=Recommender('ratings_list.csv','movies_ids.csv')
+    recommender.recommend(99)
+
+Nothing is read until the first query, or until load is called to warm
+the model up. The functions of the pipeline can be imported from the 
+package or from its modules. Importing the package only imports a 
+module, and numpy, pandas and scipy, the first time one of its names is
+used, so it takes a few milliseconds. From the command line:
+
+    python -m recommender_system 99 --k-nearest 10 --weight-on-taste 0.2
+"""
+
+import importlib
+
+# the names every module of the package gives, which are imported the
+# first time they are used
+NAMES_OF_MODULES={\
+    'recommender':['ReadWriteLock','Recommender'],\
+    'cli':['main'],\
+    'profiling':\
+        ['PROFILE_LATENCY_BUCKETS','StageProfiler','enable_profiling',\
+         'disable_profiling','profiled_stage'],\
+    'ratings_files':\
+        ['RATINGS_DTYPES','STREAM_CHUNK_SIZE','COLUMNS_SUFFIX',\
+         'compact_column','columns_directory','convert_to_columns',\
+         'load_columns_description','read_columns','read_ratings_in_chunks'],\
+    'utility_matrix':\
+        ['POPCOUNT_TABLE','STREAM_BYTES_PER_CSV_ROW',\
+         'STREAM_BYTES_PER_RATING','create_utility_matrix',\
+         'create_index_to_id','reverse_index_map','get_user_index',\
+         'index_ids','stream_utility_matrix','adjust_ratings','popcount',\
+         'CompactUtilityMatrix','create_compact_utility_matrix',\
+         'save_utility_matrix_arrays','load_utility_matrix_arrays'],\
+    'neighbours':\
+        ['DENSE_BLOCK_CELLS','SELECTION_BLOCK_SIZE',\
+         'APPROXIMATE_SAMPLED_MOVIES','APPROXIMATE_SHORTLIST_SIZE',\
+         'overlaps_and_distances','seen_and_ratings',\
+         'block_overlaps_and_distances','sparse_user_ratings',\
+         'compact_overlaps_and_distances','set_user_statistics',\
+         'create_user_statistics','update_user_statistics',\
+         'statistics_overlaps_and_distances','k_nearest_neighbours',\
+         'k_nearest_from_distances','select_k_nearest',\
+         'create_co_rating_index','approximate_candidates',\
+         'approximate_k_nearest_neighbours','approximate_recall'],\
+    'recommendations':\
+        ['RECOMMEND_BLOCK_SIZE','TOP_N','neighbour_ratings_of_movies',\
+         'user_has_seen','movies_in_order_first_seen','scores_of_movies',\
+         'list_of_movies_user_id_has_not_seen',\
+         'average_rating_of_movies_user_has_not_seen','unseen_movie_scores',\
+         'load_once','create_movie_catalogue','get_movie_catalogue',\
+         'create_user_ratings_index','get_user_ratings_index',\
+         'create_genre_index','genre_movie_indeces',\
+         'top_n_recommendations','create_recommendation_list',\
+         'top_movies_rated_by_user_id','recommend_many',\
+         'start_recommend_worker','recommend_worker','recommend_parallel'],\
+    'snapshots':\
+        ['SNAPSHOT_VERSION','file_checksum','save_model_snapshot',\
+         'write_model_snapshot','load_model_snapshot'],\
+    'updates':\
+        ['DENSE_GROWTH_FACTOR','users_sharing_movies','grow_utility_matrix',\
+         'readjust_users','invalidate_cached_users','add_ratings',\
+         'remove_ratings'],\
+    'time_windows':\
+        ['SECONDS_PER_DAY','set_rating_times','window_start',\
+         'create_time_model','advance_time_window'],\
+    'cache':\
+        ['RECOMMENDATION_CACHE_SIZE','RECOMMENDATION_CACHE_TTL',\
+         'RecommendationCache','recommendation_list_key',\
+         'cached_recommendation_list'],\
+    'async_recommender':\
+        ['ASYNC_MAX_IN_FLIGHT','ASYNC_MAX_PENDING','ASYNC_MAX_BATCH_SIZE',\
+         'ASYNC_BATCH_DELAY','RecommenderOverloadedError',\
+         'AsyncRecommender']}
+
+# the module every name is defined in
+MODULE_OF_NAME={name:module for module,names in NAMES_OF_MODULES.items()\
+                for name in names}
+
+__all__=list(MODULE_OF_NAME)
+
+def __getattr__(name):
+    """ Returns the function, class or constant name, or the module 
+    name of the package, importing its module the first time it is used
+
+    Args:
+        name: string of the name
+    """
+
+    # checks if name is a module of the package
+    if name in NAMES_OF_MODULES:
+
+        return importlib.import_module('.'+name,__name__)
+
+    if name not in MODULE_OF_NAME:
+
+        raise AttributeError('module %r has no attribute %r'%(__name__,name))
+
+    value=getattr(importlib.import_module\
+                  ('.'+MODULE_OF_NAME[name],__name__),name)
+
+    # keeps the value so the module is only looked up once
+    globals()[name]=value
+
+    return value
+
+def __dir__():
+    """ Returns the names of the package, including the ones that were
+    not imported yet
+    """
+
+    return sorted(set(globals())|set(MODULE_OF_NAME)|set(NAMES_OF_MODULES))
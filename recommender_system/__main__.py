@@ -0,0 +1,9 @@
+"""
+Runs the command line entry point of the recommender system
+
+    python -m recommender_system 99
+"""
+
+from .cli import main
+
+main()
@@ -0,0 +1,283 @@
+"""
+AsyncRecommender, which answers recommendation requests from asyncio
+The model is queried in a pool of threads so the event loop is never
+blocked by a k_nearest_neighbours scan. Requests with the same knobs
+that arrive within a few milliseconds of each other are put together
+and computed by Recommender.recommend_batch, which scores all their
+users with matrix products:
+
+    async_recommender=AsyncRecommender(Recommender())
+    recommendation_list=await async_recommender.recommend(99)
+
+Only max_in_flight batches are computed at once, the others wait, and a
+request is refused with RecommenderOverloadedError when max_pending
+requests are already waiting. Like recommender.py it does not import
+the pipeline, so importing it takes no time
+"""
+
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+# the default number of batches computed at once, of requests waiting or
+# being computed, of users in a batch and of seconds a request waits for
+# others to join its batch
+ASYNC_MAX_IN_FLIGHT=2
+ASYNC_MAX_PENDING=1024
+ASYNC_MAX_BATCH_SIZE=64
+ASYNC_BATCH_DELAY=0.002
+
+class RecommenderOverloadedError(RuntimeError):
+    """ Raised when a request is refused because too many requests are
+    already waiting to be answered """
+
+class AsyncRecommender:
+    """ Answers the requests of coroutines with the recommendations of a
+    Recommender, computed in a pool of threads.
+
+    Requests with the same knobs are batched: the first one waits
+    batch_delay seconds, or until max_batch_size requests joined it, and
+    the users of all of them that are not cached are recommended to at
+    once. Without batching every request is computed on its own with
+    Recommender.recommend. Both use the cache of the Recommender. It is
+    used from one event loop.
+
+    Args:
+        recommender: Recommender to take the recommendations from
+
+        max_in_flight: integer of how many batches, or requests without
+        batching, are computed at once
+
+        max_pending: integer of how many requests can wait or be
+        computed at once before new ones are refused
+
+        max_batch_size: integer of how many requests a batch holds
+
+        batch_delay: float of how many seconds a batch waits for more
+        requests to join it
+
+        batching: boolean which says whether to batch the requests
+
+        executor: optional concurrent.futures executor to compute in,
+        a pool of max_in_flight threads if it is None
+    """
+
+    def __init__(self,recommender,max_in_flight=ASYNC_MAX_IN_FLIGHT,\
+                 max_pending=ASYNC_MAX_PENDING,\
+                 max_batch_size=ASYNC_MAX_BATCH_SIZE,\
+                 batch_delay=ASYNC_BATCH_DELAY,batching=True,executor=None):
+
+        if max_in_flight<1 or max_pending<1 or max_batch_size<1:
+
+            raise ValueError('max_in_flight, max_pending and '\
+                             'max_batch_size have to be at least 1')
+
+        self.recommender=recommender
+        self.max_in_flight=max_in_flight
+        self.max_pending=max_pending
+        self.max_batch_size=max_batch_size
+        self.batch_delay=batch_delay
+        self.batching=batching
+
+        # makes a pool of threads when no executor is given, which close
+        # shuts down
+        self.owns_executor=executor is None
+        self.executor=ThreadPoolExecutor(max_in_flight) \
+            if executor is None else executor
+
+        self.in_flight=asyncio.Semaphore(max_in_flight)
+
+        # the batches being filled, keyed by their knobs, as lists of
+        # [user_id,future], and the tasks computing the full ones
+        self.batches={}
+        self.tasks=set()
+
+        self.pending=0
+        self.counters={'requests':0,'refused':0,'batches':0,\
+                       'batched_requests':0}
+
+    async def load(self):
+        """ Returns the AsyncRecommender after building the model of its
+        Recommender in the executor, if it was not built yet
+        """
+
+        if not self.recommender.is_loaded:
+
+            await asyncio.get_running_loop().run_in_executor\
+                (self.executor,self.recommender.load)
+
+        return self
+
+    async def recommend\
+        (self,user_id,k_nearest=None,weight_on_taste=None,\
+         minimum_movies_both_users_have_to_watch=None,\
+         weigh_by_popularity=None,top_n=None,genres=None):
+        """ Returns the list of movie titles recommended to user_id, the
+        same as Recommender.recommend gives. Raises KeyError if user_id
+        has no ratings and RecommenderOverloadedError if max_pending
+        requests are already waiting
+
+        Args:
+            user_id: integer of the user id
+
+            k_nearest, weight_on_taste,
+            minimum_movies_both_users_have_to_watch, weigh_by_popularity,
+            top_n: same as for Recommender, None for its value
+
+            genres: same as for Recommender.recommend
+        """
+
+        await self.load()
+
+        # sheds the request when too many are waiting
+        if self.pending>=self.max_pending:
+
+            self.counters['refused']+=1
+
+            raise RecommenderOverloadedError\
+                ('%d requests are already waiting, try again later'\
+                 %self.pending)
+
+        self.counters['requests']+=1
+        self.pending+=1
+
+        knobs=(k_nearest,weight_on_taste,\
+               minimum_movies_both_users_have_to_watch,weigh_by_popularity,\
+               top_n,None if genres is None else tuple(sorted\
+               ({genres} if isinstance(genres,str) else set(genres))))
+
+        # the users with no ratings are found in the executor, since the
+        # lock of the model can be held by a writer
+        try:
+
+            # checks if the request is computed on its own
+            if not self.batching:
+
+                async with self.in_flight:
+
+                    return await asyncio.get_running_loop().run_in_executor\
+                        (self.executor,functools.partial\
+                         (self.recommender.recommend,user_id,*knobs[:5],\
+                          genres=knobs[5]))
+
+            return await self.join_batch(user_id,knobs)
+
+        finally:
+
+            self.pending-=1
+
+    def join_batch(self,user_id,knobs):
+        """ Returns the future of the recommendation list of user_id,
+        after adding it to the batch being filled for knobs, which is
+        started when it is full or after batch_delay seconds
+        """
+
+        loop=asyncio.get_running_loop()
+        future=loop.create_future()
+
+        # starts a batch for the knobs if none is being filled
+        if knobs not in self.batches:
+
+            batch=self.batches[knobs]=[]
+            loop.call_later(self.batch_delay,self.start_batch,knobs,batch)
+
+        batch=self.batches[knobs]
+        batch.append([user_id,future])
+
+        if len(batch)>=self.max_batch_size:
+
+            self.start_batch(knobs,batch)
+
+        return future
+
+    def start_batch(self,knobs,batch):
+        """ Starts computing batch, unless it was already started """
+
+        if self.batches.get(knobs) is not batch:
+
+            return
+
+        del self.batches[knobs]
+
+        # keeps the task until it is done so it is not garbage collected
+        task=asyncio.ensure_future(self.compute_batch(knobs,batch))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    def recommend_known_users(self,user_ids,knobs):
+        """ Returns a dictionary with the user id as key and the list of
+        movie titles recommended to them as value, computed together by
+        Recommender.recommend_batch for the users of user_ids who have
+        ratings. It is run in the executor
+        """
+
+        known_user_ids=[user_id for user_id in user_ids \
+                        if self.recommender.has_user(user_id)]
+
+        if len(known_user_ids)==0:
+
+            return {}
+
+        return self.recommender.recommend_batch(known_user_ids,*knobs)
+
+    async def compute_batch(self,knobs,batch):
+        """ Sets the futures of batch to the recommendation lists of
+        their users, to KeyError for the users with no ratings, or to the
+        error computing them raised
+        """
+
+        user_ids=list(dict.fromkeys(user_id for user_id,future in batch))
+
+        async with self.in_flight:
+
+            self.counters['batches']+=1
+            self.counters['batched_requests']+=len(batch)
+
+            try:
+
+                recommendations=await asyncio.get_running_loop().\
+                    run_in_executor(self.executor,functools.partial\
+                    (self.recommend_known_users,user_ids,knobs))
+
+            except Exception as error:
+
+                recommendations=None
+
+                for user_id,future in batch:
+
+                    if not future.done():
+
+                        future.set_exception(error)
+
+        if recommendations is not None:
+
+            for user_id,future in batch:
+
+                # skips the requests that were cancelled
+                if future.done():
+
+                    continue
+
+                if user_id in recommendations:
+
+                    future.set_result(recommendations[user_id])
+
+                else:
+
+                    future.set_exception\
+                        (KeyError('user_id %s has no ratings'%user_id))
+
+    def stats(self):
+        """ Returns a dictionary with the number of requests answered or
+        refused, the number of batches and of requests in them, and the
+        number of requests pending now
+        """
+
+        return dict(self.counters,pending=self.pending)
+
+    def close(self):
+        """ Shuts down the pool of threads, if it was made here """
+
+        if self.owns_executor:
+
+            self.executor.shutdown(wait=False)
@@ -0,0 +1,263 @@
+"""
+Caching the neighbours and recommendations of a model kept in memory
+A RecommendationCache is a bounded least recently used cache with a 
+time to live which remembers the users every entry depends on, so 
+add_ratings drops only the entries it makes stale
+"""
+
+import collections
+import threading
+import time
+
+from .neighbours import k_nearest_neighbours
+from .recommendations import TOP_N,create_recommendation_list,\
+    genre_movie_indeces,unseen_movie_scores
+
+# the default number of entries a RecommendationCache holds and how many
+# seconds an entry is kept
+RECOMMENDATION_CACHE_SIZE=1024
+RECOMMENDATION_CACHE_TTL=3600
+
+class RecommendationCache:
+    """ Bounded cache of k_nearest_dict and recommendation_list results.
+    
+    Holds at most max_entries entries and drops the least recently used
+    one to make room. An entry is dropped ttl_seconds after it was put. 
+    Every entry remembers the users it depends on (the user and the
+    neighbours), so invalidate_users drops every entry the changed users
+    could affect. Keys start with the user_id, as add_ratings expects, 
+    and the counters of hits, misses, evictions, expirations and 
+    invalidations help size the cache. It can be shared between threads.
+    
+    Args:
+        max_entries: integer of how many entries the cache holds
+        
+        ttl_seconds: float of how many seconds an entry is kept, None
+        to keep it until it is evicted or invalidated
+    """
+    
+    def __init__(self,max_entries=RECOMMENDATION_CACHE_SIZE,\
+                 ttl_seconds=RECOMMENDATION_CACHE_TTL):
+        
+        self.max_entries=max_entries
+        self.ttl_seconds=ttl_seconds
+        
+        # maps a key to [value,expiry time,user ids it depends on], 
+        # from the least to the most recently used
+        self.entries=collections.OrderedDict()
+        self.lock=threading.Lock()
+        
+        self.counters={'hits':0,'misses':0,'evictions':0,\
+                       'expirations':0,'invalidations':0}
+        
+    def get(self,key):
+        """ Returns the value cached for key, or None if there is none
+        or it expired
+        """
+        
+        with self.lock:
+            
+            entry=self.entries.get(key)
+            
+            # checks if the entry expired
+            if entry is not None and entry[1] is not None and \
+                entry[1]<=time.monotonic():
+                
+                del self.entries[key]
+                self.counters['expirations']+=1
+                entry=None
+                
+            if entry is None:
+                
+                self.counters['misses']+=1
+                
+                return None
+            
+            self.entries.move_to_end(key)
+            self.counters['hits']+=1
+            
+            return entry[0]
+        
+    def put(self,key,value,user_ids=()):
+        """ Caches value for key, which depends on the ratings of the
+        user in key[0] and of the users in user_ids
+        """
+        
+        expiry_time=None if self.ttl_seconds is None else \
+            time.monotonic()+self.ttl_seconds
+        
+        with self.lock:
+            
+            self.entries[key]=\
+                [value,expiry_time,set(user_ids)|{key[0]}]
+            self.entries.move_to_end(key)
+            
+            # drops the least recently used entries if it is too big
+            while len(self.entries)>self.max_entries:
+                
+                self.entries.popitem(last=False)
+                self.counters['evictions']+=1
+                
+    def invalidate_users(self,user_ids):
+        """ Returns the number of entries dropped because they depend on
+        the ratings of one of user_ids
+        """
+        
+        user_ids=set(user_ids)
+        
+        with self.lock:
+            
+            keys=[key for key,entry in self.entries.items()\
+                  if not entry[2].isdisjoint(user_ids)]
+            
+            for key in keys:
+                
+                del self.entries[key]
+                
+            self.counters['invalidations']+=len(keys)
+            
+        return len(keys)
+    
+    def clear(self):
+        """ Drops every entry, such as after the model is loaded again """
+        
+        with self.lock:
+            
+            self.counters['invalidations']+=len(self.entries)
+            self.entries.clear()
+            
+    def stats(self):
+        """ Returns a dictionary with the counters and the number of 
+        entries
+        """
+        
+        with self.lock:
+            
+            return dict(self.counters,entries=len(self.entries))
+        
+    def __len__(self):
+        
+        return len(self.entries)
+
+def recommendation_list_key\
+    (user_id,k_nearest,weight_on_taste,\
+     minimum_movies_both_users_have_to_watch,weigh_by_popularity,\
+     model_version,top_n,genres):
+    """ Returns the key the recommendation_list of user_id is cached
+    with in a RecommendationCache for the knobs, by 
+    cached_recommendation_list and by Recommender.recommend_batch
+    """
+    
+    return (user_id,k_nearest,weight_on_taste,\
+            minimum_movies_both_users_have_to_watch,weigh_by_popularity,\
+            model_version,top_n,genres)
+
+def cached_recommendation_list\
+    (recommendation_cache,utility_matrix,user_index_to_id,\
+     movie_index_to_id,user_id,k_nearest,highest_rating,\
+     minimum_movies_both_users_have_to_watch,weight_on_taste,\
+     weigh_by_popularity,movie_id_file_name='movies_ids.csv',\
+     user_id_to_index=None,model_version=0,top_n=TOP_N,\
+     user_statistics=None,time_model=None,genres=None,genre_index=None):
+    """ Returns the same recommendation_list as calling 
+    k_nearest_neighbours, list_of_movies_user_id_has_not_seen,
+    average_rating_of_movies_user_has_not_seen and 
+    create_recommendation_list for user_id, taking the list, or else the
+    k_nearest_dict, from recommendation_cache when it is there and
+    putting it there when it is not
+    
+    Args:
+        recommendation_cache: RecommendationCache of the results
+        
+        utility_matrix: array (dense or sparse) of preferences for users 
+        and movies
+        
+        user_index_to_id: dictionary that maps user_index to user_id
+        
+        movie_index_to_id: dictionary that maps movie_index to movie_id
+        
+        user_id: integer of the user id we are recommending to
+        
+        k_nearest: integer of how many neighbours to look for
+        
+        highest_rating: float which is the highest rating possible
+        
+        minimum_movies_both_users_have_to_watch: integer of how
+        many movies both user have to watch to consider adding the user
+        as a nearest neighbour
+        
+        weight_on_taste: float between 0 and 1 which determines the
+        amount of weight on how similar the taste is
+        
+        weigh_by_popularity: boolean which say whether to weight the 
+        recommendation by the amount of k_nearest neighbours who saw 
+        the movie
+        
+        movie_id_file_name: string for the name of the movie_id file
+        
+        user_id_to_index: optional dictionary that maps user_id to 
+        user_index
+        
+        model_version: value that changes whenever the model changes, so
+        the results cached before are not used
+        
+        top_n: integer of how many titles to return
+        
+        user_statistics: optional dictionary from create_user_statistics
+        
+        time_model: optional dictionary from create_time_model, whose
+        weights are used in the average ratings
+        
+        genres: optional tuple of genres, one of which every recommended
+        movie has
+        
+        genre_index: dictionary from create_genre_index, needed with 
+        genres
+    """
+    
+    neighbours_key=(user_id,k_nearest,weight_on_taste,\
+                    minimum_movies_both_users_have_to_watch,model_version)
+    recommendation_key=recommendation_list_key\
+        (user_id,k_nearest,weight_on_taste,\
+         minimum_movies_both_users_have_to_watch,weigh_by_popularity,\
+         model_version,top_n,genres)
+    
+    # gets the ids of the neighbours the entries depend on
+    def neighbour_ids(k_nearest_dict):
+        
+        return [user_index_to_id[str(int(user_index))] \
+                for user_index in k_nearest_dict]
+    
+    # checks if the recommendation list is cached
+    recommendation_list=recommendation_cache.get(recommendation_key)
+    
+    if recommendation_list is not None:
+        
+        return recommendation_list
+    
+    # checks if the neighbours are cached
+    k_nearest_dict=recommendation_cache.get(neighbours_key)
+    
+    if k_nearest_dict is None:
+        
+        k_nearest_dict=k_nearest_neighbours\
+            (utility_matrix,user_index_to_id,k_nearest,user_id,\
+             highest_rating,minimum_movies_both_users_have_to_watch,\
+             weight_on_taste,user_id_to_index,user_statistics)[0]
+        
+        recommendation_cache.put(neighbours_key,k_nearest_dict,\
+                                 neighbour_ids(k_nearest_dict))
+        
+    average_ratings=unseen_movie_scores\
+        (utility_matrix,user_index_to_id,k_nearest_dict,user_id,\
+         highest_rating,weigh_by_popularity,user_id_to_index,time_model,\
+         None if genres is None else \
+         genre_movie_indeces(genre_index,genres))[1]
+    
+    recommendation_list=create_recommendation_list\
+        (average_ratings,movie_index_to_id,movie_id_file_name,top_n=top_n)
+    
+    recommendation_cache.put(recommendation_key,recommendation_list,\
+                             neighbour_ids(k_nearest_dict))
+    
+    return recommendation_list
@@ -0,0 +1,123 @@
+"""
+Command line entry point of the recommender system
+Prints the movies recommended to a user, for example:
+
+    python -m recommender_system 99 --k-nearest 10 --weight-on-taste 0.2
+        --ratings ratings_list.csv --movies movies_ids.csv
+"""
+
+import argparse
+import json
+
+from .recommender import Recommender
+
+def main(arguments=None):
+    """ Prints the movies recommended to the user given on the command
+    line, and the movies they rated highest if asked for
+
+    Args:
+        arguments: list of the command line arguments, None for the ones
+        the program was run with
+    """
+
+    parser=argparse.ArgumentParser\
+        (prog='python -m recommender_system',\
+         description='Recommend movies to a user from the ratings of the '\
+         'users with the most similar taste.')
+    parser.add_argument('user_id',type=int,\
+        help='id of the user to recommend movies to')
+    parser.add_argument('--k-nearest',type=int,default=10,\
+        help='number of most similar users to take the movies from')
+    parser.add_argument('--weight-on-taste',type=float,default=0.2,\
+        help='weight in [0,1) on how similar the ratings are, the rest is '\
+        'on how many movies both users saw')
+    parser.add_argument('--minimum',type=int,default=1,\
+        help='number of movies both users have to watch to be neighbours')
+    parser.add_argument('--ratings',default='ratings_list.csv',\
+        help='ratings file')
+    parser.add_argument('--movies',default='movies_ids.csv',\
+        help='file mapping movie ids to titles')
+    parser.add_argument('--highest-rating',type=float,default=5,\
+        help='highest possible rating')
+    parser.add_argument('--top-n',type=int,\
+        help='number of movies to recommend')
+    parser.add_argument('--no-popularity',action='store_true',\
+        help='do not weigh the ratings by how many neighbours saw a movie')
+    parser.add_argument('--snapshot-directory',\
+        help='directory the adjusted utility matrix is saved in and '\
+        'loaded from')
+    parser.add_argument('--sparse',action='store_true',\
+        help='store the utility matrix as a sparse matrix')
+    parser.add_argument('--approximate',action='store_true',\
+        help='look for the neighbours among a shortlist of users only')
+    parser.add_argument('--genre',action='append',dest='genres',\
+        help='only recommend movies of this genre, can be given again for '\
+        'movies of any of the genres')
+    parser.add_argument('--top-rated',action='store_true',\
+        help='also print the movies the user rated highest')
+    parser.add_argument('--json',action='store_true',\
+        help='print the result as JSON')
+    parser.add_argument('--profile',action='store_true',\
+        help='also print how long every stage took as JSON')
+    arguments=parser.parse_args(arguments)
+
+    if not 0<=arguments.weight_on_taste<1:
+
+        parser.error('--weight-on-taste has to be in [0,1)')
+
+    if arguments.k_nearest<1 or \
+        (arguments.top_n is not None and arguments.top_n<1):
+
+        parser.error('--k-nearest and --top-n have to be at least 1')
+
+    recommender=Recommender\
+        (arguments.ratings,arguments.movies,arguments.highest_rating,\
+         arguments.k_nearest,arguments.weight_on_taste,arguments.minimum,\
+         not arguments.no_popularity,arguments.top_n,\
+         arguments.snapshot_directory,arguments.sparse,\
+         use_user_statistics=not arguments.approximate)
+
+    # starts recording the stages
+    if arguments.profile:
+
+        from .profiling import enable_profiling
+
+        profiler=enable_profiling()
+
+    if not recommender.has_user(arguments.user_id):
+
+        parser.error('user_id %d has no ratings in %s'\
+                     %(arguments.user_id,arguments.ratings))
+
+    if arguments.genres is not None and \
+        not set(arguments.genres)<=set(recommender.genres()):
+
+        parser.error('unknown genre, the genres are %s'\
+                     %', '.join(recommender.genres()))
+
+    result={'user_id':arguments.user_id,\
+            'recommendations':recommender.recommend\
+            (arguments.user_id,approximate=arguments.approximate,\
+             genres=arguments.genres)}
+
+    if arguments.top_rated:
+
+        result['top_rated']=recommender.top_rated_movies(arguments.user_id)
+
+    if arguments.json:
+
+        print(json.dumps(result))
+
+    else:
+
+        print('Recommended to user_id %d:'%arguments.user_id)
+        print('\n'.join(result['recommendations']))
+
+        if arguments.top_rated:
+
+            print('\nRated highest by user_id %d:'%arguments.user_id)
+            print('\n'.join(result['top_rated']))
+
+    if arguments.profile:
+
+        print(profiler.to_json())
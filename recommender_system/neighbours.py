@@ -0,0 +1,905 @@
+"""
+Finding the k nearest neighbours of a user
+Every user is compared with user_id on the number of movies both saw
+and the difference in their ratings of them. The comparison goes 
+through every user, only the users who share a movie with user_id 
+(create_user_statistics) or a shortlist of users 
+(approximate_k_nearest_neighbours)
+"""
+
+import numpy as np
+import scipy.sparse as sp
+import time
+
+from . import profiling
+from .profiling import profiled_stage
+from .utility_matrix import CompactUtilityMatrix,get_user_index,popcount
+
+# the number of cells of a dense utility matrix compared with a user
+# at a time
+DENSE_BLOCK_CELLS=2**22
+
+# the number of candidate neighbours filtered at a time
+SELECTION_BLOCK_SIZE=1024
+
+# the default number of movies drawn and users shortlisted by 
+# approximate_candidates
+APPROXIMATE_SAMPLED_MOVIES=64
+APPROXIMATE_SHORTLIST_SIZE=100
+                    
+def overlaps_and_distances\
+    (utility_matrix,user_index,highest_rating,rows=None):
+    """ Returns an array with the number of movies both user_index and 
+    each user saw and an array with the sum of squares of the 
+    differences in their ratings of those movies. Both arrays have one
+    entry per row of utility_matrix, or per user in rows if it is given
+    
+    Args:
+        utility_matrix: array (dense or sparse) of preferences for users 
+        and movies
+        
+        user_index: integer of the index of the user we are 
+        recommending to
+        
+        highest_rating: float that indicates what is the highest possbile 
+        movie rating
+        
+        rows: optional array of the user indeces to compare with
+    """
+    
+    # checks if the matrix is compact
+    if isinstance(utility_matrix,CompactUtilityMatrix):
+        
+        return compact_overlaps_and_distances(utility_matrix,user_index,rows)
+    
+    # gets the users to compare with
+    compared=utility_matrix if rows is None else utility_matrix[rows]
+    
+    # checks if the matrix is sparse
+    if sp.issparse(utility_matrix):
+        
+        # gets the ratings of user_index as a dense row and marks
+        # the movies they saw
+        user_preferences=utility_matrix[user_index,:].toarray()[0]
+        user_seen=np.zeros(utility_matrix.shape[1],dtype=bool)
+        user_seen[sparse_user_ratings(utility_matrix,user_index)[0]]=True
+        
+        # finds the user of every stored rating and whether user_index
+        # saw the same movie
+        compared_rows=np.repeat(np.arange(compared.shape[0]),\
+                                np.diff(compared.indptr))
+        both_saw=user_seen[compared.indices]
+        
+        # measures the difference in ratings of the movies both saw
+        distance=np.where(both_saw,\
+            user_preferences[compared.indices]-compared.data,0)
+        
+        # adds up the overlaps and distances of every user
+        number_of_movies_both_saw=np.bincount\
+            (compared_rows,weights=both_saw,minlength=compared.shape[0])
+        distance_scalar=np.bincount\
+            (compared_rows,weights=distance**2,minlength=compared.shape[0])
+        
+        return [number_of_movies_both_saw.astype(int),distance_scalar]
+    
+    # gets the row for the user_id we are interested in and marks
+    # the movies they saw
+    user_preferences=utility_matrix[user_index,:]
+    user_seen=user_preferences>-16*highest_rating
+    
+    number_of_movies_both_saw=np.zeros(compared.shape[0],dtype=int)
+    distance_scalar=np.zeros(compared.shape[0])
+    
+    # gets how many users fit in one block of the matrix
+    block_size=max(1,DENSE_BLOCK_CELLS//max(1,utility_matrix.shape[1]))
+    
+    # loops over blocks of users so only one block of differences
+    # is held in memory at a time
+    for start in range(0,compared.shape[0],block_size):
+        
+        block=compared[start:start+block_size,:]
+        
+        # marks the movies both user_index and each user saw
+        both_saw=(block>-16*highest_rating)&user_seen
+        
+        # counts the number of overlaps
+        number_of_movies_both_saw[start:start+block_size]=\
+            np.count_nonzero(both_saw,axis=1)
+        
+        # subtracts the ratings and excludes the movies without overlap
+        distance=np.where(both_saw,user_preferences-block,0)
+        
+        # measures the distance in preferences
+        distance_scalar[start:start+block_size]=np.sum(distance**2,axis=1)
+        
+    return [number_of_movies_both_saw,distance_scalar]
+
+def seen_and_ratings(utility_matrix,highest_rating):
+    """ Returns a matrix seen with 1 for every movie a user saw and 0 
+    otherwise, a matrix ratings with the ratings of the movies a user
+    saw and 0 otherwise and a matrix squared_ratings with the squares
+    of ratings. The matrices are sparse if utility_matrix is sparse
+    
+    Args:
+        utility_matrix: array (dense or sparse) of preferences for users 
+        and movies
+        
+        highest_rating: float that indicates what is the highest possbile 
+        movie rating
+    """
+    
+    # checks if the matrix is compact
+    if isinstance(utility_matrix,CompactUtilityMatrix):
+        
+        # gets the seen movies as a sparse matrix with the ratings
+        rows,columns=np.nonzero(np.unpackbits\
+            (utility_matrix.seen_bits,axis=1,count=utility_matrix.shape[1]))
+        utility_matrix=sp.csr_matrix\
+            ((utility_matrix.ratings[rows,columns].astype(float)/\
+              utility_matrix.scale,(rows,columns)),\
+             shape=utility_matrix.shape)
+    
+    # checks if the matrix is sparse
+    if sp.issparse(utility_matrix):
+        
+        # keeps the same stored movies with a 1 instead of the rating
+        seen=utility_matrix.copy()
+        seen.data=np.ones(len(seen.data))
+        
+        return [seen,utility_matrix,utility_matrix.power(2)]
+    
+    # marks the movies each user saw
+    seen=utility_matrix>-16*highest_rating
+    
+    # sets the ratings of the movies that were not seen to 0
+    ratings=np.where(seen,utility_matrix,0)
+    
+    return [seen.astype(float),ratings,ratings**2]
+
+def block_overlaps_and_distances(seen,ratings,squared_ratings,user_indeces):
+    """ Returns a matrix with the number of movies both of each user in
+    user_indeces and each user saw and a matrix with the sum of squares
+    of the differences in their ratings of those movies. Both matrices
+    have a row for every user in user_indeces and a column for every
+    user.
+    
+    The overlaps are seen*seen' and the sum of squares of (a-b) over 
+    the movies both saw is expanded into a^2+b^2-2ab, so the whole
+    block is a few matrix products. With half star ratings all the
+    sums are exact and equal the ones of overlaps_and_distances.
+    
+    Args:
+        seen, ratings, squared_ratings: matrices from seen_and_ratings
+        
+        user_indeces: array of the indeces of the users we are 
+        recommending to
+    """
+    
+    # gets the rows of the users in the block
+    seen_block=seen[user_indeces]
+    ratings_block=ratings[user_indeces]
+    squared_ratings_block=squared_ratings[user_indeces]
+    
+    # counts the number of overlaps
+    number_of_movies_both_saw=seen_block@seen.T
+    
+    # measures the distance in preferences over the movies both saw
+    distance_scalar=squared_ratings_block@seen.T+\
+        seen_block@squared_ratings.T-2*(ratings_block@ratings.T)
+    
+    # checks if the products are sparse
+    if sp.issparse(number_of_movies_both_saw):
+        
+        number_of_movies_both_saw=number_of_movies_both_saw.toarray()
+        distance_scalar=distance_scalar.toarray()
+        
+    return [np.rint(number_of_movies_both_saw).astype(int),\
+            np.maximum(distance_scalar,0)]
+
+def sparse_user_ratings(utility_matrix,user_index):
+    """ Returns an array with the movie indeces user_index saw and an
+    array with their ratings from a sparse utility_matrix
+    
+    Args:
+        utility_matrix: sparse CSR matrix of preferences for users and
+        movies
+        
+        user_index: integer of the index of the user
+    """
+    
+    # finds where the row of user_index starts and ends
+    start=utility_matrix.indptr[user_index]
+    end=utility_matrix.indptr[user_index+1]
+    
+    return [utility_matrix.indices[start:end],utility_matrix.data[start:end]]
+
+def compact_overlaps_and_distances(utility_matrix,user_index,rows=None):
+    """ Returns the same arrays as overlaps_and_distances for a 
+    CompactUtilityMatrix. The overlaps are counted with popcount over the 
+    bitmaps and the distances only look at the columns of the movies 
+    user_index saw
+    
+    Args:
+        utility_matrix: CompactUtilityMatrix of preferences for users 
+        and movies
+        
+        user_index: integer of the index of the user we are 
+        recommending to
+        
+        rows: optional array of the user indeces to compare with
+    """
+    
+    # gets the users to compare with
+    seen_bits=utility_matrix.seen_bits if rows is None else \
+        utility_matrix.seen_bits[rows]
+    ratings=utility_matrix.ratings if rows is None else \
+        utility_matrix.ratings[rows]
+    
+    # gets the movies user_index saw, where their bit is in the bitmap
+    # and the ratings as integers when they are whole numbers
+    user_bits=utility_matrix.seen_bits[user_index]
+    user_movies=np.flatnonzero(utility_matrix.rows_seen([user_index])[0])
+    movie_bytes=user_movies>>3
+    movie_shifts=(7-(user_movies&7)).astype(np.uint8)
+    
+    difference_type=np.int16 if ratings.dtype==np.int8 else float
+    user_preferences=utility_matrix.ratings[user_index,user_movies].\
+        astype(difference_type)
+    
+    number_of_movies_both_saw=np.zeros(len(ratings),dtype=int)
+    distance_scalar=np.zeros(len(ratings))
+    
+    # gets how many users fit in one block of the columns of user_index
+    block_size=max(1,DENSE_BLOCK_CELLS//max(1,len(user_movies)))
+    
+    for start in range(0,len(ratings),block_size):
+        
+        block=slice(start,start+block_size)
+        
+        # counts the movies both saw
+        number_of_movies_both_saw[block]=popcount\
+            (seen_bits[block]&user_bits).sum(axis=1,dtype=np.int64)
+        
+        # marks which users saw each of the movies of user_index
+        both_saw=(seen_bits[block][:,movie_bytes]>>movie_shifts)&1
+        
+        # measures the distance in preferences over the movies both saw
+        distance=np.where(both_saw,user_preferences-\
+            ratings[block][:,user_movies].astype(difference_type),0)
+        
+        distance_scalar[block]=\
+            np.sum(distance.astype(np.int64 if difference_type==np.int16 \
+                                   else float)**2,axis=1)
+            
+    return [number_of_movies_both_saw,\
+            distance_scalar/utility_matrix.scale**2]
+
+def set_user_statistics(user_statistics,ratings_by_user):
+    """ Fills in the dictionary user_statistics from the sparse CSR 
+    matrix ratings_by_user, and from the weights of its 'time_model' 
+    when the ratings are weighted by how recent they are
+    
+    Args:
+        user_statistics: dictionary to fill in
+        
+        ratings_by_user: sparse CSR matrix with the adjusted ratings of 
+        the movies every user saw
+    """
+    
+    ratings_by_user.sort_indices()
+    
+    user_statistics['ratings_by_user']=ratings_by_user
+    user_statistics['ratings_by_movie']=ratings_by_user.tocsc()
+    
+    time_model=user_statistics.get('time_model')
+    
+    # checks if the ratings are weighted, whose weights are stored in 
+    # the same places as the ratings
+    if time_model is not None and time_model['log_weights'] is not None:
+        
+        user_statistics['log_weights_by_user']=time_model['log_weights']
+        user_statistics['log_weights_by_movie']=\
+            time_model['log_weights'].tocsc()
+
+def create_user_statistics(utility_matrix,highest_rating,time_model=None):
+    """ Returns a dictionary user_statistics with tables built once from
+    utility_matrix, which k_nearest_neighbours can use instead of 
+    comparing the rows of every user. 'ratings_by_user' is a sparse CSR
+    matrix of the ratings and 'ratings_by_movie' the same matrix as CSC,
+    so the users who saw a movie and their ratings of it are one slice.
+    With a time_model that weighs the ratings by how recent they are, 
+    'log_weights_by_user' and 'log_weights_by_movie' have the base 2 
+    logarithms of the weights in the same places
+    
+    Args:
+        utility_matrix: array (dense, sparse or compact) of adjusted 
+        preferences for users and movies
+        
+        highest_rating: float which is the highest rating possible
+        
+        time_model: optional dictionary from create_time_model, kept in
+        user_statistics so its weights are used
+    """
+    
+    user_statistics={}
+    
+    # checks if the ratings are weighted by how recent they are
+    if time_model is not None and time_model['log_weights'] is not None:
+        
+        user_statistics['time_model']=time_model
+    
+    set_user_statistics(user_statistics,sp.csr_matrix\
+        (seen_and_ratings(utility_matrix,highest_rating)[1]))
+    
+    return user_statistics
+
+def update_user_statistics\
+    (user_statistics,utility_matrix,user_indeces,highest_rating):
+    """ Updates user_statistics in place after the ratings of the users
+    in user_indeces changed in utility_matrix, or users and movies were
+    added to it. Only the rows of user_indeces are read from 
+    utility_matrix
+    
+    Args:
+        user_statistics: dictionary from create_user_statistics
+        
+        utility_matrix: array (dense or sparse) of adjusted preferences 
+        for users and movies after the change
+        
+        user_indeces: array of the indeces of the users whose ratings 
+        changed
+        
+        highest_rating: float which is the highest rating possible
+    """
+    
+    user_indeces=np.asarray(user_indeces,dtype=int)
+    shape=utility_matrix.shape
+    
+    # makes room for the new users and movies
+    ratings_by_user=user_statistics['ratings_by_user'].copy()
+    ratings_by_user.resize(shape)
+    
+    # gets the new rows of the users whose ratings changed
+    new_rows=sp.csr_matrix(seen_and_ratings\
+        (utility_matrix[user_indeces],highest_rating)[1])
+    
+    # removes the old rows and puts the new ones in their place
+    kept_rows=np.ones(shape[0])
+    kept_rows[user_indeces]=0
+    
+    placement=sp.csr_matrix\
+        ((np.ones(len(user_indeces)),\
+          (user_indeces,np.arange(len(user_indeces)))),\
+         shape=(shape[0],len(user_indeces)))
+    
+    ratings_by_user=sp.csr_matrix\
+        (sp.diags(kept_rows)@ratings_by_user+placement@new_rows)
+    ratings_by_user.eliminate_zeros()
+    
+    set_user_statistics(user_statistics,ratings_by_user)
+
+def statistics_overlaps_and_distances(user_statistics,user_index):
+    """ Returns the same arrays as overlaps_and_distances from the 
+    tables of create_user_statistics. Only the ratings of the users who
+    saw one of the movies of user_index are read, from the slices of 
+    those movies in 'ratings_by_movie'.
+    
+    When the ratings are weighted by how recent they are, every movie
+    both users saw counts as the product of the weights of their two 
+    ratings in the overlaps and distances, and a third array has the 
+    number of movies both saw
+    
+    Args:
+        user_statistics: dictionary from create_user_statistics
+        
+        user_index: integer of the index of the user we are 
+        recommending to
+    """
+    
+    ratings_by_user=user_statistics['ratings_by_user']
+    ratings_by_movie=user_statistics['ratings_by_movie']
+    
+    # gets the movies user_index saw and their ratings
+    start=ratings_by_user.indptr[user_index]
+    end=ratings_by_user.indptr[user_index+1]
+    user_movies=ratings_by_user.indices[start:end]
+    user_preferences=ratings_by_user.data[start:end]
+    
+    # finds the slices of the users who saw each of those movies
+    starts=ratings_by_movie.indptr[user_movies]
+    lengths=ratings_by_movie.indptr[user_movies+1]-starts
+    positions=np.arange(lengths.sum())-\
+        np.repeat(np.cumsum(lengths)-lengths,lengths)+\
+        np.repeat(starts,lengths)
+    
+    compared_rows=ratings_by_movie.indices[positions]
+    distance=np.repeat(user_preferences,lengths)-\
+        ratings_by_movie.data[positions]
+    
+    # adds up the overlaps and distances of every user
+    number_of_movies_both_saw=np.bincount\
+        (compared_rows,minlength=ratings_by_user.shape[0])
+    
+    # checks if the ratings are weighted by how recent they are
+    if 'log_weights_by_movie' in user_statistics:
+        
+        # gets the product of the weights of both ratings of every movie
+        # from the sum of their logarithms, so it only rounds to 0 when
+        # the product itself is too small for a float
+        weights=np.exp2\
+            (np.repeat(user_statistics['log_weights_by_user'].\
+                       data[start:end],lengths)+\
+             user_statistics['log_weights_by_movie'].data[positions]+\
+             2*user_statistics['time_model']['log_weight_scale'])
+        
+        return [np.bincount(compared_rows,weights=weights,\
+                            minlength=ratings_by_user.shape[0]),\
+                np.bincount(compared_rows,weights=weights*distance**2,\
+                            minlength=ratings_by_user.shape[0]),\
+                number_of_movies_both_saw]
+    
+    distance_scalar=np.bincount\
+        (compared_rows,weights=distance**2,minlength=ratings_by_user.shape[0])
+    
+    return [number_of_movies_both_saw,distance_scalar]
+
+@profiled_stage('k_nearest_neighbours')
+def k_nearest_neighbours\
+    (utility_matrix,user_index_to_id,k_nearest,user_id,highest_rating,\
+     minimum_movies_both_users_have_to_watch,weight_on_taste,\
+     user_id_to_index=None,user_statistics=None):
+    """ Returns a list called k_nearest_dict, which lists the
+    users who have the most overlapping preferences with user_id,
+    whom we are recommending movies to.
+    It also returns an array with the number of movies
+    each k nearest neighbours saw that user_id also saw
+    
+    Args:
+        utility_matrix: array of preferences for users and movies
+        
+        user_index_to_id: array that maps user index to user_id
+        
+        k_nearest: integer which is telling us how 
+        
+        many neighbours to look for with similar preferences
+        
+        user_id: integer of the user_id we are recommending to   
+        
+        highest_rating: float that indicates what is the highest possbile 
+        movie rating
+        
+        minimum_movies_both_users_have_to_watch: integer of how
+        many movies both user have to watch to consider adding the user
+        as a nearest neighbour
+        
+        weight_on_taste: float between 0 and 1 which determines the
+        amount of weight the code puts on how similar the taste is for
+        movies that were rated. 1-weight_on_taste is the weight on
+        the number of overlapping movies that the users watched
+        
+        user_id_to_index: optional dictionary that maps user_id to 
+        user_index
+        
+        user_statistics: optional dictionary from create_user_statistics.
+        If it is given only the users who saw a movie user_id saw are 
+        compared, from its tables, weighing the ratings by how recent 
+        they are if it has a time_model that does
+    """
+    
+    # gets the user index based on the id of the user
+    user_index=get_user_index(user_index_to_id,user_id,user_id_to_index)
+    
+    # the number of movies both users saw, when number_of_movies_both_saw
+    # is weighted
+    movies_both_saw_counts=None
+    
+    # checks if the precomputed tables can be used
+    if user_statistics is not None:
+        
+        overlaps=statistics_overlaps_and_distances\
+            (user_statistics,user_index)
+        number_of_movies_both_saw,distance_scalar=overlaps[:2]
+        
+        # checks if the overlaps are weighted by how recent they are
+        if len(overlaps)>2:
+            
+            movies_both_saw_counts=overlaps[2]
+        
+    else:
+        
+        # counts the number of overlaps and measures the distance in 
+        # preferences of every user at once
+        number_of_movies_both_saw,distance_scalar=\
+            overlaps_and_distances(utility_matrix,user_index,highest_rating)
+        
+    # counts the users compared with user_id and the movies they share
+    # while profiling. The tables only go through the users who share one
+    if profiling.profiler is not None:
+        
+        counts=number_of_movies_both_saw if movies_both_saw_counts is None \
+            else movies_both_saw_counts
+        
+        profiling.profiler.count_items\
+            (users_scanned=len(counts) if user_statistics is None else \
+             int(np.count_nonzero(counts)),\
+             overlaps_computed=int(counts.sum()))
+        
+    return k_nearest_from_distances\
+        (number_of_movies_both_saw,distance_scalar,user_index,k_nearest,\
+         minimum_movies_both_users_have_to_watch,weight_on_taste,\
+         movies_both_saw_counts)
+
+def k_nearest_from_distances\
+    (number_of_movies_both_saw,distance_scalar,user_index,k_nearest,\
+     minimum_movies_both_users_have_to_watch,weight_on_taste,\
+     movies_both_saw_counts=None):
+    """ Returns the dictionary k_nearest_dict and the array 
+    k_nearest_overlap_array of k_nearest_neighbours from the 
+    number of overlaps and the distances in preferences between 
+    user_index and every user
+    
+    Args:
+        number_of_movies_both_saw: array with the number of movies 
+        every user saw that user_index also saw
+        
+        distance_scalar: array with the sum of squares of the
+        differences in ratings between user_index and every user
+        
+        user_index: integer of the index of the user we are 
+        recommending to
+        
+        k_nearest: integer of how many neighbours to look for
+        
+        minimum_movies_both_users_have_to_watch: integer of how
+        many movies both user have to watch to consider adding the user
+        as a nearest neighbour
+        
+        weight_on_taste: float between 0 and 1 which determines the
+        amount of weight on how similar the taste is
+        
+        movies_both_saw_counts: optional array with the number of movies
+        every user saw that user_index also saw, which the minimum is
+        checked against when number_of_movies_both_saw is weighted
+    """
+    
+    if movies_both_saw_counts is None:
+        
+        movies_both_saw_counts=number_of_movies_both_saw
+    
+    # creates a dictionary with user_index as key and with value that is the
+    # distance in movie preferences
+    k_nearest_dict={}
+    
+    # computes the objective function of every user
+    with np.errstate(divide='ignore'):
+        
+        objective_function=\
+            weight_on_taste*(1-1/(1+distance_scalar))+\
+            (1-weight_on_taste)*(1/(1+number_of_movies_both_saw))
+    
+    # finds the users who saw enough of the same movies as user_id
+    candidates=np.flatnonzero\
+        ((movies_both_saw_counts>0) & \
+         (movies_both_saw_counts>\
+          minimum_movies_both_users_have_to_watch))
+    candidates=candidates[candidates!=user_index]
+    
+    # keeps the k users with the lowest objective function
+    k_nearest_array,k_nearest_index_array,k_nearest_overlap_array=\
+        select_k_nearest\
+        (objective_function,number_of_movies_both_saw,candidates,k_nearest)
+                                                                               
+    # loops over the number of nearest neighbours
+    for index in range(len(k_nearest_index_array)):
+        
+        # checke that there was a neighbour to look at
+        if k_nearest_index_array[index]!=-1:
+          
+            # adds to the dictionary the index as key and the values
+            # are the number of overlaps
+            k_nearest_dict\
+                [k_nearest_index_array[index]]=\
+                k_nearest_array[index]
+          
+    return [k_nearest_dict,k_nearest_overlap_array]
+                
+def select_k_nearest\
+    (objective_function,number_of_movies_both_saw,candidates,k_nearest):
+    """ Returns an array k_nearest_array with the k lowest values of 
+    objective_function among candidates, an array k_nearest_index_array
+    with the users they belong to (-1 for an empty place) and an array
+    k_nearest_overlap_array with the number of movies each of them saw
+    that user_id also saw.
+    
+    Candidates are taken in order and each one replaces the user with
+    the highest objective function if it is strictly lower, so ties
+    are kept exactly as when every user is compared one at a time.
+    Only the candidates that are lower than the current highest value 
+    are looked at one by one.
+    
+    Args:
+        objective_function: array with the objective function of 
+        every user
+        
+        number_of_movies_both_saw: array with the number of movies 
+        every user saw that user_id also saw
+        
+        candidates: array of the user indeces that can be neighbours in
+        the order they are compared
+        
+        k_nearest: integer of how many neighbours to keep
+    """
+    
+    k_nearest_array=np.ones(k_nearest)*10000000000
+    k_nearest_index_array=np.ones(k_nearest)*-1
+    k_nearest_overlap_array=np.zeros(k_nearest)
+    
+    # loops over blocks of candidates
+    for start in range(0,len(candidates),SELECTION_BLOCK_SIZE):
+        
+        # keeps the candidates of the block that are lower than the 
+        # current highest value since no one else can get in
+        block=candidates[start:start+SELECTION_BLOCK_SIZE]
+        block=block[objective_function[block]<max(k_nearest_array)]
+        
+        # loops over the remaining candidates
+        for row in block.tolist():
+            
+            # checks if the objective function is lower than the
+            # highest value in the array
+            if objective_function[row]<max(k_nearest_array):
+                
+                # finds the location of the maximum point
+                loc=np.argmax(k_nearest_array)
+                
+                # replaces the maximum with the current distance in taste
+                k_nearest_array[loc]=objective_function[row]
+                
+                # saves the index of the user in the array by
+                # replacing the index of the user with the least 
+                # overlaps with the user of interest
+                k_nearest_index_array[loc]=row
+                
+                k_nearest_overlap_array[loc]=number_of_movies_both_saw[row]
+                
+    return [k_nearest_array,k_nearest_index_array,k_nearest_overlap_array]
+
+def create_co_rating_index(utility_matrix,highest_rating):
+    """ Returns a sparse CSC matrix co_rating_index with the ratings of 
+    the movies the users saw, so the users who saw a movie and their 
+    ratings of it are one slice of its column
+    
+    Args:
+        utility_matrix: array (dense or sparse) of adjusted preferences 
+        for users and movies
+        
+        highest_rating: float which is the highest rating possible
+    """
+    
+    # gets the ratings of the seen movies with 0 for the others. Adjusted
+    # ratings are above 0 so only the seen movies are stored
+    ratings=seen_and_ratings(utility_matrix,highest_rating)[1]
+    
+    return sp.csc_matrix(ratings)
+
+def approximate_candidates\
+    (co_rating_index,utility_matrix,user_index,highest_rating,\
+     weight_on_taste,number_of_sampled_movies=APPROXIMATE_SAMPLED_MOVIES,\
+     shortlist_size=APPROXIMATE_SHORTLIST_SIZE,seed=0):
+    """ Returns a sorted array with a shortlist of the users who are 
+    likely to be the nearest neighbours of user_index.
+    
+    Up to number_of_sampled_movies of the movies user_index saw are 
+    drawn at random. Every user who saw one of them gets 1 point for 
+    each drawn movie they gave the same rating and loses 
+    (weight_on_taste/(1-weight_on_taste))**2 points for each square
+    of a difference in rating, so agreeing on many movies ranks first
+    and the more weight is on taste the more a disagreement costs. 
+    The shortlist_size users with the most points are kept. More 
+    sampled movies or a longer shortlist raise the recall and the 
+    time per query
+    
+    Args:
+        co_rating_index: sparse CSC matrix from create_co_rating_index
+        
+        utility_matrix: array (dense or sparse) of preferences for users 
+        and movies
+        
+        user_index: integer of the index of the user we are 
+        recommending to
+        
+        highest_rating: float which is the highest rating possible
+        
+        weight_on_taste: float between 0 and 1 which determines the
+        amount of weight on how similar the taste is
+        
+        number_of_sampled_movies: integer of how many movies of 
+        user_index are drawn
+        
+        shortlist_size: integer of how many users are kept
+        
+        seed: integer for drawing the movies
+    """
+    
+    # gets the movies user_index saw and their ratings
+    if sp.issparse(utility_matrix):
+        
+        user_movies,user_ratings=\
+            sparse_user_ratings(utility_matrix,user_index)
+        
+    elif isinstance(utility_matrix,CompactUtilityMatrix):
+        
+        user_movies,user_ratings=utility_matrix.user_ratings(user_index)
+        
+    else:
+        
+        user_movies=np.flatnonzero\
+            (utility_matrix[user_index,:]>-16*highest_rating)
+        user_ratings=utility_matrix[user_index,user_movies]
+    
+    # draws the movies, the same ones every time for the same user
+    if len(user_movies)>number_of_sampled_movies:
+        
+        drawn=np.random.default_rng([seed,user_index]).choice\
+            (len(user_movies),number_of_sampled_movies,replace=False)
+        user_movies=user_movies[drawn]
+        user_ratings=user_ratings[drawn]
+        
+    # gets how much a squared difference in rating costs
+    if weight_on_taste<1:
+        
+        penalty=(weight_on_taste/(1-weight_on_taste))**2
+        
+    else:
+        
+        penalty=np.inf
+    
+    users=[np.array([],dtype=int)]
+    points=[np.array([])]
+    
+    # loops over the drawn movies
+    for movie,rating in zip(user_movies.tolist(),user_ratings.tolist()):
+        
+        # gets the users who saw the movie and their ratings
+        start=co_rating_index.indptr[movie]
+        end=co_rating_index.indptr[movie+1]
+        squared_difference=(co_rating_index.data[start:end]-rating)**2
+        
+        users.append(co_rating_index.indices[start:end])
+        
+        with np.errstate(invalid='ignore'):
+            
+            points.append(np.where(squared_difference==0,1.0,\
+                                   -penalty*squared_difference))
+    
+    # adds up the points of every user
+    users,user_position=np.unique(np.concatenate(users),\
+                                  return_inverse=True)
+    points=np.bincount(user_position,weights=np.concatenate(points),\
+                       minlength=len(users))
+    points=points[users!=user_index]
+    users=users[users!=user_index]
+    
+    # keeps the users with the most points
+    if len(users)>shortlist_size:
+        
+        users=users[np.argpartition(-points,shortlist_size-1)\
+                    [:shortlist_size]]
+        
+    return np.sort(users)
+
+@profiled_stage('approximate_k_nearest_neighbours')
+def approximate_k_nearest_neighbours\
+    (utility_matrix,user_index_to_id,co_rating_index,k_nearest,user_id,\
+     highest_rating,minimum_movies_both_users_have_to_watch,\
+     weight_on_taste,user_id_to_index=None,\
+     number_of_sampled_movies=APPROXIMATE_SAMPLED_MOVIES,\
+     shortlist_size=APPROXIMATE_SHORTLIST_SIZE):
+    """ Returns the same [k_nearest_dict,k_nearest_overlap_array] as
+    k_nearest_neighbours, but only compares user_id with the shortlist
+    of approximate_candidates. The shortlisted users are ranked with 
+    the exact objective function, so the result equals 
+    k_nearest_neighbours whenever the shortlist holds its neighbours
+    
+    Args:
+        utility_matrix: array (dense or sparse) of preferences for users 
+        and movies
+        
+        user_index_to_id: dictionary that maps user_index to user_id
+        
+        co_rating_index: sparse CSC matrix from create_co_rating_index
+        
+        k_nearest, user_id, highest_rating, 
+        minimum_movies_both_users_have_to_watch, weight_on_taste,
+        user_id_to_index: same as for k_nearest_neighbours
+        
+        number_of_sampled_movies, shortlist_size: same as for
+        approximate_candidates
+    """
+    
+    # gets the user index based on the id of the user
+    user_index=get_user_index(user_index_to_id,user_id,user_id_to_index)
+    
+    # gets the shortlist of users
+    candidates=approximate_candidates\
+        (co_rating_index,utility_matrix,user_index,highest_rating,\
+         weight_on_taste,number_of_sampled_movies,shortlist_size)
+    
+    # counts the overlaps and measures the distances of the shortlist
+    # only and gives everyone else no overlap
+    number_of_movies_both_saw=np.zeros(utility_matrix.shape[0],dtype=int)
+    distance_scalar=np.zeros(utility_matrix.shape[0])
+    
+    number_of_movies_both_saw[candidates],distance_scalar[candidates]=\
+        overlaps_and_distances\
+        (utility_matrix,user_index,highest_rating,candidates)
+        
+    # counts the users compared with user_id and the movies they share
+    # while profiling
+    if profiling.profiler is not None:
+        
+        profiling.profiler.count_items\
+            (users_scanned=len(candidates),\
+             overlaps_computed=int(number_of_movies_both_saw.sum()))
+        
+    return k_nearest_from_distances\
+        (number_of_movies_both_saw,distance_scalar,user_index,k_nearest,\
+         minimum_movies_both_users_have_to_watch,weight_on_taste)
+
+def approximate_recall\
+    (utility_matrix,user_index_to_id,co_rating_index,k_nearest,\
+     highest_rating,minimum_movies_both_users_have_to_watch,\
+     weight_on_taste,user_ids=None,user_id_to_index=None,\
+     number_of_sampled_movies=APPROXIMATE_SAMPLED_MOVIES,\
+     shortlist_size=APPROXIMATE_SHORTLIST_SIZE):
+    """ Returns a dictionary with the recall at k of 
+    approximate_k_nearest_neighbours, which is the share of the 
+    neighbours of k_nearest_neighbours it also finds, and the average 
+    seconds per query of both
+    
+    Args:
+        utility_matrix, user_index_to_id, co_rating_index, k_nearest,
+        highest_rating, minimum_movies_both_users_have_to_watch, 
+        weight_on_taste, user_id_to_index, number_of_sampled_movies,
+        shortlist_size: same as for approximate_k_nearest_neighbours
+        
+        user_ids: list of the user ids to query. All the users if it 
+        is None
+    """
+    
+    if user_ids is None:
+        
+        user_ids=list(user_index_to_id.values())
+        
+    found=0
+    neighbours=0
+    exact_seconds=0
+    approximate_seconds=0
+    
+    # loops over the users
+    for user_id in user_ids:
+        
+        start_time=time.perf_counter()
+        exact=k_nearest_neighbours\
+            (utility_matrix,user_index_to_id,k_nearest,user_id,\
+             highest_rating,minimum_movies_both_users_have_to_watch,\
+             weight_on_taste,user_id_to_index)[0]
+        exact_seconds+=time.perf_counter()-start_time
+        
+        start_time=time.perf_counter()
+        approximate=approximate_k_nearest_neighbours\
+            (utility_matrix,user_index_to_id,co_rating_index,k_nearest,\
+             user_id,highest_rating,\
+             minimum_movies_both_users_have_to_watch,weight_on_taste,\
+             user_id_to_index,number_of_sampled_movies,shortlist_size)[0]
+        approximate_seconds+=time.perf_counter()-start_time
+        
+        # counts the exact neighbours that were also found
+        found+=len(set(exact)&set(approximate))
+        neighbours+=len(exact)
+        
+    return {'number_of_sampled_movies':number_of_sampled_movies,\
+            'shortlist_size':shortlist_size,\
+            'recall':found/max(1,neighbours),\
+            'exact_seconds':exact_seconds/len(user_ids),\
+            'approximate_seconds':approximate_seconds/len(user_ids)}
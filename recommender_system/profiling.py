@@ -0,0 +1,218 @@
+"""
+Profiling of the stages of the k-nearest neighbours recommender system
+A StageProfiler keeps a latency histogram of every stage and counters 
+of the users and movies the stages go through. Profiling is off until
+enable_profiling is called, and until then the stages only check 
+whether it is on
+"""
+
+import numpy as np
+import bisect
+import collections
+import functools
+import json
+import threading
+import time
+
+# the upper bounds in seconds of the buckets of the latency histograms 
+# of a StageProfiler
+PROFILE_LATENCY_BUCKETS=(0.0005,0.001,0.0025,0.005,0.01,0.025,0.05,0.1,\
+                         0.25,0.5,1,2.5,5,10,30)
+
+# the StageProfiler the profiled stages record in, None while profiling
+# is off
+profiler=None
+
+class StageProfiler:
+    """ Histograms of how long the stages of the recommender system took
+    and counters of the items they went through.
+    
+    Every call of a function decorated with profiled_stage adds its 
+    latency to the histogram of its stage, and the stages add the number
+    of users they scanned, the overlaps they computed and the candidate
+    movies they scored to the counters. to_dict and to_json give them
+    as a dictionary or JSON and to_prometheus in the Prometheus text 
+    format. It can be shared between threads. A process of 
+    recommend_parallel records in its own copy, which is not added to
+    this one.
+    
+    Args:
+        buckets: increasing floats of the upper bounds in seconds of the
+        buckets of the histograms, the last bucket has no upper bound
+    """
+    
+    def __init__(self,buckets=PROFILE_LATENCY_BUCKETS):
+        
+        self.buckets=tuple(buckets)
+        self.lock=threading.Lock()
+        
+        self.reset()
+        
+    def reset(self):
+        """ Forgets every latency and item counted so far """
+        
+        with self.lock:
+            
+            # maps a stage to the number of calls in every bucket, the
+            # total and the longest seconds
+            self.stages={}
+            self.items=collections.Counter()
+            
+    def record(self,stage,seconds):
+        """ Adds a call of stage which took seconds to its histogram """
+        
+        # finds the first bucket whose upper bound is not below seconds
+        bucket=bisect.bisect_left(self.buckets,seconds)
+        
+        with self.lock:
+            
+            stage_stats=self.stages.get(stage)
+            
+            if stage_stats is None:
+                
+                stage_stats=self.stages[stage]=\
+                    {'bucket_counts':[0]*(len(self.buckets)+1),\
+                     'seconds':0.0,'max_seconds':0.0}
+                
+            stage_stats['bucket_counts'][bucket]+=1
+            stage_stats['seconds']+=seconds
+            stage_stats['max_seconds']=max(stage_stats['max_seconds'],\
+                                           seconds)
+            
+    def count_items(self,**items):
+        """ Adds the number of every kind of item, such as 
+        users_scanned=610, to the counters
+        """
+        
+        with self.lock:
+            
+            self.items.update(items)
+            
+    def to_dict(self):
+        """ Returns a dictionary with, for every stage, the number of 
+        calls, the total, mean and longest seconds and the cumulative 
+        counts of the buckets, and the counters of the items
+        """
+        
+        with self.lock:
+            
+            stages={}
+            
+            for stage,stage_stats in self.stages.items():
+                
+                cumulative_counts=np.cumsum\
+                    (stage_stats['bucket_counts']).tolist()
+                calls=cumulative_counts[-1]
+                
+                stages[stage]={'calls':calls,\
+                               'seconds':stage_stats['seconds'],\
+                               'mean_seconds':stage_stats['seconds']/calls,\
+                               'max_seconds':stage_stats['max_seconds'],\
+                               'buckets':dict(zip([str(bound) for bound \
+                                   in self.buckets]+['+Inf'],\
+                                   cumulative_counts))}
+                
+            return {'stages':stages,'items':dict(self.items)}
+        
+    def to_json(self):
+        """ Returns to_dict as a JSON string """
+        
+        return json.dumps(self.to_dict(),indent=1)
+    
+    def to_prometheus(self,prefix='recommender'):
+        """ Returns the histograms as the prefix_stage_seconds histogram
+        and the counters as the prefix_items_total counter, in the 
+        Prometheus text format
+        
+        Args:
+            prefix: string the names of the metrics start with
+        """
+        
+        profile=self.to_dict()
+        
+        lines=['# HELP %s_stage_seconds Seconds spent in every stage.'\
+               %prefix,\
+               '# TYPE %s_stage_seconds histogram'%prefix]
+        
+        for stage,stage_stats in profile['stages'].items():
+            
+            for bound,count in stage_stats['buckets'].items():
+                
+                lines.append('%s_stage_seconds_bucket{stage="%s",le="%s"} %d'\
+                             %(prefix,stage,bound,count))
+                
+            lines.append('%s_stage_seconds_sum{stage="%s"} %r'\
+                         %(prefix,stage,stage_stats['seconds']))
+            lines.append('%s_stage_seconds_count{stage="%s"} %d'\
+                         %(prefix,stage,stage_stats['calls']))
+            
+        lines+=['# HELP %s_items_total Items the stages went through.'\
+                %prefix,\
+                '# TYPE %s_items_total counter'%prefix]
+        
+        for item,count in sorted(profile['items'].items()):
+            
+            lines.append('%s_items_total{item="%s"} %d'%(prefix,item,count))
+            
+        return '\n'.join(lines)+'\n'
+
+def enable_profiling(buckets=PROFILE_LATENCY_BUCKETS):
+    """ Returns a new StageProfiler which the profiled stages record in
+    from now on
+    
+    Args:
+        buckets: increasing floats of the upper bounds in seconds of the
+        buckets of the histograms
+    """
+    
+    global profiler
+    
+    profiler=StageProfiler(buckets)
+    
+    return profiler
+
+def disable_profiling():
+    """ Returns the StageProfiler that was recorded in, or None, and 
+    stops profiling the stages
+    """
+    
+    global profiler
+    
+    stopped_profiler,profiler=profiler,None
+    
+    return stopped_profiler
+
+def profiled_stage(stage):
+    """ Returns a decorator which records how long every call of the 
+    function takes in the histogram of stage while profiling is on. 
+    While it is off the function is called with nothing else done
+    
+    Args:
+        stage: string of the name of the stage
+    """
+    
+    def decorator(function):
+        
+        @functools.wraps(function)
+        def profiled_function(*args,**kwargs):
+            
+            # keeps the profiler, in case profiling stops during the call
+            stage_profiler=profiler
+            
+            if stage_profiler is None:
+                
+                return function(*args,**kwargs)
+            
+            start_time=time.perf_counter()
+            
+            try:
+                
+                return function(*args,**kwargs)
+            
+            finally:
+                
+                stage_profiler.record(stage,time.perf_counter()-start_time)
+                
+        return profiled_function
+    
+    return decorator
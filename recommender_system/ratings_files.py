@@ -0,0 +1,232 @@
+"""
+Reading the ratings and movie files of the recommender system
+The .csv files are read a chunk at a time or as whole columns. 
+convert_to_columns writes a file as one .npy file per column, which 
+read_columns maps into memory instead of parsing the .csv file for as 
+long as it is up to date
+"""
+
+import pandas as pd
+import numpy as np
+import json
+import os
+
+# the compact types the columns of the ratings file are read with
+RATINGS_DTYPES={'userId':np.int32,'movieId':np.int32,'rating':np.float32,\
+                'timestamp':np.int64}
+
+# the default number of rows read at a time when streaming the ratings
+STREAM_CHUNK_SIZE=10**6
+
+# the suffix of the directory a .csv file is converted to column files in
+# and whether they are read instead of the .csv file when they are up 
+# to date
+COLUMNS_SUFFIX='.columns'
+USE_COLUMN_FILES=True
+
+def compact_column(values):
+    """ Returns values as int32, float32 or a fixed width string array 
+    when that keeps every value exactly, and as they are otherwise
+    
+    Args:
+        values: array of a column
+    """
+    
+    # checks if the integers fit in int32
+    if values.dtype.kind=='i':
+        
+        if len(values)==0 or \
+            (values.min()>=np.iinfo(np.int32).min and \
+             values.max()<=np.iinfo(np.int32).max):
+            
+            return values.astype(np.int32)
+        
+        return values
+    
+    # checks if the floats are the same as float32
+    if values.dtype.kind=='f':
+        
+        compact=values.astype(np.float32)
+        
+        if np.array_equal(compact.astype(values.dtype),values,equal_nan=True):
+            
+            return compact
+        
+        return values
+    
+    # stores the strings without pickling them
+    if values.dtype.kind=='O':
+        
+        return values.astype(str)
+    
+    return values
+
+def columns_directory(file_name):
+    """ Returns the name of the directory the column files of file_name 
+    are in
+    
+    Args:
+        file_name: string for the .csv file name
+    """
+    
+    return file_name+COLUMNS_SUFFIX
+
+def convert_to_columns(file_name,chunk_size=STREAM_CHUNK_SIZE):
+    """ Returns the description of the column files written for the 
+    .csv file file_name, with one .npy file for every column in the 
+    directory columns_directory(file_name). The file is read chunk_size
+    rows at a time and every column is stored with compact_column. 
+    read_columns, read_ratings_in_chunks and the functions that use them
+    read the column files instead of the .csv file until it changes
+    
+    Args:
+        file_name: string for the .csv file name (such as ratings_list.csv
+        or movies_ids.csv)
+        
+        chunk_size: integer of how many rows to read at a time
+    """
+    
+    # gets the names of the columns
+    names=pd.read_csv(file_name,nrows=0).columns.tolist()
+    columns={name:[] for name in names}
+    number_of_rows=0
+    
+    # reads the file a chunk at a time
+    with pd.read_csv(file_name,chunksize=chunk_size) as chunks:
+        
+        for chunk in chunks:
+            
+            number_of_rows+=len(chunk)
+            
+            for name in names:
+                
+                columns[name].append(chunk[name].to_numpy())
+                
+    directory=columns_directory(file_name)
+    os.makedirs(directory,exist_ok=True)
+    
+    # writes every column by its position, so any column name works
+    for position,name in enumerate(names):
+        
+        values=compact_column(np.concatenate(columns.pop(name)) \
+            if columns[name] else np.array([]))
+        np.save(os.path.join(directory,'%d.npy'%position),values)
+        
+    status=os.stat(file_name)
+    
+    description={'columns':names,\
+                 'rows':number_of_rows,\
+                 'source':[status.st_mtime_ns,status.st_size]}
+    
+    # writes the description last so half written files are never read
+    with open(os.path.join(directory,'columns.json'),'w') as file:
+        
+        json.dump(description,file)
+        
+    return description
+
+def load_columns_description(file_name):
+    """ Returns the description of the column files of file_name, or 
+    None if there are none, they are turned off with USE_COLUMN_FILES or
+    file_name changed since they were written
+    
+    Args:
+        file_name: string for the .csv file name
+    """
+    
+    path=os.path.join(columns_directory(file_name),'columns.json')
+    
+    if not USE_COLUMN_FILES or not os.path.exists(path):
+        
+        return None
+    
+    with open(path) as file:
+        
+        description=json.load(file)
+        
+    # checks if the .csv file changed
+    status=os.stat(file_name)
+    
+    if description['source']!=[status.st_mtime_ns,status.st_size]:
+        
+        return None
+    
+    return description
+
+def read_columns(file_name,columns=None):
+    """ Returns a dictionary with the name of every column of file_name
+    in columns as key and its values as an array, in the order of the 
+    file. The arrays are memory-mapped from the column files when they 
+    are up to date, and only the columns asked for are read
+    
+    Args:
+        file_name: string for the .csv file name
+        
+        columns: optional list of the names or positions of the columns
+        to read, all of them if it is None
+    """
+    
+    description=load_columns_description(file_name)
+    
+    # checks if the .csv file has to be parsed
+    if description is None:
+        
+        df=pd.read_csv(file_name,usecols=columns)
+        
+        return {name:df[name].to_numpy() for name in df.columns}
+    
+    names=description['columns']
+    
+    # gets the positions of the columns
+    if columns is None:
+        
+        positions=range(len(names))
+        
+    else:
+        
+        positions=sorted(column if isinstance(column,int) else \
+                         names.index(column) for column in columns)
+        
+    directory=columns_directory(file_name)
+    
+    return {names[position]:np.load\
+            (os.path.join(directory,'%d.npy'%position),mmap_mode='r')\
+            for position in positions}
+
+def read_ratings_in_chunks(file_name,chunk_size=STREAM_CHUNK_SIZE,\
+                           columns=None):
+    """ Yields the ratings file as DataFrames of at most chunk_size rows 
+    with the compact types of RATINGS_DTYPES, from its column files when
+    they are up to date
+    
+    Args:
+        file_name: string for the ratings file name
+        
+        chunk_size: integer of how many rows to read at a time
+        
+        columns: optional list of the columns to read, all of them if
+        it is None
+    """
+    
+    description=load_columns_description(file_name)
+    
+    # checks if the column files can be read instead
+    if description is not None:
+        
+        arrays=read_columns(file_name,columns)
+        
+        for start in range(0,description['rows'],chunk_size):
+            
+            yield pd.DataFrame({name:np.asarray\
+                (values[start:start+chunk_size],\
+                 dtype=RATINGS_DTYPES.get(name))\
+                for name,values in arrays.items()})
+            
+        return
+    
+    with pd.read_csv(file_name,chunksize=chunk_size,usecols=columns,\
+                     dtype=RATINGS_DTYPES) as chunks:
+        
+        for chunk in chunks:
+            
+            yield chunk
@@ -0,0 +1,986 @@
+"""
+Recommending the movies the k nearest neighbours liked
+Scores the movies the neighbours saw but user_id did not, turns the 
+best of them into titles and recommends to many users at once, in one
+process or a pool of them
+"""
+
+import pandas as pd
+import numpy as np
+import scipy.sparse as sp
+import multiprocessing
+import os
+import tempfile
+
+from . import profiling
+from .neighbours import block_overlaps_and_distances,k_nearest_from_distances,\
+    k_nearest_neighbours,seen_and_ratings,sparse_user_ratings
+from .profiling import profiled_stage
+from .ratings_files import read_columns,read_ratings_in_chunks
+from .utility_matrix import CompactUtilityMatrix,get_user_index,\
+    load_utility_matrix_arrays,reverse_index_map,save_utility_matrix_arrays
+
+# the number of users recommend_many scores together
+RECOMMEND_BLOCK_SIZE=64
+
+# the model a worker process of recommend_parallel works on
+worker_model={}
+
+# the movie catalogues and user ratings indeces that were read, with 
+# the file name as key
+movie_catalogues={}
+user_ratings_indeces={}
+
+# the default number of movies recommended
+TOP_N=10
+
+def neighbour_ratings_of_movies\
+    (utility_matrix,k_nearest_dict,highest_rating,movie_indeces=None):
+    """ Returns a matrix seen with True for every movie a neighbour saw
+    and a matrix ratings with the ratings of those movies and 0 
+    otherwise, with a row for every neighbour in the order of 
+    k_nearest_dict and a column for every movie, or for every movie in
+    movie_indeces if it is given, in which case only those columns are
+    read
+    
+    Args:
+        utility_matrix: array (dense or sparse) of preferences for users 
+        and movies
+        
+        k_nearest_dict: dictionary with the user indeces of the 
+        neighbours as keys
+        
+        highest_rating: float which is the highest rating possible
+        
+        movie_indeces: optional array of the movie indeces of the 
+        columns to return
+    """
+    
+    neighbour_indeces=[int(user_index) for user_index in k_nearest_dict]
+    
+    # checks if the matrix is compact
+    if isinstance(utility_matrix,CompactUtilityMatrix):
+        
+        return [utility_matrix.rows_seen(neighbour_indeces,movie_indeces),\
+                utility_matrix.rows_ratings(neighbour_indeces,movie_indeces)]
+    
+    # gets the rows of the neighbours, with only the columns asked for
+    if movie_indeces is None:
+        
+        neighbour_rows=utility_matrix[neighbour_indeces,:]
+        
+    elif sp.issparse(utility_matrix):
+        
+        neighbour_rows=utility_matrix[neighbour_indeces][:,movie_indeces]
+        
+    else:
+        
+        neighbour_rows=utility_matrix[np.ix_(neighbour_indeces,movie_indeces)]
+        
+    # gets the seen movies and ratings of the rows of the neighbours
+    seen,ratings=seen_and_ratings(neighbour_rows,highest_rating)[:2]
+    
+    # checks if the matrix is sparse
+    if sp.issparse(utility_matrix):
+        
+        seen=seen.toarray()
+        ratings=ratings.toarray()
+        
+    return [seen>0,ratings]
+
+def user_has_seen\
+    (utility_matrix,user_index,highest_rating,movie_indeces=None):
+    """ Returns a boolean array with True for every movie user_index saw,
+    or for every movie in movie_indeces user_index saw if it is given
+    
+    Args:
+        utility_matrix: array (dense or sparse) of preferences for users 
+        and movies
+        
+        user_index: integer of the index of the user
+        
+        highest_rating: float which is the highest rating possible
+        
+        movie_indeces: optional array of the movie indeces to look at
+    """
+    
+    # checks if the matrix is sparse
+    if sp.issparse(utility_matrix):
+        
+        user_movies=sparse_user_ratings(utility_matrix,user_index)[0]
+        
+        if movie_indeces is not None:
+            
+            return np.isin(movie_indeces,user_movies)
+        
+        seen=np.zeros(utility_matrix.shape[1],dtype=bool)
+        seen[user_movies]=True
+        
+        return seen
+    
+    # checks if the matrix is compact
+    if isinstance(utility_matrix,CompactUtilityMatrix):
+        
+        return utility_matrix.rows_seen([user_index],movie_indeces)[0]
+    
+    if movie_indeces is not None:
+        
+        return utility_matrix[user_index,movie_indeces]>-16*highest_rating
+    
+    return utility_matrix[user_index,:]>-16*highest_rating
+
+def movies_in_order_first_seen(seen):
+    """ Returns an array with the columns of seen that have a True, 
+    ordered by the first row with a True and then by column, which is 
+    the order in which looping over the rows and then the columns finds 
+    them
+    
+    Args:
+        seen: boolean matrix with a row for every neighbour and a column
+        for every movie
+    """
+    
+    movie_indeces=np.flatnonzero(seen.any(axis=0))
+    
+    # gets the first neighbour who saw each movie
+    first_row=np.argmax(seen[:,movie_indeces],axis=0)
+    
+    return movie_indeces[np.argsort(first_row,kind='stable')]
+
+def scores_of_movies\
+    (seen,ratings,number_of_neighbours,highest_rating,weigh_by_popularity,\
+     log_weights=None):
+    """ Returns [has_count,scores], where has_count says which columns
+    were seen by at least one neighbour and scores has the average 
+    rating of those columns, weighted by how many neighbours saw them if
+    weigh_by_popularity is True. The sums and divisions are done in the
+    same order as adding up the neighbours one at a time, so the scores
+    are the same to the last bit. With log_weights, every rating counts
+    as its weight in the average and in how many neighbours saw a movie,
+    and the part of the score for how many neighbours saw a movie is 
+    kept between 0 and 1, since the weights can add up to less than 1.
+    The average is taken relative to the newest rating of every movie,
+    so it is never 0/0 however little the ratings weigh
+    
+    Args:
+        seen: boolean matrix with a row for every neighbour and a column
+        for every movie
+        
+        ratings: matrix of the same shape with the ratings of the seen
+        movies and 0 otherwise
+        
+        number_of_neighbours: integer of how many k_nearest neighbours 
+        there are
+        
+        highest_rating: float which is the highest rating possible
+        
+        weigh_by_popularity: boolean which say whether to weight the 
+        recommendation by the amount of k_nearest neighbours who saw 
+        the movie
+        
+        log_weights: optional matrix of the same shape with the base 2
+        logarithm of the weight of every rating by how recent it is and
+        -inf otherwise
+    """
+    
+    # checks if the ratings are weighted by how recent they are
+    if log_weights is not None:
+        
+        # leaves out the movies with no rating that weighs anything
+        newest=log_weights.max(axis=0)
+        has_count=newest>-np.inf
+        newest=newest[has_count]
+        
+        # weighs the ratings of every movie relative to its newest one,
+        # so their weights add up to at least 1
+        weights=np.exp2(log_weights[:,has_count]-newest)
+        relative_count=weights.sum(axis=0)
+        
+        # computes the weighted average ratings
+        rating=(weights*ratings[:,has_count]).sum(axis=0)/relative_count
+        
+        # gets the weighted count of the neighbours who saw every movie,
+        # which is 0 when its ratings are too old to weigh anything
+        count=relative_count*np.exp2(newest)
+        
+    else:
+        
+        count=seen.sum(axis=0)
+        rating=np.zeros(seen.shape[1])
+        
+        # adds up the ratings one neighbour at a time
+        for neighbour_ratings in ratings:
+            
+            rating=rating+neighbour_ratings
+            
+        # leaves out the movies no neighbour saw
+        has_count=count>0
+        count=count[has_count]
+        
+        # computes the average ratings
+        rating=rating[has_count]/count
+    
+    if (weigh_by_popularity==True) and (number_of_neighbours-1)>0:
+        
+        popularity=(count-1)/(number_of_neighbours-1)
+        
+        # keeps the weighted count of the neighbours who watched in the
+        # range of the count
+        if log_weights is not None:
+            
+            popularity=np.clip(popularity,0,1)
+        
+        # adjusts the average rating to the number of neighbours 
+        # who watched
+        rating=(rating+highest_rating*popularity)/(2*highest_rating)
+        
+    # counts the movies scored while profiling
+    if profiling.profiler is not None:
+        
+        profiling.profiler.count_items(candidates_scored=len(rating))
+        
+    return [has_count,rating]
+
+@profiled_stage('list_of_movies_user_id_has_not_seen')
+def list_of_movies_user_id_has_not_seen\
+    (utility_matrix,user_index_to_id,movie_index_to_id,
+     k_nearest,user_id,highest_rating,user_id_to_index=None,\
+     movie_indeces=None):
+    """ Returns a list called movies_user_id_hasnt_seen 
+    which lists the movie indeces that the k_nearest neighbours saw,
+    but user_id did not. If movie_indeces is given only those movies,
+    such as the ones of a genre, are looked at and read
+    
+    Args:
+        utility_matrix: array (dense or sparse) with user index and movie 
+        index for movie preferences
+        
+        user_index_to_id: dictionary that maps user_index to user_id
+        
+        movie_index_to_id: dictionary that maps movie_index to movie_id
+        
+        k_nearest: dictionary of the overlapping movies
+        
+        user_id: integer of the id of the user we are recommending movies to
+        
+        highest_rating: the highest possible rating for a movie
+        
+        user_id_to_index: optional dictionary that maps user_id to 
+        user_index
+        
+        movie_indeces: optional sorted array of the movie indeces to 
+        recommend from, such as one of genre_movie_indeces
+    """
+    
+    # checks if there are neighbours to take movies from
+    if len(k_nearest)==0:
+        
+        return []
+    
+    # gets the user index for keys that are equal to user_id
+    user_index=get_user_index(user_index_to_id,user_id,user_id_to_index)
+    
+    # marks the movies each neighbour saw but user_id did not
+    seen=neighbour_ratings_of_movies(utility_matrix,k_nearest,\
+                                     highest_rating,movie_indeces)[0]
+    seen&=~user_has_seen(utility_matrix,user_index,highest_rating,\
+                         movie_indeces)
+    
+    # checks if the columns are the movies of movie_indeces
+    if movie_indeces is not None:
+        
+        return np.asarray(movie_indeces)\
+            [movies_in_order_first_seen(seen)].tolist()
+    
+    return movies_in_order_first_seen(seen).tolist()
+
+@profiled_stage('average_rating_of_movies_user_has_not_seen')
+def average_rating_of_movies_user_has_not_seen\
+    (utility_matrix,movies_user_id_hasnt_seen,user_index_to_id,\
+     movie_index_to_id,k_nearest_dict,user_id,highest_rating,\
+     weigh_by_popularity):
+    """ Returns the average rating of a movie the k_nearest neighbours gave
+    to a movie that user_id has not seen yet and someone in the 
+    k_neighbours liked
+    
+    Args:
+        utility_matrix: array (dense or sparse) of utility matrix based on 
+        user index and movie index which corresponds to a rating
+        
+        movies_user_id_hasnt_seen: a list of movie_indeces that user_id
+        has not yet seen, but were seen the k_nearest neighbours
+        
+        user_index_to_id: dictionary that maps user_index to user_id
+        
+        movie_index_to_id: dictionarythat maps movie_index to movie_id
+        
+        k_nearest_dict: dictionary of k_neaerest neighbours and how
+        similar they are to user_id in their preferences over movies
+        they both saw
+                
+        user_id: integer which the id of the user we are recommending movies to
+        
+        highest_rating: flaot which is the highest rating possible for a movie
+        
+        weight_by_populariy: boolean which say whether to weight the 
+        recommendation by the amount of k_nearest neighbours who saw the movie
+        
+    A movie in movies_user_id_hasnt_seen that none of the k_nearest 
+    neighbours saw has no average rating, so it is left out of the
+    dictionary instead of dividing by a count of 0
+    """
+    
+    # checks if there are movies to rate
+    if len(movies_user_id_hasnt_seen)==0 or len(k_nearest_dict)==0:
+        
+        return {}
+    
+    # gets the ratings the neighbours gave to the movies, reading only
+    # their columns
+    movie_indeces=[int(movie_index) \
+                   for movie_index in movies_user_id_hasnt_seen]
+    seen,ratings=neighbour_ratings_of_movies\
+        (utility_matrix,k_nearest_dict,highest_rating,movie_indeces)
+    
+    has_count,scores=scores_of_movies\
+        (seen,ratings,len(k_nearest_dict),highest_rating,\
+         weigh_by_popularity)
+    
+    return dict(zip([movie_index for movie_index,counted in \
+                     zip(movies_user_id_hasnt_seen,has_count) if counted],\
+                    scores.tolist()))
+
+@profiled_stage('unseen_movie_scores')
+def unseen_movie_scores\
+    (utility_matrix,user_index_to_id,k_nearest_dict,user_id,\
+     highest_rating,weigh_by_popularity,user_id_to_index=None,\
+     time_model=None,movie_indeces=None):
+    """ Returns [movies_user_id_hasnt_seen,average_ratings], the same as
+    list_of_movies_user_id_has_not_seen and 
+    average_rating_of_movies_user_has_not_seen give, from one pass over 
+    the rows of the k_nearest neighbours. With a time_model that weighs
+    the ratings by how recent they are, the average ratings are weighted.
+    If movie_indeces is given only those movies are scored, and only
+    their columns are read
+    
+    Args:
+        utility_matrix: array (dense or sparse) of preferences for users 
+        and movies
+        
+        user_index_to_id: dictionary that maps user_index to user_id
+        
+        k_nearest_dict: dictionary of k_neaerest neighbours and how
+        similar they are to user_id in their preferences
+        
+        user_id: integer of the id of the user we are recommending movies to
+        
+        highest_rating: float which is the highest rating possible
+        
+        weigh_by_popularity: boolean which say whether to weight the 
+        recommendation by the amount of k_nearest neighbours who saw 
+        the movie
+        
+        user_id_to_index: optional dictionary that maps user_id to 
+        user_index
+        
+        time_model: optional dictionary from create_time_model of the
+        sparse utility_matrix
+        
+        movie_indeces: optional sorted array of the movie indeces to 
+        recommend from, such as one of genre_movie_indeces
+    """
+    
+    # checks if there are neighbours to take movies from
+    if len(k_nearest_dict)==0:
+        
+        return [[],{}]
+    
+    user_index=get_user_index(user_index_to_id,user_id,user_id_to_index)
+    
+    # marks the movies each neighbour saw but user_id did not
+    seen,ratings=neighbour_ratings_of_movies(utility_matrix,\
+        k_nearest_dict,highest_rating,movie_indeces)
+    seen&=~user_has_seen(utility_matrix,user_index,highest_rating,\
+                         movie_indeces)
+    
+    columns=movies_in_order_first_seen(seen)
+    
+    # gets the movie indeces of the columns
+    if movie_indeces is None:
+        
+        movie_indeces=columns
+        
+    else:
+        
+        movie_indeces=np.asarray(movie_indeces)[columns]
+    
+    log_weights=None
+    
+    # gets the logarithms of the weights of the ratings of the 
+    # neighbours, with -inf for the movies they did not see
+    if time_model is not None and time_model['log_weights'] is not None:
+        
+        log_weights=np.where\
+            (seen[:,columns],\
+             time_model['log_weights']\
+             [[int(user_index) for user_index in k_nearest_dict]]\
+             [:,movie_indeces].toarray()+time_model['log_weight_scale'],\
+             -np.inf)
+    
+    # every movie in the list was seen by a neighbour, so every count
+    # is at least 1
+    scores=scores_of_movies\
+        (seen[:,columns],ratings[:,columns],\
+         len(k_nearest_dict),highest_rating,weigh_by_popularity,\
+         log_weights)[1]
+    
+    movies_user_id_hasnt_seen=movie_indeces.tolist()
+    
+    return [movies_user_id_hasnt_seen,\
+            dict(zip(movies_user_id_hasnt_seen,scores.tolist()))]
+
+def load_once(loaded_files,file_name,loader):
+    """ Returns loader(file_name), reading the file only the first time
+    it is asked for and again if it changed since then
+    
+    Args:
+        loaded_files: dictionary with the file name as key and 
+        [modified time, size, loaded value] as value
+        
+        file_name: string for the file name
+        
+        loader: function that reads file_name
+    """
+    
+    # gets when the file was last modified and its size
+    status=os.stat(file_name)
+    
+    # checks if the file was not loaded or it changed
+    if file_name not in loaded_files or \
+        loaded_files[file_name][:2]!=[status.st_mtime_ns,status.st_size]:
+        
+        loaded_files[file_name]=\
+            [status.st_mtime_ns,status.st_size,loader(file_name)]
+            
+    return loaded_files[file_name][2]
+
+def create_movie_catalogue(movie_id_file_name):
+    """ Returns a dictionary movie_catalogue with the movie_id as key and
+    a dictionary with its title and genres as value. If a movie_id is
+    listed twice its first title is kept
+    
+    Args:
+        movie_id_file_name: string for the movie id file name
+    """
+    
+    # read the movies_id and names as a DataFrame
+    df_movies=pd.DataFrame(read_columns\
+        (movie_id_file_name,['movieId','title','genres'])).\
+        drop_duplicates(subset='movieId',keep='first')
+    
+    return {movie_id:{'title':title,'genres':genres} for movie_id,title,genres\
+            in zip(df_movies['movieId'].tolist(),df_movies['title'].tolist(),\
+                   df_movies['genres'].tolist())}
+
+def get_movie_catalogue(movie_id_file_name):
+    """ Returns the movie_catalogue of movie_id_file_name, which is 
+    only read again if the file changed
+    
+    Args:
+        movie_id_file_name: string for the movie id file name
+    """
+    
+    return load_once(movie_catalogues,movie_id_file_name,\
+                     create_movie_catalogue)
+
+def create_genre_index(movie_catalogue,movie_index_to_id):
+    """ Returns a dictionary genre_index with every genre of the movies
+    in movie_catalogue as key and a sorted array of the movie indeces of
+    its movies as value, so the movies of a genre are looked up instead
+    of checking the genres of every movie. Movies that are not in the
+    catalogue have no genre
+    
+    Args:
+        movie_catalogue: dictionary from create_movie_catalogue
+        
+        movie_index_to_id: dictionary that maps movie_index to movie_id
+    """
+    
+    genre_movies={}
+    
+    # adds every movie to the lists of its genres, which are separated
+    # by a |
+    for movie_index,movie_id in movie_index_to_id.items():
+        
+        movie=movie_catalogue.get(int(movie_id))
+        
+        if movie is None:
+            
+            continue
+        
+        for genre in str(movie['genres']).split('|'):
+            
+            genre_movies.setdefault(genre,[]).append(int(movie_index))
+            
+    return {genre:np.sort(np.array(movie_indeces,dtype=np.int64))\
+            for genre,movie_indeces in genre_movies.items()}
+
+def genre_movie_indeces(genre_index,genres):
+    """ Returns a sorted array of the movie indeces of the movies which 
+    have at least one of genres. A genre that is not in genre_index has
+    no movies
+    
+    Args:
+        genre_index: dictionary from create_genre_index
+        
+        genres: string of a genre or list of genres
+    """
+    
+    if isinstance(genres,str):
+        
+        genres=[genres]
+        
+    return np.unique(np.concatenate\
+        ([genre_index.get(genre,np.zeros(0,dtype=np.int64)) \
+          for genre in genres]+[np.zeros(0,dtype=np.int64)]))
+
+def create_user_ratings_index(file_name):
+    """ Returns a dictionary user_ratings_index with the ratings sorted 
+    by user. 'user_offsets' maps a user_id to the [start,end] of their
+    ratings in the arrays 'movie_ids' and 'ratings', which keep the 
+    order of the file for every user
+    
+    Args:
+        file_name: string for the ratings file name
+    """
+    
+    # reads the rating .csv file a chunk at a time without the timestamps
+    chunks=list(read_ratings_in_chunks\
+        (file_name,columns=['userId','movieId','rating']))
+    
+    user_ids,movie_ids,ratings=\
+        [np.concatenate([chunk[column].to_numpy() for chunk in chunks])\
+         for column in ['userId','movieId','rating']]
+    del chunks
+    
+    # sorts the ratings by user keeping the order of the file
+    order=np.argsort(user_ids,kind='stable')
+    user_ids=user_ids[order]
+    
+    # finds where the ratings of every user start and end
+    starts=np.flatnonzero(np.r_[True,user_ids[1:]!=user_ids[:-1]])
+    ends=np.r_[starts[1:],len(user_ids)]
+    
+    return {'user_offsets':{user_id:[start,end] for user_id,start,end\
+                in zip(user_ids[starts].tolist(),starts.tolist(),\
+                       ends.tolist())},
+            'movie_ids':movie_ids[order],
+            'ratings':ratings[order]}
+
+def get_user_ratings_index(file_name):
+    """ Returns the user_ratings_index of file_name, which is only 
+    read again if the file changed
+    
+    Args:
+        file_name: string for the ratings file name
+    """
+    
+    return load_once(user_ratings_indeces,file_name,\
+                     create_user_ratings_index)
+
+def top_n_recommendations\
+    (average_ratings,movie_index_to_id,top_n=TOP_N,\
+     movie_id_file_name='movies_ids.csv',movie_catalogue=None):
+    """ Returns a list of (movie_id,title,score) tuples of the top_n 
+    movies in average_ratings from the highest score to the lowest.
+    
+    Movies with the same title count once, with the place of the first 
+    and the score of the last, as in a dictionary keyed by title. Only
+    the top_n scores are selected with argpartition and sorted, and 
+    movies with the same score keep the order of average_ratings
+    
+    Args:
+        average_ratings: dictionary with movie_index as key 
+        and its rating as value
+        
+        movie_index_to_id: dictionary with movie_index as key 
+        and movie_id as value
+        
+        top_n: integer of how many movies to return
+        
+        movie_id_file_name: string for the name of the movie_id file
+        
+        movie_catalogue: optional dictionary from create_movie_catalogue.
+        If it is None the catalogue of movie_id_file_name is used
+    """
+    
+    # gets the titles of the movies
+    if movie_catalogue is None:
+        
+        movie_catalogue=get_movie_catalogue(movie_id_file_name)
+        
+    # maps every title to its place, movie_id and score
+    recommendation_dict={}
+    
+    for movie_index,score in average_ratings.items():
+        
+        # gets the movie_id based on the movie index
+        movie_id=int(movie_index_to_id[str(int(movie_index))])
+        
+        # gets the name of the movie with movie_id
+        movie_title=movie_catalogue[movie_id]['title']
+        
+        place=recommendation_dict[movie_title][0] \
+            if movie_title in recommendation_dict else \
+            len(recommendation_dict)
+        
+        recommendation_dict[movie_title]=[place,movie_id,score]
+        
+    # checks if there is anything to select
+    if top_n<=0 or len(recommendation_dict)==0:
+        
+        return []
+    
+    # puts the entries in the order of their place
+    entries=sorted(recommendation_dict.items(),key=lambda item:item[1][0])
+    scores=np.array([entry[1][2] for entry in entries],dtype=float)
+    
+    # checks if only some of the movies are kept
+    if top_n<len(scores):
+        
+        # finds the top_n-th highest score and keeps every movie above
+        # it and the first movies with that same score
+        threshold=-np.partition(-scores,top_n-1)[top_n-1]
+        above=np.flatnonzero(scores>threshold)
+        tied=np.flatnonzero(scores==threshold)[:top_n-len(above)]
+        places=np.concatenate((above,tied))
+        
+    else:
+        
+        places=np.arange(len(scores))
+        
+    # sorts the kept movies by score and then by place
+    places=places[np.lexsort((places,-scores[places]))]
+    
+    return [(entries[place][1][1],entries[place][0],\
+             float(entries[place][1][2])) for place in places.tolist()]
+
+@profiled_stage('create_recommendation_list')
+def create_recommendation_list\
+    (average_ratings,movie_index_to_id,\
+    movie_id_file_name='movies_ids.csv',movie_catalogue=None,top_n=TOP_N):
+    """ Returns sorted list top_10_movies from highest to lower 
+    of movies with their rating
+    
+    Args:
+        average_ratings: dictionary with movie_index as key 
+        and its rating as value
+        movie_index_to_id: dictionary with movie_index as key 
+        and movie_id as value
+        movie_id_file_name: string for the name of the movie_id file
+        movie_catalogue: optional dictionary from create_movie_catalogue.
+        If it is None the catalogue of movie_id_file_name is used
+        top_n: integer of how many titles to return
+    """
+    
+    top_10_movies=top_n_recommendations\
+        (average_ratings,movie_index_to_id,top_n,movie_id_file_name,\
+         movie_catalogue)
+        
+    return [title for movie_id,title,score in top_10_movies]
+
+def top_movies_rated_by_user_id\
+    (user_id,file_name,movie_id_file_name,user_ratings_index=None,\
+     movie_catalogue=None):
+    """ Returns the list of top 10 rated movies by user_id
+    
+    Args:
+        user_id: integer referring to the user id
+        file_name: string for the file name
+        movie_id_file_name: string for the movie id file name    
+        user_ratings_index: optional dictionary from 
+        create_user_ratings_index. If it is None the index of file_name
+        is used
+        movie_catalogue: optional dictionary from create_movie_catalogue.
+        If it is None the catalogue of movie_id_file_name is used
+    """
+    
+    # gets the ratings sorted by user and the titles of the movies
+    if user_ratings_index is None:
+        
+        user_ratings_index=get_user_ratings_index(file_name)
+        
+    if movie_catalogue is None:
+        
+        movie_catalogue=get_movie_catalogue(movie_id_file_name)
+        
+    # gets where the ratings of user_id are
+    start,end=user_ratings_index['user_offsets'].get(user_id,[0,0])
+    
+    # get the movies sorted by ratings for user id=user_id and gives the
+    # top 10
+    user_ratings=pd.DataFrame\
+        ({'movieId':user_ratings_index['movie_ids'][start:end],\
+          'rating':user_ratings_index['ratings'][start:end].astype(float)}).\
+        sort_values(by='rating',ascending=False).head(10)
+    
+    # gets the titles of the movies that are in the catalogue
+    return [movie_catalogue[movie_id]['title'] for movie_id in\
+            user_ratings['movieId'].tolist() if movie_id in movie_catalogue]
+
+def recommend_many\
+    (utility_matrix,user_index_to_id,movie_index_to_id,user_ids,\
+     k_nearest,highest_rating,minimum_movies_both_users_have_to_watch,\
+     weight_on_taste,weigh_by_popularity,\
+     movie_id_file_name='movies_ids.csv',user_id_to_index=None,\
+     block_size=RECOMMEND_BLOCK_SIZE,top_n=TOP_N,user_statistics=None,\
+     movie_indeces=None):
+    """ Yields a list [user_id,recommendation_list] for every user_id in
+    user_ids, in the same order, with the same recommendation_list 
+    as calling k_nearest_neighbours, list_of_movies_user_id_has_not_seen,
+    average_rating_of_movies_user_has_not_seen and 
+    create_recommendation_list for that user_id.
+    
+    The neighbours of block_size users are scored together with matrix
+    products, so only block_size rows of overlaps and distances are held
+    in memory at a time.
+    
+    Args:
+        utility_matrix: array (dense or sparse) of preferences for users 
+        and movies
+        
+        user_index_to_id: dictionary that maps user_index to user_id
+        
+        movie_index_to_id: dictionary that maps movie_index to movie_id
+        
+        user_ids: list of the ids of the users we are recommending to
+        
+        k_nearest: integer of how many neighbours to look for
+        
+        highest_rating: float which is the highest rating possible
+        
+        minimum_movies_both_users_have_to_watch: integer of how
+        many movies both user have to watch to consider adding the user
+        as a nearest neighbour
+        
+        weight_on_taste: float between 0 and 1 which determines the
+        amount of weight on how similar the taste is
+        
+        weigh_by_popularity: boolean which say whether to weight the 
+        recommendation by the amount of k_nearest neighbours who saw 
+        the movie
+        
+        movie_id_file_name: string for the name of the movie_id file
+        
+        user_id_to_index: optional dictionary that maps user_id to 
+        user_index
+        
+        block_size: integer of how many users are scored together
+        
+        top_n: integer of how many titles to recommend to every user
+        
+        user_statistics: optional dictionary from create_user_statistics,
+        whose sparse 'ratings_by_user' is multiplied instead of 
+        utility_matrix. When its ratings are weighted by how recent they
+        are, every user is scored on their own with the weights, the 
+        same as k_nearest_neighbours and unseen_movie_scores do
+        
+        movie_indeces: optional sorted array of the movie indeces to 
+        recommend from, such as one of genre_movie_indeces
+    """
+    
+    # checks if the ratings are weighted by how recent they are, whose
+    # overlaps and distances are not matrix products
+    if user_statistics is not None and \
+        'log_weights_by_user' in user_statistics:
+        
+        for user_id in user_ids:
+            
+            k_nearest_dict=k_nearest_neighbours\
+                (utility_matrix,user_index_to_id,k_nearest,user_id,\
+                 highest_rating,minimum_movies_both_users_have_to_watch,\
+                 weight_on_taste,user_id_to_index,user_statistics)[0]
+            
+            average_ratings=unseen_movie_scores\
+                (utility_matrix,user_index_to_id,k_nearest_dict,user_id,\
+                 highest_rating,weigh_by_popularity,user_id_to_index,\
+                 user_statistics['time_model'],movie_indeces)[1]
+            
+            yield [user_id,create_recommendation_list\
+                (average_ratings,movie_index_to_id,movie_id_file_name,\
+                 top_n=top_n)]
+            
+        return
+    
+    # gets the seen movies and ratings in the form used for the
+    # matrix products, sparse if the tables have them
+    seen,ratings,squared_ratings=seen_and_ratings\
+        (utility_matrix if user_statistics is None else \
+         user_statistics['ratings_by_user'],highest_rating)
+    
+    # loops over the blocks of users
+    for start in range(0,len(user_ids),block_size):
+        
+        block_user_ids=user_ids[start:start+block_size]
+        
+        # gets the user indeces of the block
+        user_indeces=np.array([get_user_index\
+            (user_index_to_id,user_id,user_id_to_index)\
+            for user_id in block_user_ids])
+        
+        # counts the overlaps and measures the distances of the block
+        number_of_movies_both_saw,distance_scalar=\
+            block_overlaps_and_distances\
+            (seen,ratings,squared_ratings,user_indeces)
+        
+        # counts the users compared with the block and the movies they
+        # share while profiling
+        if profiling.profiler is not None:
+            
+            profiling.profiler.count_items\
+                (users_scanned=number_of_movies_both_saw.size,\
+                 overlaps_computed=int(number_of_movies_both_saw.sum()))
+            
+        # loops over the users of the block
+        for row in range(len(block_user_ids)):
+            
+            # finds the k nearest neighbours of the user
+            k_nearest_dict=k_nearest_from_distances\
+                (number_of_movies_both_saw[row],distance_scalar[row],\
+                 user_indeces[row],k_nearest,\
+                 minimum_movies_both_users_have_to_watch,weight_on_taste)[0]
+            
+            # finds all the movies the neighbours saw but the user has 
+            # not and calculates their average ratings
+            average_ratings=unseen_movie_scores\
+                (utility_matrix,user_index_to_id,k_nearest_dict,\
+                 block_user_ids[row],highest_rating,weigh_by_popularity,\
+                 user_id_to_index,movie_indeces=movie_indeces)[1]
+            
+            yield [block_user_ids[row],create_recommendation_list\
+                (average_ratings,movie_index_to_id,movie_id_file_name,\
+                 top_n=top_n)]
+
+def start_recommend_worker(description,user_index_to_id,movie_index_to_id,\
+                           user_id_to_index,parameters):
+    """ Loads the shared utility_matrix and the parameters of 
+    recommend_many into worker_model when a worker process starts
+    
+    Args:
+        description: dictionary returned by save_utility_matrix_arrays
+        
+        user_index_to_id: dictionary that maps user_index to user_id
+        
+        movie_index_to_id: dictionary that maps movie_index to movie_id
+        
+        user_id_to_index: dictionary that maps user_id to user_index
+        
+        parameters: list of k_nearest, highest_rating, 
+        minimum_movies_both_users_have_to_watch, weight_on_taste,
+        weigh_by_popularity, movie_id_file_name, top_n and movie_indeces
+    """
+    
+    worker_model['utility_matrix']=load_utility_matrix_arrays(description)
+    worker_model['user_index_to_id']=user_index_to_id
+    worker_model['movie_index_to_id']=movie_index_to_id
+    worker_model['user_id_to_index']=user_id_to_index
+    worker_model['parameters']=parameters
+
+def recommend_worker(user_ids):
+    """ Returns the list of [user_id,recommendation_list] of user_ids
+    computed by recommend_many with the model of the worker process
+    
+    Args:
+        user_ids: list of the ids of the users we are recommending to
+    """
+    
+    k_nearest,highest_rating,minimum_movies_both_users_have_to_watch,\
+        weight_on_taste,weigh_by_popularity,movie_id_file_name,top_n,\
+        movie_indeces=worker_model['parameters']
+    
+    return list(recommend_many\
+        (worker_model['utility_matrix'],worker_model['user_index_to_id'],\
+         worker_model['movie_index_to_id'],user_ids,k_nearest,\
+         highest_rating,minimum_movies_both_users_have_to_watch,\
+         weight_on_taste,weigh_by_popularity,movie_id_file_name,\
+         worker_model['user_id_to_index'],len(user_ids),top_n,\
+         movie_indeces=movie_indeces))
+
+def recommend_parallel\
+    (utility_matrix,user_index_to_id,movie_index_to_id,user_ids,\
+     k_nearest,highest_rating,minimum_movies_both_users_have_to_watch,\
+     weight_on_taste,weigh_by_popularity,\
+     movie_id_file_name='movies_ids.csv',user_id_to_index=None,\
+     number_of_workers=None,block_size=RECOMMEND_BLOCK_SIZE,top_n=TOP_N,\
+     movie_indeces=None):
+    """ Returns a list of [user_id,recommendation_list] for every user_id
+    in user_ids, in the same order and with the same lists as 
+    recommend_many, using a pool of number_of_workers processes.
+    
+    user_ids is split into blocks of block_size users which are given 
+    to the workers. The utility_matrix is saved once to a temporary 
+    directory and memory-mapped by every worker, so it is not copied 
+    into each of them. The ratings are never weighted by how recent 
+    they are, recommend_many with the weighted tables does that.
+    
+    Args:
+        utility_matrix, user_index_to_id, movie_index_to_id, user_ids,
+        k_nearest, highest_rating, minimum_movies_both_users_have_to_watch,
+        weight_on_taste, weigh_by_popularity, movie_id_file_name: 
+        same as for recommend_many
+        
+        user_id_to_index: optional dictionary that maps user_id to 
+        user_index
+        
+        number_of_workers: integer of how many processes to use. 
+        Uses the number of CPUs if it is None
+        
+        block_size: integer of how many users are given to a worker 
+        at a time
+        
+        top_n: integer of how many titles to recommend to every user
+        
+        movie_indeces: optional sorted array of the movie indeces to 
+        recommend from, such as one of genre_movie_indeces
+    """
+    
+    # builds the reverse map once so the workers do not scan
+    if user_id_to_index is None:
+        
+        user_id_to_index=reverse_index_map(user_index_to_id)
+    
+    # splits the users into blocks
+    blocks=[list(user_ids[start:start+block_size])\
+            for start in range(0,len(user_ids),block_size)]
+    
+    # forks the workers where possible so they start without 
+    # importing the module again
+    if 'fork' in multiprocessing.get_all_start_methods():
+        
+        context=multiprocessing.get_context('fork')
+        
+    else:
+        
+        context=multiprocessing.get_context()
+    
+    with tempfile.TemporaryDirectory() as directory:
+        
+        # saves the matrix for the workers to map
+        description=save_utility_matrix_arrays(utility_matrix,directory)
+        
+        with context.Pool\
+            (number_of_workers,initializer=start_recommend_worker,\
+             initargs=(description,user_index_to_id,movie_index_to_id,\
+             user_id_to_index,[k_nearest,highest_rating,\
+             minimum_movies_both_users_have_to_watch,weight_on_taste,\
+             weigh_by_popularity,movie_id_file_name,top_n,\
+             movie_indeces])) as pool:
+            
+            # gets the blocks back in the order they were given
+            recommendations=[]
+            
+            for block_recommendations in pool.imap(recommend_worker,blocks):
+                
+                recommendations.extend(block_recommendations)
+                
+    return recommendations
@@ -0,0 +1,832 @@
+"""
+Recommender, which keeps a model of the recommender system in memory
+The model is built, or mapped from a snapshot, the first time it is
+queried or when load is called. The modules of the pipeline, and numpy,
+pandas and scipy with them, are only imported then, so importing this
+module and creating a Recommender take no time
+"""
+
+import contextlib
+import threading
+
+class ReadWriteLock:
+    """ Lock that many threads can hold to read at once, or one thread
+    to write. A writer waits until every reader is done, and new readers
+    wait while a writer waits, so writers are not starved. A thread that
+    already reads can read again without waiting
+    """
+
+    def __init__(self):
+
+        self.condition=threading.Condition()
+        self.readers=0
+        self.waiting_writers=0
+        self.is_writing=False
+
+        # how many times every thread is reading
+        self.local=threading.local()
+
+    @contextlib.contextmanager
+    def reading(self):
+        """ Holds the lock to read for the block """
+
+        depth=getattr(self.local,'depth',0)
+
+        # checks if the thread does not read yet
+        if depth==0:
+
+            with self.condition:
+
+                while self.is_writing or self.waiting_writers>0:
+
+                    self.condition.wait()
+
+                self.readers+=1
+
+        self.local.depth=depth+1
+
+        try:
+
+            yield
+
+        finally:
+
+            self.local.depth=depth
+
+            if depth==0:
+
+                with self.condition:
+
+                    self.readers-=1
+
+                    if self.readers==0:
+
+                        self.condition.notify_all()
+
+    @contextlib.contextmanager
+    def writing(self):
+        """ Holds the lock to write for the block """
+
+        with self.condition:
+
+            self.waiting_writers+=1
+
+            try:
+
+                while self.is_writing or self.readers>0:
+
+                    self.condition.wait()
+
+            finally:
+
+                self.waiting_writers-=1
+
+            self.is_writing=True
+
+        try:
+
+            yield
+
+        finally:
+
+            with self.condition:
+
+                self.is_writing=False
+                self.condition.notify_all()
+
+class Recommender:
+    """ Recommends movies to the users of a ratings file from a model
+    kept in memory.
+
+    The model is built the same way as the example script builds it,
+    the first time it is queried or when load is called to warm it up.
+    The recommendations are cached until ratings are added, and it can
+    be queried from many threads. A query reads the model under the read
+    lock, and adding ratings or moving the window on changes it under
+    the write lock, so a query never sees a model being changed. Every
+    change makes the cached results of the model before it unused. The
+    knobs of a query that are not given take the values the Recommender
+    was created with.
+
+    Args:
+        file_name: string for the ratings file name
+
+        movie_id_file_name: string for the movie id file name
+
+        highest_rating: float which is the highest rating possible
+
+        k_nearest: integer of how many neighbours to look for
+
+        weight_on_taste: float between 0 and 1 which determines the
+        amount of weight on how similar the taste is
+
+        minimum_movies_both_users_have_to_watch: integer of how
+        many movies both user have to watch to consider adding the user
+        as a nearest neighbour
+
+        weigh_by_popularity: boolean which say whether to weight the
+        recommendation by the amount of k_nearest neighbours who saw
+        the movie
+
+        top_n: integer of how many titles to recommend, None for TOP_N
+
+        snapshot_directory: string of the directory the adjusted utility
+        matrix is saved in and loaded from, None for no snapshot
+
+        use_sparse_utility_matrix: boolean which says whether to store
+        the utility matrix as a sparse matrix
+
+        use_streaming_ingestion: boolean which says whether to read the
+        ratings file in chunks, which also makes the utility matrix
+        sparse
+
+        use_compact_utility_matrix: boolean which says whether to keep
+        the ratings as a CompactUtilityMatrix, to which ratings can not
+        be added
+
+        use_user_statistics: boolean which says whether to build the
+        tables of create_user_statistics, so the neighbours are found
+        without comparing the rows of every user
+
+        cache_size: integer of how many results are cached, None for
+        RECOMMENDATION_CACHE_SIZE
+
+        cache_ttl: float of how many seconds a result is cached, None
+        for RECOMMENDATION_CACHE_TTL
+
+        time_window_days: float of how many days before as_of a rating
+        can be given to be kept in the model, None to keep all of them
+
+        half_life_days: float of how many days it takes the weight of a
+        rating in the distances and scores to halve, None to weigh every
+        rating the same. It needs use_user_statistics, which it sets
+
+        as_of: integer of the timestamp the window ends at, None for the
+        time of the latest rating
+
+    The model of a time window or a half life is sparse, and can not be
+    compact or saved as a snapshot. advance_time_window moves it on
+    """
+
+    def __init__(self,file_name='ratings_list.csv',\
+                 movie_id_file_name='movies_ids.csv',highest_rating=5,\
+                 k_nearest=10,weight_on_taste=0.2,\
+                 minimum_movies_both_users_have_to_watch=1,\
+                 weigh_by_popularity=True,top_n=None,\
+                 snapshot_directory=None,use_sparse_utility_matrix=False,\
+                 use_streaming_ingestion=False,\
+                 use_compact_utility_matrix=False,use_user_statistics=True,\
+                 cache_size=None,cache_ttl=None,time_window_days=None,\
+                 half_life_days=None,as_of=None):
+
+        self.use_time_model=time_window_days is not None or \
+            half_life_days is not None
+
+        if self.use_time_model and \
+            (snapshot_directory is not None or use_compact_utility_matrix):
+
+            raise ValueError('a model with a time window or a half life '\
+                             'can not be compact or use a snapshot')
+
+        self.file_name=file_name
+        self.movie_id_file_name=movie_id_file_name
+        self.highest_rating=highest_rating
+        self.k_nearest=k_nearest
+        self.weight_on_taste=weight_on_taste
+        self.minimum_movies_both_users_have_to_watch=\
+            minimum_movies_both_users_have_to_watch
+        self.weigh_by_popularity=weigh_by_popularity
+        self.top_n=top_n
+        self.snapshot_directory=snapshot_directory
+        self.use_streaming_ingestion=use_streaming_ingestion
+        self.use_compact_utility_matrix=use_compact_utility_matrix
+        self.use_user_statistics=use_user_statistics
+        self.cache_size=cache_size
+        self.cache_ttl=cache_ttl
+        self.time_window_days=time_window_days
+        self.half_life_days=half_life_days
+        self.as_of=as_of
+
+        # the streamed utility matrix and the one of a time window are
+        # always sparse
+        self.use_sparse_utility_matrix=use_sparse_utility_matrix or \
+            use_streaming_ingestion or self.use_time_model
+
+        # the weights of a half life are in the tables of the statistics
+        if half_life_days is not None:
+
+            self.use_user_statistics=True
+
+        # the model, which load fills in
+        self.utility_matrix=None
+        self.user_index_to_id=None
+        self.movie_index_to_id=None
+        self.user_id_to_index=None
+        self.movie_id_to_index=None
+        self.rating_shifts=None
+        self.user_statistics=None
+        self.co_rating_index=None
+        self.recommendation_cache=None
+        self.time_model=None
+        self.genre_index=None
+
+        # the number of times the model was changed, which the keys of
+        # the cached results have
+        self.model_version=0
+
+        self.lock=ReadWriteLock()
+
+        # lets one reader at a time build the indexes that are built the
+        # first time they are needed, which writers reset while no
+        # reader holds the lock
+        self.index_lock=threading.Lock()
+
+    @property
+    def is_loaded(self):
+        """ Returns whether the model was built """
+
+        return self.utility_matrix is not None
+
+    def load(self):
+        """ Returns the Recommender after building its model if it was
+        not built yet. Call it to warm the model up before the first
+        query
+        """
+
+        # checks if the model still has to be built, only once when
+        # many threads ask at the same time
+        if not self.is_loaded:
+
+            with self.lock.writing():
+
+                if not self.is_loaded:
+
+                    self.build_model()
+
+        return self
+
+    def build_model(self):
+        """ Builds the utility matrix, or maps it from the snapshot when
+        the snapshot is up to date, and the tables and the cache the
+        queries use
+        """
+
+        # imports the pipeline only now, so importing this module stays
+        # fast
+        from .cache import RecommendationCache,RECOMMENDATION_CACHE_SIZE,\
+            RECOMMENDATION_CACHE_TTL
+        from .neighbours import create_user_statistics
+        from .recommendations import TOP_N,get_movie_catalogue
+        from .snapshots import load_model_snapshot,save_model_snapshot
+        from .time_windows import SECONDS_PER_DAY,create_time_model
+        from .utility_matrix import adjust_ratings,\
+            create_compact_utility_matrix,create_utility_matrix,\
+            stream_utility_matrix
+
+        snapshot=None
+
+        # checks if there is a snapshot to load
+        if self.snapshot_directory is not None:
+
+            snapshot=load_model_snapshot\
+                (self.snapshot_directory,self.file_name,self.highest_rating,\
+                 self.use_sparse_utility_matrix)
+
+        if snapshot is not None:
+
+            utility_matrix,user_index_to_id,movie_index_to_id,\
+                user_id_to_index,movie_id_to_index,rating_shifts=snapshot
+
+        else:
+
+            # checks if only the ratings of a window of time are kept, or
+            # they are weighted by how recent they are
+            if self.use_time_model:
+
+                utility_matrix,user_index_to_id,movie_index_to_id,\
+                    user_id_to_index,movie_id_to_index,time_model=\
+                    create_time_model\
+                    (self.file_name,self.highest_rating,\
+                     None if self.time_window_days is None \
+                     else self.time_window_days*SECONDS_PER_DAY,\
+                     None if self.half_life_days is None \
+                     else self.half_life_days*SECONDS_PER_DAY,self.as_of)
+
+                self.time_model=time_model
+
+            # checks if the ratings file should be read in chunks
+            elif self.use_streaming_ingestion:
+
+                utility_matrix,user_index_to_id,movie_index_to_id,\
+                    user_id_to_index,movie_id_to_index=\
+                    stream_utility_matrix(self.file_name,self.highest_rating,\
+                                          return_reverse_maps=True)
+
+            else:
+
+                utility_matrix,user_index_to_id,movie_index_to_id,\
+                    user_id_to_index,movie_id_to_index=\
+                    create_utility_matrix\
+                    (self.file_name,self.highest_rating,\
+                     return_reverse_maps=True,\
+                     sparse_matrix=self.use_sparse_utility_matrix)
+
+            utility_matrix,rating_shifts=adjust_ratings\
+                (utility_matrix,self.highest_rating,return_shifts=True)
+
+            # saves the utility matrix so the next load can map it
+            if self.snapshot_directory is not None:
+
+                save_model_snapshot\
+                    (self.snapshot_directory,utility_matrix,user_index_to_id,\
+                     movie_index_to_id,self.highest_rating,self.file_name,\
+                     rating_shifts)
+
+        # checks if the utility matrix should be compact
+        if self.use_compact_utility_matrix:
+
+            utility_matrix=create_compact_utility_matrix\
+                (utility_matrix,self.highest_rating)
+
+        # checks if the neighbours are found from precomputed tables
+        if self.use_user_statistics:
+
+            self.user_statistics=create_user_statistics\
+                (utility_matrix,self.highest_rating,self.time_model)
+
+        if self.top_n is None:
+
+            self.top_n=TOP_N
+
+        self.recommendation_cache=RecommendationCache\
+            (RECOMMENDATION_CACHE_SIZE if self.cache_size is None \
+             else self.cache_size,\
+             RECOMMENDATION_CACHE_TTL if self.cache_ttl is None \
+             else self.cache_ttl)
+
+        # reads the movie catalogue now so the first query does not
+        get_movie_catalogue(self.movie_id_file_name)
+
+        self.user_index_to_id=user_index_to_id
+        self.movie_index_to_id=movie_index_to_id
+        self.user_id_to_index=user_id_to_index
+        self.movie_id_to_index=movie_id_to_index
+        self.rating_shifts=rating_shifts
+
+        # sets the utility matrix last, since it says the model is built
+        self.utility_matrix=utility_matrix
+
+    def has_user(self,user_id):
+        """ Returns whether user_id has ratings in the model
+
+        Args:
+            user_id: integer of the user id
+        """
+
+        self.load()
+
+        with self.lock.reading():
+
+            return user_id in self.user_id_to_index
+
+    def recommend\
+        (self,user_id,k_nearest=None,weight_on_taste=None,\
+         minimum_movies_both_users_have_to_watch=None,\
+         weigh_by_popularity=None,top_n=None,approximate=False,genres=None):
+        """ Returns the list of movie titles recommended to user_id, the
+        same as the example script gives for the same knobs. The exact
+        recommendations are cached. Raises KeyError if user_id has no
+        ratings
+
+        Args:
+            user_id: integer of the user id
+
+            k_nearest, weight_on_taste,
+            minimum_movies_both_users_have_to_watch, weigh_by_popularity,
+            top_n: same as for Recommender, None for its value
+
+            approximate: boolean which says whether the neighbours are
+            only looked for among a shortlist of users
+
+            genres: optional string of a genre or list of genres, one of
+            which every recommended movie has. Only the movies of those
+            genres are scored
+        """
+
+        from .cache import cached_recommendation_list
+        from .recommendations import create_recommendation_list,\
+            unseen_movie_scores
+
+        self.load()
+
+        with self.lock.reading():
+
+            if top_n is None:
+
+                top_n=self.top_n
+
+            if weigh_by_popularity is None:
+
+                weigh_by_popularity=self.weigh_by_popularity
+
+            genres,movie_indeces=self.genre_filter(genres)
+
+            # checks if the neighbours are looked for among all the users
+            if not approximate:
+
+                k_nearest,weight_on_taste,\
+                    minimum_movies_both_users_have_to_watch=\
+                    self.neighbour_knobs\
+                    (k_nearest,weight_on_taste,\
+                     minimum_movies_both_users_have_to_watch)
+
+                return cached_recommendation_list\
+                    (self.recommendation_cache,self.utility_matrix,\
+                     self.user_index_to_id,self.movie_index_to_id,user_id,\
+                     k_nearest,self.highest_rating,\
+                     minimum_movies_both_users_have_to_watch,\
+                     weight_on_taste,weigh_by_popularity,\
+                     self.movie_id_file_name,\
+                     self.user_id_to_index,top_n=top_n,\
+                     user_statistics=self.user_statistics,\
+                     time_model=self.time_model,genres=genres,\
+                     genre_index=self.genre_index,\
+                     model_version=self.model_version)
+
+            k_nearest_dict=self.approximate_neighbours\
+                (user_id,k_nearest,weight_on_taste,\
+                 minimum_movies_both_users_have_to_watch)
+
+            average_ratings=unseen_movie_scores\
+                (self.utility_matrix,self.user_index_to_id,k_nearest_dict,\
+                 user_id,self.highest_rating,weigh_by_popularity,\
+                 self.user_id_to_index,self.time_model,movie_indeces)[1]
+
+            return create_recommendation_list\
+                (average_ratings,self.movie_index_to_id,\
+                 self.movie_id_file_name,top_n=top_n)
+
+    def genre_filter(self,genres):
+        """ Returns [genres,movie_indeces], with genres as a sorted tuple
+        and the sorted array of the movie indeces of those genres, or
+        [None,None] if genres is None. The movies of every genre are
+        indexed the first time a genre is asked for
+
+        Args:
+            genres: string of a genre, list of genres or None
+        """
+
+        from .recommendations import create_genre_index,\
+            genre_movie_indeces,get_movie_catalogue
+
+        if genres is None:
+
+            return [None,None]
+
+        genres=tuple(sorted({genres} if isinstance(genres,str) \
+                            else set(genres)))
+
+        # checks again after taking the lock since another reader may
+        # have built the index while this one waited for it
+        if self.genre_index is None:
+
+            with self.index_lock:
+
+                if self.genre_index is None:
+
+                    self.genre_index=create_genre_index\
+                        (get_movie_catalogue(self.movie_id_file_name),\
+                         self.movie_index_to_id)
+
+        return [genres,genre_movie_indeces(self.genre_index,genres)]
+
+    def genres(self):
+        """ Returns the sorted list of the genres of the movies """
+
+        self.load()
+
+        with self.lock.reading():
+
+            self.genre_filter(())
+
+            return sorted(self.genre_index)
+
+    def neighbour_knobs\
+        (self,k_nearest,weight_on_taste,\
+         minimum_movies_both_users_have_to_watch):
+        """ Returns [k_nearest,weight_on_taste,
+        minimum_movies_both_users_have_to_watch] with the values of the
+        Recommender for the ones that are None
+        """
+
+        return [self.k_nearest if k_nearest is None else k_nearest,\
+                self.weight_on_taste if weight_on_taste is None \
+                else weight_on_taste,\
+                self.minimum_movies_both_users_have_to_watch \
+                if minimum_movies_both_users_have_to_watch is None \
+                else minimum_movies_both_users_have_to_watch]
+
+    def approximate_neighbours\
+        (self,user_id,k_nearest=None,weight_on_taste=None,\
+         minimum_movies_both_users_have_to_watch=None):
+        """ Returns the k_nearest_dict of approximate_k_nearest_neighbours
+        of user_id, indexing the users who saw every movie the first
+        time it is needed
+        """
+
+        from .neighbours import approximate_k_nearest_neighbours,\
+            create_co_rating_index
+
+        self.load()
+
+        with self.lock.reading():
+
+            # checks again after taking the lock since another reader may
+            # have built the index while this one waited for it
+            if self.co_rating_index is None:
+
+                with self.index_lock:
+
+                    if self.co_rating_index is None:
+
+                        self.co_rating_index=create_co_rating_index\
+                            (self.utility_matrix,self.highest_rating)
+
+            k_nearest,weight_on_taste,minimum_movies_both_users_have_to_watch=\
+                self.neighbour_knobs(k_nearest,weight_on_taste,\
+                                     minimum_movies_both_users_have_to_watch)
+
+            return approximate_k_nearest_neighbours\
+                (self.utility_matrix,self.user_index_to_id,\
+                 self.co_rating_index,k_nearest,user_id,self.highest_rating,\
+                 minimum_movies_both_users_have_to_watch,weight_on_taste,\
+                 self.user_id_to_index)[0]
+
+    def nearest_neighbours\
+        (self,user_id,k_nearest=None,weight_on_taste=None,\
+         minimum_movies_both_users_have_to_watch=None):
+        """ Returns a dictionary with the user id of each of the k
+        nearest neighbours of user_id as key and the value of their
+        objective function, the lower the closer, as value
+
+        Args:
+            user_id: integer of the user id
+
+            k_nearest, weight_on_taste,
+            minimum_movies_both_users_have_to_watch: same as for
+            Recommender, None for its value
+        """
+
+        from .neighbours import k_nearest_neighbours
+
+        self.load()
+
+        with self.lock.reading():
+
+            k_nearest,weight_on_taste,minimum_movies_both_users_have_to_watch=\
+                self.neighbour_knobs(k_nearest,weight_on_taste,\
+                                     minimum_movies_both_users_have_to_watch)
+
+            k_nearest_dict=k_nearest_neighbours\
+                (self.utility_matrix,self.user_index_to_id,k_nearest,user_id,\
+                 self.highest_rating,minimum_movies_both_users_have_to_watch,\
+                 weight_on_taste,self.user_id_to_index,self.user_statistics)[0]
+
+            return {self.user_index_to_id[str(int(user_index))]:float(value)\
+                    for user_index,value in k_nearest_dict.items()}
+
+    def top_rated_movies(self,user_id):
+        """ Returns the list of the top 10 rated movies of user_id
+
+        Args:
+            user_id: integer of the user id
+        """
+
+        from .recommendations import top_movies_rated_by_user_id
+
+        return top_movies_rated_by_user_id\
+            (user_id,self.file_name,self.movie_id_file_name)
+
+    def recommend_all(self,user_ids=None,number_of_workers=1,genres=None):
+        """ Returns a dictionary with the user id as key and the list of
+        movie titles recommended to them as value, computed by
+        recommend_batch, or by recommend_parallel with more than one
+        worker
+
+        Args:
+            user_ids: list of the user ids, None for every user
+
+            number_of_workers: integer of how many processes to use
+
+            genres: same as for recommend
+        """
+
+        from .recommendations import recommend_parallel
+
+        self.load()
+
+        with self.lock.reading():
+
+            if user_ids is None:
+
+                user_ids=list(self.user_index_to_id.values())
+
+            # checks if the users should be split between processes
+            if number_of_workers>1 and not self.weighs_ratings:
+
+                return dict(recommend_parallel\
+                    (self.utility_matrix,self.user_index_to_id,\
+                     self.movie_index_to_id,list(user_ids),self.k_nearest,\
+                     self.highest_rating,\
+                     self.minimum_movies_both_users_have_to_watch,\
+                     self.weight_on_taste,self.weigh_by_popularity,\
+                     self.movie_id_file_name,self.user_id_to_index,\
+                     number_of_workers=number_of_workers,top_n=self.top_n,\
+                     movie_indeces=self.genre_filter(genres)[1]))
+
+            return self.recommend_batch(user_ids,genres=genres)
+
+    @property
+    def weighs_ratings(self):
+        """ Returns whether the ratings are weighted by how recent they
+        are, which recommend_parallel does not do
+        """
+
+        return self.user_statistics is not None and \
+            'log_weights_by_user' in self.user_statistics
+
+    def recommend_batch\
+        (self,user_ids,k_nearest=None,weight_on_taste=None,\
+         minimum_movies_both_users_have_to_watch=None,\
+         weigh_by_popularity=None,top_n=None,genres=None):
+        """ Returns a dictionary with the user id as key and the list of
+        movie titles recommended to them as value, the same as recommend
+        gives. The lists that are not cached are computed together by
+        recommend_many so the overlaps and distances of all of them are
+        matrix products, of the sparse tables of create_user_statistics
+        if there are, and then cached. When the ratings are weighted by
+        how recent they are every user is scored on their own. Raises
+        KeyError if one of user_ids has no ratings
+
+        Args:
+            user_ids: list of the user ids
+
+            k_nearest, weight_on_taste,
+            minimum_movies_both_users_have_to_watch, weigh_by_popularity,
+            top_n: same as for Recommender, None for its value
+
+            genres: same as for recommend
+        """
+
+        from .cache import recommendation_list_key
+        from .recommendations import recommend_many
+
+        self.load()
+
+        with self.lock.reading():
+
+            if top_n is None:
+
+                top_n=self.top_n
+
+            if weigh_by_popularity is None:
+
+                weigh_by_popularity=self.weigh_by_popularity
+
+            k_nearest,weight_on_taste,minimum_movies_both_users_have_to_watch=\
+                self.neighbour_knobs(k_nearest,weight_on_taste,\
+                                     minimum_movies_both_users_have_to_watch)
+
+            genres,movie_indeces=self.genre_filter(genres)
+
+            keys={user_id:recommendation_list_key\
+                  (user_id,k_nearest,weight_on_taste,\
+                   minimum_movies_both_users_have_to_watch,\
+                   weigh_by_popularity,self.model_version,top_n,genres)\
+                  for user_id in user_ids}
+
+            # takes the lists that are cached
+            recommendations={}
+
+            for user_id,key in keys.items():
+
+                recommendation_list=self.recommendation_cache.get(key)
+
+                if recommendation_list is not None:
+
+                    recommendations[user_id]=recommendation_list
+
+            uncached_user_ids=[user_id for user_id in keys \
+                               if user_id not in recommendations]
+
+            # computes the others together and caches them. Their
+            # neighbours are not known, but the model_version in the key
+            # keeps them from being used after the model changed
+            if len(uncached_user_ids)>0:
+
+                for user_id,recommendation_list in recommend_many\
+                    (self.utility_matrix,self.user_index_to_id,\
+                     self.movie_index_to_id,uncached_user_ids,k_nearest,\
+                     self.highest_rating,\
+                     minimum_movies_both_users_have_to_watch,\
+                     weight_on_taste,weigh_by_popularity,\
+                     self.movie_id_file_name,self.user_id_to_index,\
+                     top_n=top_n,user_statistics=self.user_statistics,\
+                     movie_indeces=movie_indeces):
+
+                    self.recommendation_cache.put\
+                        (keys[user_id],recommendation_list)
+                    recommendations[user_id]=recommendation_list
+
+            return {user_id:recommendations[user_id] for user_id in keys}
+
+    def add_ratings(self,new_ratings):
+        """ Returns the list of the ids of the users whose neighbours can
+        change after adding new_ratings to the model, whose cached
+        results are dropped. A model with a time window or a half life
+        is moved on to the latest of the new ratings with
+        advance_time_window
+
+        Args:
+            new_ratings: DataFrame with the columns of the ratings file
+            (userId, movieId, rating, timestamp)
+        """
+
+        from .updates import add_ratings
+
+        self.load()
+
+        if self.use_compact_utility_matrix:
+
+            raise ValueError('ratings can not be added to a compact '\
+                             'utility matrix')
+
+        if self.time_model is not None:
+
+            return self.advance_time_window\
+                (max([self.time_model['as_of']]+\
+                     new_ratings[new_ratings.columns[3]].tolist()),\
+                 new_ratings)
+
+        with self.lock.writing():
+
+            self.utility_matrix,self.rating_shifts,affected_user_ids=\
+                add_ratings\
+                (self.utility_matrix,self.user_index_to_id,\
+                 self.movie_index_to_id,self.user_id_to_index,\
+                 self.movie_id_to_index,self.rating_shifts,new_ratings,\
+                 self.highest_rating,self.recommendation_cache,\
+                 self.user_statistics)
+
+            # indexes the users who saw every movie and the movies of
+            # every genre again when it is needed
+            self.co_rating_index=None
+            self.genre_index=None
+
+            # keeps the results cached before the change from being used
+            self.model_version+=1
+
+        return affected_user_ids
+
+    def advance_time_window(self,as_of,new_ratings=None):
+        """ Returns the list of the ids of the users whose neighbours can
+        change after moving the window of the model on to as_of, which
+        removes the ratings that fell out of it and adds the ones of
+        new_ratings that are in it, without building the model again.
+        With a half life every cached result is dropped, since every
+        score changes
+
+        Args:
+            as_of: integer of the timestamp the window ends at now
+
+            new_ratings: optional DataFrame with the columns of the
+            ratings file (userId, movieId, rating, timestamp)
+        """
+
+        from .time_windows import advance_time_window
+
+        self.load()
+
+        if self.time_model is None:
+
+            raise ValueError('the model has no time window or half life')
+
+        with self.lock.writing():
+
+            self.utility_matrix,self.rating_shifts,affected_user_ids=\
+                advance_time_window\
+                (self.utility_matrix,self.user_index_to_id,\
+                 self.movie_index_to_id,self.user_id_to_index,\
+                 self.movie_id_to_index,self.rating_shifts,self.time_model,\
+                 self.highest_rating,as_of,new_ratings,\
+                 self.recommendation_cache,self.user_statistics)
+
+            # indexes the users who saw every movie and the movies of
+            # every genre again when it is needed
+            self.co_rating_index=None
+            self.genre_index=None
+
+            # keeps the results cached before the change from being used
+            self.model_version+=1
+
+        return affected_user_ids
@@ -0,0 +1,205 @@
+"""
+Snapshots of the adjusted utility matrix
+A snapshot keeps the adjusted utility matrix and the ids of its users 
+and movies with the time, size and checksum of the ratings file, so the
+next run maps it into memory instead of building it again
+"""
+
+import numpy as np
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+from .utility_matrix import create_index_to_id,load_utility_matrix_arrays,\
+    reverse_index_map,save_utility_matrix_arrays
+
+# the version of the layout of a model snapshot
+SNAPSHOT_VERSION=3
+        
+def file_checksum(file_name):
+    """ Returns the sha256 checksum of the file file_name as a string
+    
+    Args:
+        file_name: string for the file name
+    """
+    
+    checksum=hashlib.sha256()
+    
+    # reads the file a block at a time
+    with open(file_name,'rb') as file:
+        
+        for block in iter(lambda: file.read(2**20),b''):
+            
+            checksum.update(block)
+            
+    return checksum.hexdigest()
+
+def save_model_snapshot\
+    (directory,utility_matrix,user_index_to_id,movie_index_to_id,\
+     highest_rating,file_name,rating_shifts):
+    """ Saves the adjusted utility_matrix, the ids of its users and movies
+    and the parameters it was built with to directory, so 
+    load_model_snapshot can map it back without reading file_name again.
+    The snapshot is written to a new directory next to directory, which
+    then replaces it, so the files of a snapshot another process has
+    mapped are never written over
+    
+    Args:
+        directory: string of the directory to save the snapshot in
+        
+        utility_matrix: array (dense or sparse) of adjusted preferences 
+        for users and movies
+        
+        user_index_to_id: dictionary that maps user_index to user_id
+        
+        movie_index_to_id: dictionary that maps movie_index to movie_id
+        
+        highest_rating: float which is the highest rating possible
+        
+        file_name: string for the ratings file the matrix was built from
+        
+        rating_shifts: array of how much the ratings of each user were
+        raised by adjust_ratings
+    """
+    
+    directory=os.path.abspath(directory)
+    
+    # writes the snapshot in a new directory next to directory
+    new_directory=tempfile.mkdtemp\
+        (prefix=os.path.basename(directory)+'.new.',\
+         dir=os.path.dirname(directory))
+    
+    try:
+        
+        write_model_snapshot\
+            (new_directory,utility_matrix,user_index_to_id,\
+             movie_index_to_id,highest_rating,file_name,rating_shifts)
+        
+    except BaseException:
+        
+        shutil.rmtree(new_directory,ignore_errors=True)
+        
+        raise
+    
+    # moves the old snapshot aside and puts the new one in its place.
+    # Its files are deleted, but stay readable by the processes which
+    # mapped them until they close them
+    old_directory=None
+    
+    if os.path.exists(directory):
+        
+        old_directory=tempfile.mkdtemp\
+            (prefix=os.path.basename(directory)+'.old.',\
+             dir=os.path.dirname(directory))
+        os.replace(directory,os.path.join(old_directory,'snapshot'))
+        
+    os.replace(new_directory,directory)
+    
+    if old_directory is not None:
+        
+        shutil.rmtree(old_directory,ignore_errors=True)
+
+def write_model_snapshot\
+    (directory,utility_matrix,user_index_to_id,movie_index_to_id,\
+     highest_rating,file_name,rating_shifts):
+    """ Writes the files of the snapshot save_model_snapshot saves to
+    the empty directory
+    
+    Args:
+        directory, utility_matrix, user_index_to_id, movie_index_to_id,
+        highest_rating, file_name, rating_shifts: same as for 
+        save_model_snapshot
+    """
+    
+    # saves the arrays of the matrix as .npy files
+    description=save_utility_matrix_arrays(utility_matrix,directory)
+    
+    # saves the ids ordered by their index
+    np.save(os.path.join(directory,'user_ids.npy'),\
+            np.array([user_index_to_id[str(index)]\
+                      for index in range(len(user_index_to_id))]))
+    np.save(os.path.join(directory,'movie_ids.npy'),\
+            np.array([movie_index_to_id[str(index)]\
+                      for index in range(len(movie_index_to_id))]))
+    
+    np.save(os.path.join(directory,'rating_shifts.npy'),rating_shifts)
+    
+    # takes the time and size before the checksum so a change while it
+    # is computed makes the next load compare the checksum
+    status=os.stat(file_name)
+    
+    # saves the parameters last so a snapshot that was not fully
+    # written is never loaded
+    with open(os.path.join(directory,'snapshot.json'),'w') as file:
+        
+        json.dump({'version':SNAPSHOT_VERSION,\
+                   'highest_rating':highest_rating,\
+                   'file_name':os.path.basename(file_name),\
+                   'source':[status.st_mtime_ns,status.st_size],\
+                   'checksum':file_checksum(file_name),\
+                   'sparse':description['sparse'],\
+                   'shape':list(description['shape'])},file)
+
+def load_model_snapshot\
+    (directory,file_name,highest_rating,sparse_matrix=False):
+    """ Returns [utility_matrix,user_index_to_id,movie_index_to_id,
+    user_id_to_index,movie_id_to_index,rating_shifts] from the snapshot 
+    saved in 
+    directory, with the arrays of utility_matrix memory-mapped read only.
+    Returns None if there is no snapshot or if it is stale, which is 
+    when file_name changed since it was saved or it was built with 
+    another highest_rating or matrix type
+    
+    Args:
+        directory: string of the directory the snapshot was saved in
+        
+        file_name: string for the ratings file the matrix is built from
+        
+        highest_rating: float which is the highest rating possible
+        
+        sparse_matrix: boolean which says whether the utility_matrix 
+        should be sparse
+    """
+    
+    # checks if there is a snapshot
+    if not os.path.exists(os.path.join(directory,'snapshot.json')):
+        
+        return None
+    
+    with open(os.path.join(directory,'snapshot.json')) as file:
+        
+        parameters=json.load(file)
+        
+    # checks if the snapshot was built the same way
+    if parameters['version']!=SNAPSHOT_VERSION or \
+        parameters['highest_rating']!=highest_rating or \
+        parameters['sparse']!=sparse_matrix:
+        
+        return None
+    
+    # checks if it was built from the same file, reading the whole file
+    # only when its time or size changed
+    status=os.stat(file_name)
+    
+    if parameters['source']!=[status.st_mtime_ns,status.st_size] and \
+        parameters['checksum']!=file_checksum(file_name):
+        
+        return None
+    
+    # maps the matrix
+    utility_matrix=load_utility_matrix_arrays\
+        ({'directory':directory,'sparse':parameters['sparse'],\
+          'shape':tuple(parameters['shape'])})
+    
+    # creates the dictionaries mapping indeces to id's
+    user_index_to_id=create_index_to_id\
+        (np.load(os.path.join(directory,'user_ids.npy')))
+    movie_index_to_id=create_index_to_id\
+        (np.load(os.path.join(directory,'movie_ids.npy')))
+    
+    return [utility_matrix,user_index_to_id,movie_index_to_id,\
+            reverse_index_map(user_index_to_id),\
+            reverse_index_map(movie_index_to_id),\
+            np.load(os.path.join(directory,'rating_shifts.npy'))]
@@ -0,0 +1,316 @@
+"""
+Keeping only the recent ratings in the model, or weighing them by how
+recent they are
+create_time_model builds the sparse utility matrix from the ratings of a
+window of time and keeps the timestamp of every rating, and with a half
+life the logarithm of the weight of every rating, which halves every 
+half life it gets older. advance_time_window moves the window on, 
+removing the ratings that fell out of it and adding the new ones, so 
+only the users with ratings that changed are adjusted again
+"""
+
+import pandas as pd
+import numpy as np
+import scipy.sparse as sp
+
+from .neighbours import update_user_statistics
+from .profiling import profiled_stage
+from .ratings_files import read_columns
+from .updates import add_ratings,remove_ratings
+from .utility_matrix import create_index_to_id,reverse_index_map
+
+# the number of seconds in a day, for windows and half lives in days
+SECONDS_PER_DAY=86400
+
+def set_rating_times(time_model,user_indeces,movie_indeces,timestamps,shape):
+    """ Puts the sparse CSR matrices 'timestamps' and 'log_weights' in
+    time_model, with the timestamp and the base 2 logarithm of the 
+    weight of every rating in the same places as the ratings of the 
+    sparse utility matrix of shape. Every user has rated every movie at
+    most once in the arrays
+    
+    Args:
+        time_model: dictionary from create_time_model
+        
+        user_indeces: array with the user index of every rating
+        
+        movie_indeces: array with the movie index of every rating
+        
+        timestamps: array with the timestamp of every rating
+        
+        shape: tuple of the number of users and movies
+    """
+    
+    time_model['timestamps']=sp.csr_matrix\
+        ((timestamps,(user_indeces,movie_indeces)),shape=shape)
+    time_model['timestamps'].sort_indices()
+    time_model['log_weights']=None
+    
+    # checks if the ratings are weighted by how recent they are
+    if time_model['half_life_seconds'] is not None:
+        
+        # weighs the ratings relative to the anchor, so moving the window
+        # on only changes log_weight_scale. Keeps the logarithms, since 
+        # with a short half life the weights of old ratings round to 0
+        log_weights=time_model['timestamps'].copy()
+        log_weights.data=(log_weights.data-time_model['anchor'])/\
+            time_model['half_life_seconds']
+        
+        time_model['log_weights']=log_weights
+
+def window_start(time_model):
+    """ Returns the oldest timestamp a rating in the window can have,
+    None if no rating is too old
+    
+    Args:
+        time_model: dictionary from create_time_model
+    """
+    
+    if time_model['window_seconds'] is None:
+        
+        return None
+    
+    return time_model['as_of']-time_model['window_seconds']
+
+@profiled_stage('create_time_model')
+def create_time_model\
+    (file_name,highest_rating,window_seconds=None,half_life_seconds=None,\
+     as_of=None):
+    """ Returns [utility_matrix,user_index_to_id,movie_index_to_id,
+    user_id_to_index,movie_id_to_index,time_model], where utility_matrix
+    is the sparse utility matrix create_utility_matrix gives from only
+    the ratings of file_name at most window_seconds older than as_of,
+    not adjusted yet.
+    
+    time_model is a dictionary with 'as_of', 'window_seconds' and
+    'half_life_seconds' and a sparse CSR matrix 'timestamps' with the
+    timestamp of every rating in the same places as utility_matrix. With
+    a half life, 'log_weights' has the base 2 logarithm of the weight of
+    every rating relative to 'anchor', the as_of the model was built 
+    for, and a rating weighs 2**(log_weights+'log_weight_scale'), which
+    is 1 for a rating given at as_of and halves every half_life_seconds
+    it is older. Without one 'log_weights' is None
+    
+    Args:
+        file_name: string for the ratings file name, with the timestamp
+        of every rating in its fourth column
+        
+        highest_rating: float which is the highest possible rating
+        a user can give a movie
+        
+        window_seconds: integer of how many seconds before as_of a
+        rating can be given to be kept, None to keep all of them
+        
+        half_life_seconds: float of how many seconds it takes the weight
+        of a rating to halve, None to weigh every rating the same
+        
+        as_of: integer of the timestamp the model is built for, None for
+        the time of the latest rating. Later ratings are left out
+    """
+    
+    # gets the user, movie, rating and timestamp columns of the file
+    user_column,movie_column,rating_column,timestamp_column=\
+        read_columns(file_name,[0,1,2,3]).values()
+    timestamps=np.asarray(timestamp_column,dtype=np.int64)
+    
+    if as_of is None:
+        
+        as_of=int(timestamps.max())
+    
+    time_model={'as_of':as_of,'window_seconds':window_seconds,\
+                'half_life_seconds':half_life_seconds,'anchor':as_of,\
+                'log_weight_scale':0.0}
+    
+    # keeps the ratings in the window
+    in_window=timestamps<=as_of
+    
+    if window_seconds is not None:
+        
+        in_window&=timestamps>=window_start(time_model)
+    
+    # factorizes the user and movie ids into contiguous index numbers
+    # in the order in which they first appear in the window
+    user_indeces,user_ids=pd.factorize\
+        (np.asarray(user_column)[in_window],sort=False)
+    movie_indeces,movie_ids=pd.factorize\
+        (np.asarray(movie_column)[in_window],sort=False)
+    ratings=np.asarray(rating_column,dtype=float)[in_window]
+    timestamps=timestamps[in_window]
+    
+    # keeps only the last rating if a user rated the same movie twice
+    last_rating=~pd.DataFrame({'user':user_indeces,\
+        'movie':movie_indeces}).duplicated(keep='last').to_numpy()
+    shape=(len(user_ids),len(movie_ids))
+    
+    utility_matrix=sp.csr_matrix\
+        ((ratings[last_rating],\
+        (user_indeces[last_rating],movie_indeces[last_rating])),\
+        shape=shape)
+    utility_matrix.sort_indices()
+    
+    set_rating_times(time_model,user_indeces[last_rating],\
+                     movie_indeces[last_rating],timestamps[last_rating],shape)
+    
+    user_index_to_id=create_index_to_id(user_ids)
+    movie_index_to_id=create_index_to_id(movie_ids)
+    
+    return [utility_matrix,user_index_to_id,movie_index_to_id,\
+            reverse_index_map(user_index_to_id),\
+            reverse_index_map(movie_index_to_id),time_model]
+
+@profiled_stage('advance_time_window')
+def advance_time_window\
+    (utility_matrix,user_index_to_id,movie_index_to_id,user_id_to_index,\
+     movie_id_to_index,rating_shifts,time_model,highest_rating,as_of,\
+     new_ratings=None,neighbour_cache=None,user_statistics=None):
+    """ Returns [utility_matrix,rating_shifts,affected_user_ids] after
+    moving the window of time_model on to as_of, which removes the
+    ratings that are now older than the window and adds the ones of
+    new_ratings that are in it. This gives the same ratings as
+    create_time_model for as_of with new_ratings appended to the file,
+    except that users and movies with no ratings left keep their index.
+    
+    Only the users with ratings that were removed or added are adjusted
+    again, and their rows of user_statistics built again. time_model is
+    updated in place. When the ratings are weighted every score changes,
+    so the whole neighbour_cache is cleared, otherwise only the entries
+    of affected_user_ids, the users whose k nearest neighbours can
+    change, are removed.
+    
+    Args:
+        utility_matrix: sparse array of adjusted preferences for users
+        and movies from create_time_model
+        
+        user_index_to_id: dictionary that maps user_index to user_id
+        
+        movie_index_to_id: dictionary that maps movie_index to movie_id
+        
+        user_id_to_index: dictionary that maps user_id to user_index
+        
+        movie_id_to_index: dictionary that maps movie_id to movie_index
+        
+        rating_shifts: array of how much the ratings of each user were
+        raised by adjust_ratings
+        
+        time_model: dictionary from create_time_model
+        
+        highest_rating: float which is the highest rating possible
+        
+        as_of: integer of the timestamp to move the window on to, which
+        can not be earlier than the one of time_model
+        
+        new_ratings: optional DataFrame with the columns of the ratings
+        file (userId, movieId, rating, timestamp) to add
+        
+        neighbour_cache: optional RecommendationCache, or dictionary of
+        cached results with the user_id, or a tuple starting with the
+        user_id, as key
+        
+        user_statistics: optional dictionary from create_user_statistics,
+        which is updated in place
+    """
+    
+    if as_of<time_model['as_of']:
+        
+        raise ValueError('the window can only be moved on, from %d to a '\
+                         'later time than %d'%(time_model['as_of'],as_of))
+    
+    time_model['as_of']=as_of
+    
+    # gets the ratings in the model and when they were given
+    timestamps=time_model['timestamps'].tocoo()
+    user_indeces=timestamps.row
+    movie_indeces=timestamps.col
+    timestamps=timestamps.data
+    
+    # finds the ratings that fell out of the window
+    expired=np.zeros(len(timestamps),dtype=bool)
+    
+    if time_model['window_seconds'] is not None:
+        
+        expired=timestamps<window_start(time_model)
+    
+    touched=[user_indeces[expired]]
+    affected_user_ids=[]
+    
+    # removes them from the utility matrix
+    if expired.any():
+        
+        utility_matrix,rating_shifts,affected_user_ids=remove_ratings\
+            (utility_matrix,user_index_to_id,rating_shifts,\
+             user_indeces[expired],movie_indeces[expired],highest_rating,\
+             neighbour_cache)
+        
+        user_indeces=user_indeces[~expired]
+        movie_indeces=movie_indeces[~expired]
+        timestamps=timestamps[~expired]
+    
+    # keeps the new ratings that are in the window
+    if new_ratings is not None:
+        
+        new_timestamps=new_ratings[new_ratings.columns[3]].to_numpy\
+            (dtype=np.int64)
+        in_window=new_timestamps<=as_of
+        
+        if time_model['window_seconds'] is not None:
+            
+            in_window&=new_timestamps>=window_start(time_model)
+        
+        new_ratings=new_ratings[in_window]
+        new_timestamps=new_timestamps[in_window]
+    
+    # adds them to the utility matrix
+    if new_ratings is not None and len(new_ratings)>0:
+        
+        utility_matrix,rating_shifts,added_user_ids=add_ratings\
+            (utility_matrix,user_index_to_id,movie_index_to_id,\
+             user_id_to_index,movie_id_to_index,rating_shifts,new_ratings,\
+             highest_rating,neighbour_cache)
+        
+        affected_user_ids=list(dict.fromkeys\
+            (affected_user_ids+added_user_ids))
+        
+        new_user_indeces=new_ratings[new_ratings.columns[0]].map\
+            (user_id_to_index).to_numpy()
+        touched.append(new_user_indeces)
+        
+        # puts the new ratings after the old ones and keeps the last
+        # rating if a movie was rated again
+        user_indeces=np.concatenate((user_indeces,new_user_indeces))
+        movie_indeces=np.concatenate((movie_indeces,\
+            new_ratings[new_ratings.columns[1]].map\
+            (movie_id_to_index).to_numpy()))
+        timestamps=np.concatenate((timestamps,new_timestamps))
+        
+        last_rating=~pd.DataFrame({'user':user_indeces,\
+            'movie':movie_indeces}).duplicated(keep='last').to_numpy()
+        user_indeces=user_indeces[last_rating]
+        movie_indeces=movie_indeces[last_rating]
+        timestamps=timestamps[last_rating]
+    
+    # checks if the ratings are weighted by how recent they are
+    if time_model['half_life_seconds'] is not None:
+        
+        time_model['log_weight_scale']=\
+            (time_model['anchor']-as_of)/time_model['half_life_seconds']
+    
+    set_rating_times(time_model,user_indeces,movie_indeces,timestamps,\
+                     utility_matrix.shape)
+    
+    touched=np.unique(np.concatenate(touched))
+    
+    # updates the precomputed tables of the users whose ratings changed,
+    # now that the weights are in the same places as their ratings
+    if user_statistics is not None and \
+        (len(touched)>0 or time_model['log_weights'] is not None):
+        
+        update_user_statistics\
+            (user_statistics,utility_matrix,touched,highest_rating)
+    
+    # removes every cached result when the weights changed
+    if time_model['half_life_seconds'] is not None and \
+        neighbour_cache is not None:
+        
+        neighbour_cache.clear()
+    
+    return [utility_matrix,rating_shifts,affected_user_ids]
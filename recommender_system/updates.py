@@ -0,0 +1,470 @@
+"""
+Adding new ratings to a built utility matrix, and removing old ones
+add_ratings gives the same utility matrix as building it again with the
+new ratings, adjusts only the users who have new ratings and drops the
+cached results of the users it affects. remove_ratings does the same 
+for ratings that are taken out
+"""
+
+import pandas as pd
+import numpy as np
+import scipy.sparse as sp
+import weakref
+
+from .cache import RecommendationCache
+from .neighbours import update_user_statistics
+
+# how many times bigger than the utility matrix the buffer of a dense 
+# utility matrix is made when add_ratings has to make it grow
+DENSE_GROWTH_FACTOR=1.25
+
+# the buffers made by grow_utility_matrix by their id, which the dense
+# utility matrices it returns are the top left corner of
+growable_buffers=weakref.WeakValueDictionary()
+        
+def users_sharing_movies\
+    (utility_matrix,user_indeces,highest_rating,ratings_by_movie=None):
+    """ Returns a sorted array of the indeces of the users who saw at 
+    least one movie that one of the users in user_indeces saw. Only the
+    rows of user_indeces and the columns of the movies they saw are read
+    
+    Args:
+        utility_matrix: array (dense or sparse) of preferences for users 
+        and movies
+        
+        user_indeces: array of user indeces
+        
+        highest_rating: float which is the highest rating possible
+        
+        ratings_by_movie: optional sparse CSC matrix with the ratings of
+        utility_matrix, such as the one of create_user_statistics, whose
+        columns are read instead
+    """
+    
+    user_indeces=np.asarray(user_indeces,dtype=np.int64)
+    
+    # gets the movies the users saw
+    if sp.issparse(utility_matrix):
+        
+        movie_indeces=np.unique(utility_matrix[user_indeces].indices)
+        
+    else:
+        
+        movie_indeces=np.flatnonzero((utility_matrix[user_indeces]>\
+                                      -16*highest_rating).any(axis=0))
+    
+    # checks if the users who saw each movie are a slice
+    if ratings_by_movie is not None:
+        
+        return np.unique(ratings_by_movie[:,movie_indeces].indices)
+    
+    # checks if the matrix is sparse
+    if sp.issparse(utility_matrix):
+        
+        # finds the stored ratings of those movies and their users
+        is_movie_seen=np.zeros(utility_matrix.shape[1],dtype=bool)
+        is_movie_seen[movie_indeces]=True
+        
+        rows=np.repeat(np.arange(utility_matrix.shape[0]),\
+                       np.diff(utility_matrix.indptr))
+        
+        return np.unique(rows[is_movie_seen[utility_matrix.indices]])
+    
+    return np.flatnonzero((utility_matrix[:,movie_indeces]>\
+                           -16*highest_rating).any(axis=1))
+
+def grow_utility_matrix(utility_matrix,shape,highest_rating):
+    """ Returns a writable dense utility matrix of shape with the 
+    preferences of utility_matrix in its top left corner and the new
+    rows and columns not seen. 
+    
+    When utility_matrix was returned by grow_utility_matrix and its 
+    buffer has room for shape, the buffer is kept, so utility_matrix is
+    changed in place by the writes to the matrix returned. Otherwise a 
+    buffer DENSE_GROWTH_FACTOR times bigger than shape is made, so a 
+    matrix that grows a few users or movies at a time is only copied 
+    now and then
+    
+    Args:
+        utility_matrix: dense array of preferences for users and movies
+        
+        shape: tuple of the number of users and movies, at least the 
+        ones of utility_matrix
+        
+        highest_rating: float which is the highest rating possible
+    """
+    
+    buffer=utility_matrix.base
+    
+    # checks if utility_matrix is the top left corner of a buffer with
+    # room for shape
+    is_growable=buffer is not None and \
+        growable_buffers.get(id(buffer)) is buffer and \
+        utility_matrix.ctypes.data==buffer.ctypes.data and \
+        utility_matrix.strides==buffer.strides and \
+        buffer.shape[0]>=shape[0] and buffer.shape[1]>=shape[1]
+    
+    if not is_growable:
+        
+        # makes a bigger buffer with every preference not seen
+        buffer=np.full((int(shape[0]*DENSE_GROWTH_FACTOR)+1,\
+                        int(shape[1]*DENSE_GROWTH_FACTOR)+1),\
+                       -20*highest_rating,dtype=utility_matrix.dtype)
+        buffer[:utility_matrix.shape[0],:utility_matrix.shape[1]]=\
+            utility_matrix
+        
+        growable_buffers[id(buffer)]=buffer
+        
+    return buffer[:shape[0],:shape[1]]
+
+def readjust_users(utility_matrix,rating_shifts,user_indeces,highest_rating):
+    """ Adjusts the rows of user_indeces in utility_matrix in place the 
+    same way as adjust_ratings, after their adjustment was undone, and 
+    puts how much their ratings were raised in rating_shifts. A user 
+    with no ratings left gets a shift of 0
+    
+    Args:
+        utility_matrix: array (dense or sparse) of preferences for users 
+        and movies
+        
+        rating_shifts: array of how much the ratings of each user were
+        raised by adjust_ratings
+        
+        user_indeces: array of user indeces
+        
+        highest_rating: float which is the highest rating possible
+    """
+    
+    # checks if the matrix is sparse
+    if sp.issparse(utility_matrix):
+        
+        for user_index in user_indeces.tolist():
+            
+            start=utility_matrix.indptr[user_index]
+            end=utility_matrix.indptr[user_index+1]
+            
+            # checks if the user has ratings left
+            if start==end:
+                
+                rating_shifts[user_index]=0
+                
+                continue
+            
+            highest_user_rating=np.amax(utility_matrix.data[start:end])
+            
+            utility_matrix.data[start:end]=utility_matrix.data[start:end]+\
+                highest_rating-highest_user_rating
+            rating_shifts[user_index]=highest_rating-highest_user_rating
+            
+    else:
+        
+        for user_index in user_indeces.tolist():
+            
+            seen=utility_matrix[user_index,:]>-16*highest_rating
+            
+            # checks if the user has ratings left
+            if not seen.any():
+                
+                rating_shifts[user_index]=0
+                
+                continue
+            
+            highest_user_rating=np.amax(utility_matrix[user_index,seen])
+            
+            utility_matrix[user_index,seen]=utility_matrix[user_index,seen]+\
+                highest_rating-highest_user_rating
+            rating_shifts[user_index]=highest_rating-highest_user_rating
+
+def invalidate_cached_users(neighbour_cache,affected_user_ids):
+    """ Removes the cached results of the users in affected_user_ids
+    
+    Args:
+        neighbour_cache: RecommendationCache, or dictionary of cached 
+        results with the user_id, or a tuple starting with the user_id, 
+        as key, or None
+        
+        affected_user_ids: list of user ids
+    """
+    
+    if isinstance(neighbour_cache,RecommendationCache):
+        
+        neighbour_cache.invalidate_users(affected_user_ids)
+        
+    elif neighbour_cache is not None:
+        
+        affected_user_ids_set=set(affected_user_ids)
+        
+        for key in list(neighbour_cache):
+            
+            if (key[0] if isinstance(key,tuple) else key) in \
+                affected_user_ids_set:
+                
+                del neighbour_cache[key]
+
+def add_ratings\
+    (utility_matrix,user_index_to_id,movie_index_to_id,user_id_to_index,\
+     movie_id_to_index,rating_shifts,new_ratings,highest_rating,\
+     neighbour_cache=None,user_statistics=None):
+    """ Returns [utility_matrix,rating_shifts,affected_user_ids] after 
+    adding the ratings in new_ratings to an adjusted utility_matrix, 
+    which gives the same utility_matrix as building it again from the 
+    ratings file with new_ratings appended to it.
+    
+    New users and movies are added to the dictionaries in place, in the
+    order they first appear in new_ratings. A new rating of a movie the 
+    user already rated replaces the old one. Only the users with new
+    ratings are adjusted again. affected_user_ids lists the users whose
+    k nearest neighbours can change, which are the users with new 
+    ratings and every user who shares a movie with them before or after
+    the change.
+    
+    A dense utility_matrix is grown in place when it was returned by 
+    add_ratings and its buffer has room for the new users and movies,
+    otherwise it is copied into a bigger buffer. A sparse one is never
+    changed.
+    
+    Args:
+        utility_matrix: array (dense or sparse) of adjusted preferences 
+        for users and movies
+        
+        user_index_to_id: dictionary that maps user_index to user_id
+        
+        movie_index_to_id: dictionary that maps movie_index to movie_id
+        
+        user_id_to_index: dictionary that maps user_id to user_index
+        
+        movie_id_to_index: dictionary that maps movie_id to movie_index
+        
+        rating_shifts: array of how much the ratings of each user were
+        raised by adjust_ratings
+        
+        new_ratings: DataFrame with the columns of the ratings file
+        (userId, movieId, rating, timestamp)
+        
+        highest_rating: float which is the highest rating possible
+        
+        neighbour_cache: optional RecommendationCache, or dictionary of 
+        cached results with the user_id, or a tuple starting with the 
+        user_id, as key. The entries of the affected users are removed
+        
+        user_statistics: optional dictionary from create_user_statistics,
+        which is updated in place
+    """
+    
+    # gets the ids of the new ratings
+    new_user_ids=new_ratings[new_ratings.columns[0]]
+    new_movie_ids=new_ratings[new_ratings.columns[1]]
+    
+    # adds the new users to the dictionaries
+    for user_id in pd.unique(new_user_ids).tolist():
+        
+        if user_id not in user_id_to_index:
+            
+            user_id_to_index[user_id]=len(user_index_to_id)
+            user_index_to_id[str(len(user_index_to_id))]=user_id
+            
+    # adds the new movies to the dictionaries
+    for movie_id in pd.unique(new_movie_ids).tolist():
+        
+        if movie_id not in movie_id_to_index:
+            
+            movie_id_to_index[movie_id]=len(movie_index_to_id)
+            movie_index_to_id[str(len(movie_index_to_id))]=movie_id
+            
+    # gets the indeces and ratings, keeping only the last rating if a 
+    # user rated the same movie twice
+    user_indeces=new_user_ids.map(user_id_to_index).to_numpy()
+    movie_indeces=new_movie_ids.map(movie_id_to_index).to_numpy()
+    ratings=new_ratings[new_ratings.columns[2]].to_numpy(dtype=float)
+    
+    last_rating=~pd.DataFrame({'user':user_indeces,\
+        'movie':movie_indeces}).duplicated(keep='last').to_numpy()
+    user_indeces=user_indeces[last_rating]
+    movie_indeces=movie_indeces[last_rating]
+    ratings=ratings[last_rating]
+    
+    # gets the users with new ratings
+    touched=np.unique(user_indeces)
+    
+    # finds the users who shared a movie with them before the change
+    old_touched=touched[touched<utility_matrix.shape[0]]
+    affected=set(users_sharing_movies\
+        (utility_matrix,old_touched,highest_rating,\
+         None if user_statistics is None \
+         else user_statistics['ratings_by_movie']).tolist())
+    
+    shape=(len(user_index_to_id),len(movie_index_to_id))
+    
+    # gives the new users no shift until they are adjusted
+    rating_shifts=np.concatenate\
+        ((rating_shifts,np.zeros(shape[0]-len(rating_shifts))))
+    
+    # checks if the matrix is sparse
+    if sp.issparse(utility_matrix):
+        
+        old=utility_matrix.tocoo()
+        
+        # undoes the adjustment of the users with new ratings
+        old_data=old.data.copy()
+        old_touched_rating=np.isin(old.row,touched)
+        old_data[old_touched_rating]=old_data[old_touched_rating]-\
+            rating_shifts[old.row[old_touched_rating]]
+            
+        # puts the old and new ratings together keeping the new one
+        # if a movie was rated again
+        rows=np.concatenate((old.row,user_indeces))
+        columns=np.concatenate((old.col,movie_indeces))
+        data=np.concatenate((old_data,ratings))
+        
+        last_rating=~pd.DataFrame({'user':rows,'movie':columns}).\
+            duplicated(keep='last').to_numpy()
+        
+        utility_matrix=sp.csr_matrix\
+            ((data[last_rating],(rows[last_rating],columns[last_rating])),\
+             shape=shape)
+        utility_matrix.sort_indices()
+        
+    else:
+        
+        # adds the rows of new users and the columns of new movies
+        # as not seen, in the spare room of the buffer when it has some
+        utility_matrix=grow_utility_matrix\
+            (utility_matrix,shape,highest_rating)
+        
+        # undoes the adjustment of the users with new ratings
+        for user_index in touched.tolist():
+            
+            seen=utility_matrix[user_index,:]>-16*highest_rating
+            utility_matrix[user_index,seen]=\
+                utility_matrix[user_index,seen]-rating_shifts[user_index]
+            
+        # adds the new ratings
+        utility_matrix[user_indeces,movie_indeces]=ratings
+        
+    # adjusts the users with new ratings again
+    readjust_users(utility_matrix,rating_shifts,touched,highest_rating)
+            
+    # updates the precomputed tables of the users with new ratings
+    if user_statistics is not None:
+        
+        update_user_statistics\
+            (user_statistics,utility_matrix,touched,highest_rating)
+    
+    # finds the users who share a movie with them after the change
+    affected.update(users_sharing_movies\
+        (utility_matrix,touched,highest_rating,\
+         None if user_statistics is None \
+         else user_statistics['ratings_by_movie']).tolist())
+    
+    affected_user_ids=[user_index_to_id[str(user_index)]\
+                       for user_index in sorted(affected)]
+    
+    # removes the cached results of the affected users
+    invalidate_cached_users(neighbour_cache,affected_user_ids)
+    
+    return [utility_matrix,rating_shifts,affected_user_ids]
+
+def remove_ratings\
+    (utility_matrix,user_index_to_id,rating_shifts,user_indeces,\
+     movie_indeces,highest_rating,neighbour_cache=None,\
+     user_statistics=None):
+    """ Returns [utility_matrix,rating_shifts,affected_user_ids] after 
+    removing the ratings user_indeces gave to movie_indeces from an 
+    adjusted utility_matrix. Ratings that are not in utility_matrix are
+    left out.
+    
+    The users and movies keep their indeces, even when nothing is left
+    in their row or column. Only the users who lost ratings are adjusted
+    again. affected_user_ids lists the users whose k nearest neighbours 
+    can change, which are the users who lost ratings and every user who
+    shared a movie with them before the change.
+    
+    Args:
+        utility_matrix: array (dense or sparse) of adjusted preferences 
+        for users and movies
+        
+        user_index_to_id: dictionary that maps user_index to user_id
+        
+        rating_shifts: array of how much the ratings of each user were
+        raised by adjust_ratings
+        
+        user_indeces: array with the user index of every rating to 
+        remove
+        
+        movie_indeces: array with the movie index of every rating to
+        remove
+        
+        highest_rating: float which is the highest rating possible
+        
+        neighbour_cache: optional RecommendationCache, or dictionary of 
+        cached results with the user_id, or a tuple starting with the 
+        user_id, as key. The entries of the affected users are removed
+        
+        user_statistics: optional dictionary from create_user_statistics,
+        which is updated in place
+    """
+    
+    user_indeces=np.asarray(user_indeces,dtype=np.int64)
+    movie_indeces=np.asarray(movie_indeces,dtype=np.int64)
+    
+    # gets the users who lose ratings
+    touched=np.unique(user_indeces)
+    
+    # finds the users who shared a movie with them before the change,
+    # which are all the users whose neighbours can change
+    affected_user_ids=[user_index_to_id[str(user_index)] for user_index in\
+        users_sharing_movies(utility_matrix,touched,highest_rating,\
+                             None if user_statistics is None \
+                             else user_statistics['ratings_by_movie']).\
+        tolist()]
+    
+    rating_shifts=rating_shifts.copy()
+    
+    # checks if the matrix is sparse
+    if sp.issparse(utility_matrix):
+        
+        old=utility_matrix.tocoo()
+        
+        # finds the stored ratings to remove
+        number_of_movies=utility_matrix.shape[1]
+        removed=np.isin(old.row.astype(np.int64)*number_of_movies+old.col,\
+                        user_indeces*number_of_movies+movie_indeces)
+        
+        # undoes the adjustment of the users who lose ratings
+        old_data=old.data.copy()
+        old_touched_rating=np.isin(old.row,touched)
+        old_data[old_touched_rating]=old_data[old_touched_rating]-\
+            rating_shifts[old.row[old_touched_rating]]
+        
+        utility_matrix=sp.csr_matrix\
+            ((old_data[~removed],(old.row[~removed],old.col[~removed])),\
+             shape=utility_matrix.shape)
+        utility_matrix.sort_indices()
+        
+    else:
+        
+        utility_matrix=utility_matrix.copy()
+        
+        # undoes the adjustment of the users who lose ratings
+        for user_index in touched.tolist():
+            
+            seen=utility_matrix[user_index,:]>-16*highest_rating
+            utility_matrix[user_index,seen]=\
+                utility_matrix[user_index,seen]-rating_shifts[user_index]
+            
+        # marks the removed ratings as not seen
+        utility_matrix[user_indeces,movie_indeces]=-20*highest_rating
+        
+    # adjusts the users who lost ratings again
+    readjust_users(utility_matrix,rating_shifts,touched,highest_rating)
+    
+    # updates the precomputed tables of the users who lost ratings
+    if user_statistics is not None:
+        
+        update_user_statistics\
+            (user_statistics,utility_matrix,touched,highest_rating)
+        
+    # removes the cached results of the affected users
+    invalidate_cached_users(neighbour_cache,affected_user_ids)
+    
+    return [utility_matrix,rating_shifts,affected_user_ids]
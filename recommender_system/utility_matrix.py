@@ -0,0 +1,562 @@
+"""
+Building the utility matrix of the recommender system
+The utility matrix has a row for every user and a column for every 
+movie with the ratings the users gave. It can be dense, a sparse CSR 
+matrix or a CompactUtilityMatrix, built from the ratings file at once 
+or a chunk at a time, and saved as .npy files that are mapped back 
+into memory
+"""
+
+import pandas as pd
+import numpy as np
+import scipy.sparse as sp
+import os
+import time
+
+from .profiling import profiled_stage
+from .ratings_files import RATINGS_DTYPES,STREAM_CHUNK_SIZE,read_columns,\
+    read_ratings_in_chunks
+
+# the number of bits set in every byte, for numpy without bitwise_count
+POPCOUNT_TABLE=np.array([bin(byte).count('1') for byte in range(256)],\
+                        dtype=np.uint8)
+
+# about how many bytes of memory reading a row of the ratings file takes
+# and how many bytes every rating takes until the sparse utility matrix 
+# is built
+STREAM_BYTES_PER_CSV_ROW=64
+STREAM_BYTES_PER_RATING=40
+
+@profiled_stage('create_utility_matrix')
+def create_utility_matrix\
+    (file_name,highest_rating,return_reverse_maps=False,sparse_matrix=False):
+    """ Returns an array utility_matrix with user id 
+    (represented as an index number) for the rows and movie id 
+    (represented as an index number) for the columns. 
+    Each cell in utility_matrix is a user rating of a specific movie. 
+    Also returns dictionaries user_index_to_id and movie_index_to_id
+    which map a user_index in the matrix to their id and a movie index
+    in the matrix to their id. Users and movies get their index in the
+    order in which they first appear in the file.
+    
+    The dense utility_matrix marks a movie a user has not seen with 
+    -20*highest_rating. The sparse utility_matrix is a scipy CSR matrix
+    (rows are users) which only stores the movies a user has seen, so 
+    an absent entry means the movie was not seen. Use .tocsc() on it
+    to get the same matrix with the movies as the compressed axis.
+        
+    Args:
+        file_name: string used to read the .csv file
+        
+        highest_rating: float which is the highest possible rating
+        a user can give a movie
+        
+        return_reverse_maps: boolean which says whether to also return
+        the dictionaries user_id_to_index and movie_id_to_index
+        
+        sparse_matrix: boolean which says whether to create a sparse
+        utility_matrix instead of a dense one
+    """
+    
+    # gets the user, movie and rating columns of the file
+    user_column,movie_column,rating_column=\
+        read_columns(file_name,[0,1,2]).values()
+    
+    # factorizes the user and movie ids into contiguous index numbers
+    # in the order in which they first appear in the file
+    user_indeces,user_ids=pd.factorize(np.asarray(user_column),sort=False)
+    movie_indeces,movie_ids=pd.factorize(np.asarray(movie_column),sort=False)
+        
+    # creates a dictionary mapping indeces to id's
+    user_index_to_id=create_index_to_id(user_ids)
+    movie_index_to_id=create_index_to_id(movie_ids)
+        
+    # gets the ratings as floats
+    ratings=np.asarray(rating_column,dtype=float)
+    
+    # checks if the utility matrix should be sparse
+    if sparse_matrix:
+        
+        # keeps only the last rating if a user rated the same movie twice
+        last_rating=~pd.DataFrame({'user':user_indeces,\
+            'movie':movie_indeces}).duplicated(keep='last').to_numpy()
+        
+        # builds the matrix with only the seen movies stored
+        utility_matrix=sp.csr_matrix\
+            ((ratings[last_rating],\
+            (user_indeces[last_rating],movie_indeces[last_rating])),\
+            shape=(len(user_ids),len(movie_ids)))
+        
+        # sorts the movie indeces of every user
+        utility_matrix.sort_indices()
+        
+    else:
+        
+        # initializes the utility matrix with all cells equal to 
+        # 20*highest_rating
+        utility_matrix=np.ones((len(user_ids),len(movie_ids)))*\
+            -(20*highest_rating)
+        
+        # scatters all the ratings into the utility matrix in one pass. 
+        # If a user rated the same movie twice the last rating is kept
+        utility_matrix[user_indeces,movie_indeces]=ratings
+    
+    # checks if the reverse maps were asked for
+    if return_reverse_maps:
+        
+        return [utility_matrix,user_index_to_id,movie_index_to_id,\
+                reverse_index_map(user_index_to_id),\
+                reverse_index_map(movie_index_to_id)]
+        
+    return [utility_matrix,user_index_to_id,movie_index_to_id]
+
+def create_index_to_id(ids):
+    """ Returns a dictionary index_to_id with the index as a string key
+    and the id as value
+    
+    Args:
+        ids: array of ids ordered by their index
+    """
+    
+    return {str(index):id_value for index,id_value in enumerate(ids.tolist())}
+
+def reverse_index_map(index_to_id):
+    """ Returns a dictionary id_to_index which maps an id to its
+    index (as an integer), so looking up an index does not need
+    a scan over index_to_id
+    
+    Args:
+        index_to_id: dictionary with the index as a string key and the
+        id as value
+    """
+    
+    return {id_value:int(index) for index,id_value in index_to_id.items()}
+
+def get_user_index(user_index_to_id,user_id,user_id_to_index=None):
+    """ Returns the integer user_index of user_id
+    
+    Args:
+        user_index_to_id: dictionary that maps user_index to user_id
+        
+        user_id: integer of the user id
+        
+        user_id_to_index: optional dictionary that maps user_id to 
+        user_index. If it is given the look up does not scan 
+        user_index_to_id
+    """
+    
+    # checks if the reverse map was given
+    if user_id_to_index is not None:
+        
+        return user_id_to_index[user_id]
+    
+    # gets the user index based on the id of the user
+    return int(list(user_index_to_id.keys())\
+        [list(user_index_to_id.values()).index(user_id)])
+
+def index_ids(ids,id_to_index):
+    """ Returns an int32 array with the index of every id in ids, after
+    giving the ids that are not in id_to_index the next indeces in the 
+    order in which they first appear
+    
+    Args:
+        ids: array of ids
+        
+        id_to_index: dictionary that maps an id to its index, which is 
+        updated in place
+    """
+    
+    codes,unique_ids=pd.factorize(ids,sort=False)
+    unique_ids=unique_ids.tolist()
+    
+    # adds the new ids
+    for id_value in unique_ids:
+        
+        if id_value not in id_to_index:
+            
+            id_to_index[id_value]=len(id_to_index)
+            
+    return np.array([id_to_index[id_value] for id_value in unique_ids],\
+                    dtype=np.int32)[codes]
+
+@profiled_stage('stream_utility_matrix')
+def stream_utility_matrix\
+    (file_name,highest_rating,return_reverse_maps=False,\
+     chunk_size=STREAM_CHUNK_SIZE,memory_budget=None,report_progress=False):
+    """ Returns the same sparse utility_matrix and dictionaries as 
+    create_utility_matrix with sparse_matrix=True, reading the ratings
+    file chunk_size rows at a time so it never has to fit in memory.
+    
+    Only the user and movie indeces and the rating of every row are 
+    kept, as int32, int32 and float32, while the id maps grow chunk by
+    chunk. If memory_budget is given the chunks are made small enough 
+    for it and a MemoryError is raised as soon as the ratings read so far
+    would not fit in it.
+    
+    Args:
+        file_name: string for the ratings file name
+        
+        highest_rating: float which is the highest possible rating
+        a user can give a movie
+        
+        return_reverse_maps: boolean which says whether to also return
+        the dictionaries user_id_to_index and movie_id_to_index
+        
+        chunk_size: integer of how many rows to read at a time
+        
+        memory_budget: optional integer of how many bytes the ingestion
+        can use
+        
+        report_progress: boolean which says whether to print the number
+        of rows read and the rows per second after every chunk
+    """
+    
+    # makes the chunks small enough to parse in a quarter of the budget
+    if memory_budget is not None:
+        
+        chunk_size=max(1,min(chunk_size,\
+            memory_budget//(4*STREAM_BYTES_PER_CSV_ROW)))
+    
+    user_id_to_index={}
+    movie_id_to_index={}
+    user_indeces=[]
+    movie_indeces=[]
+    ratings=[]
+    number_of_rows=0
+    
+    start_time=time.perf_counter()
+    
+    # reads the user, movie and rating columns chunk by chunk
+    for chunk in read_ratings_in_chunks\
+        (file_name,chunk_size,list(RATINGS_DTYPES)[:3]):
+        
+        user_indeces.append(index_ids\
+            (chunk[chunk.columns[0]].to_numpy(),user_id_to_index))
+        movie_indeces.append(index_ids\
+            (chunk[chunk.columns[1]].to_numpy(),movie_id_to_index))
+        ratings.append(chunk[chunk.columns[2]].to_numpy())
+        
+        number_of_rows+=len(chunk)
+        
+        # checks if the ratings read so far still fit in the budget
+        if memory_budget is not None and \
+            number_of_rows*STREAM_BYTES_PER_RATING+\
+            chunk_size*STREAM_BYTES_PER_CSV_ROW>memory_budget:
+            
+            raise MemoryError\
+                ('%s needs more than the memory_budget of %d bytes '\
+                 'after %d rows'%(file_name,memory_budget,number_of_rows))
+            
+        if report_progress:
+            
+            print('%d rows read, %.0f rows per second'%\
+                  (number_of_rows,\
+                   number_of_rows/(time.perf_counter()-start_time)))
+            
+    user_indeces=np.concatenate(user_indeces)
+    movie_indeces=np.concatenate(movie_indeces)
+    ratings=np.concatenate(ratings)
+    
+    shape=(len(user_id_to_index),len(movie_id_to_index))
+    
+    # sorts the ratings by user and movie, keeping the order of the file
+    # when a user rated the same movie twice
+    cells=user_indeces.astype(np.int64)*shape[1]+movie_indeces
+    order=np.argsort(cells,kind='stable')
+    cells=cells[order]
+    
+    # keeps only the last rating if a user rated the same movie twice
+    order=order[np.r_[cells[1:]!=cells[:-1],True]]
+    del cells
+    
+    # builds the matrix with only the seen movies stored
+    indptr=np.r_[0,np.cumsum(np.bincount\
+        (user_indeces[order],minlength=shape[0]))]
+    utility_matrix=sp.csr_matrix\
+        ((ratings[order].astype(float),movie_indeces[order],indptr),\
+         shape=shape)
+    
+    # creates the dictionaries mapping indeces to id's
+    user_index_to_id=create_index_to_id(np.array(list(user_id_to_index)))
+    movie_index_to_id=create_index_to_id(np.array(list(movie_id_to_index)))
+    
+    # checks if the reverse maps were asked for
+    if return_reverse_maps:
+        
+        return [utility_matrix,user_index_to_id,movie_index_to_id,\
+                user_id_to_index,movie_id_to_index]
+        
+    return [utility_matrix,user_index_to_id,movie_index_to_id]
+
+@profiled_stage('adjust_ratings')
+def adjust_ratings(utility_matrix,highest_rating,return_shifts=False):
+    """ Returns updated array called utility_matrix which adjusts the ratings
+    of a user up if they never rated any movie a 5. So for instance,
+    of the highest rating is 4 and the highest rating possible is 5,
+    then all ratings are raised by 1
+    
+    Args:
+        utility_matrix: an array (dense or sparse) of preferences 
+        for users and movies
+        
+        highest_rating: float which is the highest rating possible
+        
+        return_shifts: boolean which says whether to also return the 
+        array rating_shifts with how much the ratings of each user were
+        raised, which add_ratings needs to adjust a user again
+    """
+    
+    # checks if the matrix is sparse
+    if sp.issparse(utility_matrix):
+        
+        # gets the number of movies each user has seen
+        movies_seen=np.diff(utility_matrix.indptr)
+        
+        # finds the highest rating each user has given
+        highest_user_rating=np.zeros(utility_matrix.shape[0])
+        highest_user_rating[movies_seen>0]=np.maximum.reduceat\
+            (utility_matrix.data,utility_matrix.indptr[:-1][movies_seen>0])
+        
+        # adjusts the stored ratings of every user by adding the highest 
+        # rating possible and subtracting the highest the user has ranked
+        utility_matrix.data=utility_matrix.data+highest_rating-\
+            np.repeat(highest_user_rating,movies_seen)
+        
+    else:
+        
+        highest_user_rating=np.zeros(len(utility_matrix))
+        
+        # loops over all the rows in the matrix
+        for row in range(len(utility_matrix)):
+            
+            highest_user_rating[row]=np.amax(utility_matrix[row,:])
+            
+            # adjusts the ratings of the current row
+            # by adding the highest rating possible and subtracting the 
+            # highest the user has ranked
+            utility_matrix[row,:]=utility_matrix[row,:]+\
+                highest_rating-highest_user_rating[row]
+                
+        utility_matrix[utility_matrix<-16*highest_rating]=\
+            -20*highest_rating
+    
+    # checks if the shifts were asked for
+    if return_shifts:
+        
+        return [utility_matrix,highest_rating-highest_user_rating]
+                        
+    return utility_matrix
+
+def popcount(bits):
+    """ Returns an array with the number of bits set in every byte of 
+    the uint8 array bits
+    
+    Args:
+        bits: uint8 array
+    """
+    
+    # checks if numpy can count the bits itself
+    if hasattr(np,'bitwise_count'):
+        
+        return np.bitwise_count(bits)
+    
+    return POPCOUNT_TABLE[bits]
+
+class CompactUtilityMatrix:
+    """ Utility matrix that stores every seen rating times scale as an
+    int8, or as a float32 with scale 1, with 0 for the movies that were
+    not seen, and which movies every user saw as a bitmap with 8 movies 
+    to a byte. A dense float64 utility matrix takes 7 times the memory 
+    with int8 ratings and 1.8 times with float32 ratings.
+    
+    k_nearest_neighbours, the functions that score the unseen movies, 
+    recommend_many, recommend_parallel and the approximate neighbours
+    work on it directly. adjust_ratings, add_ratings and the snapshots 
+    need the dense or sparse matrix it was created from.
+    
+    Args:
+        ratings: int8 or float32 array with a row for every user and a 
+        column for every movie
+        
+        seen_bits: uint8 array from np.packbits of the seen movies of 
+        every user
+        
+        scale: integer the ratings were multiplied by
+    """
+    
+    def __init__(self,ratings,seen_bits,scale):
+        
+        self.ratings=ratings
+        self.seen_bits=seen_bits
+        self.scale=scale
+        self.shape=ratings.shape
+        
+        # counts the movies every user saw
+        self.seen_counts=popcount(seen_bits).sum(axis=1,dtype=np.int64)
+        
+    @property
+    def nbytes(self):
+        """ Returns the number of bytes of the ratings and the bitmap """
+        
+        return self.ratings.nbytes+self.seen_bits.nbytes
+    
+    def rows_seen(self,user_indeces,movie_indeces=None):
+        """ Returns a boolean matrix with the seen movies of the users in
+        user_indeces, only with the columns of movie_indeces if it is 
+        given
+        """
+        
+        # checks if only some columns are read from the bitmap
+        if movie_indeces is not None:
+            
+            movie_indeces=np.asarray(movie_indeces,dtype=np.int64)
+            
+            return (self.seen_bits[np.ix_(user_indeces,movie_indeces>>3)]>>\
+                    (7-(movie_indeces&7)).astype(np.uint8)&1).astype(bool)
+        
+        return np.unpackbits(self.seen_bits[user_indeces],axis=1,\
+                             count=self.shape[1]).astype(bool)
+    
+    def rows_ratings(self,user_indeces,movie_indeces=None):
+        """ Returns a float matrix with the ratings of the users in
+        user_indeces, with 0 for the movies they did not see, only with
+        the columns of movie_indeces if it is given
+        """
+        
+        if movie_indeces is not None:
+            
+            return self.ratings[np.ix_(user_indeces,movie_indeces)].\
+                astype(float)/self.scale
+        
+        return self.ratings[user_indeces].astype(float)/self.scale
+    
+    def user_ratings(self,user_index):
+        """ Returns an array with the movie indeces user_index saw and an
+        array with their ratings, like sparse_user_ratings
+        """
+        
+        movies=np.flatnonzero(self.rows_seen([user_index])[0])
+        
+        return [movies,\
+                self.ratings[user_index,movies].astype(float)/self.scale]
+
+def create_compact_utility_matrix(utility_matrix,highest_rating,scale=2):
+    """ Returns a CompactUtilityMatrix with the same ratings as 
+    utility_matrix. The ratings are stored times scale as int8 when that
+    makes them whole numbers up to 127, such as half star ratings with
+    scale 2, so the distances between users are exactly the same. They 
+    are stored as float32 otherwise, and a ValueError is raised if 
+    that would change them
+    
+    Args:
+        utility_matrix: array (dense or sparse) of preferences for users 
+        and movies
+        
+        highest_rating: float which is the highest rating possible
+        
+        scale: integer to multiply the ratings by
+    """
+    
+    # gets the users, movies and ratings of the seen movies
+    if sp.issparse(utility_matrix):
+        
+        coo=utility_matrix.tocoo()
+        rows,columns,values=coo.row,coo.col,coo.data
+        
+    else:
+        
+        rows,columns=np.nonzero(utility_matrix>-16*highest_rating)
+        values=utility_matrix[rows,columns]
+        
+    scaled=values*scale
+    
+    # checks if the ratings fit in int8 exactly
+    if len(values)==0 or (np.array_equal(scaled,np.rint(scaled)) and \
+                          np.abs(scaled).max()<=127):
+        
+        stored=np.rint(scaled).astype(np.int8)
+        
+    elif np.array_equal(values.astype(np.float32),values):
+        
+        stored=values.astype(np.float32)
+        scale=1
+        
+    else:
+        
+        raise ValueError('the ratings can not be stored exactly as int8 '\
+                         'or float32')
+        
+    ratings=np.zeros(utility_matrix.shape,dtype=stored.dtype)
+    ratings[rows,columns]=stored
+    
+    seen=np.zeros(utility_matrix.shape,dtype=bool)
+    seen[rows,columns]=True
+    
+    return CompactUtilityMatrix(ratings,np.packbits(seen,axis=1),scale)
+        
+def save_utility_matrix_arrays(utility_matrix,directory):
+    """ Saves the arrays of utility_matrix as .npy files in directory
+    and returns a dictionary describing them, which 
+    load_utility_matrix_arrays uses to map them back into memory
+    
+    Args:
+        utility_matrix: array (dense or sparse) of preferences for users 
+        and movies
+        
+        directory: string of the directory to save the files in
+    """
+    
+    # checks if the matrix is sparse or compact
+    if sp.issparse(utility_matrix):
+        
+        arrays={'data':utility_matrix.data,\
+                'indices':utility_matrix.indices,\
+                'indptr':utility_matrix.indptr}
+        
+    elif isinstance(utility_matrix,CompactUtilityMatrix):
+        
+        arrays={'ratings':utility_matrix.ratings,\
+                'seen_bits':utility_matrix.seen_bits}
+        
+    else:
+        
+        arrays={'dense':utility_matrix}
+        
+    # saves every array in its own file
+    for name in arrays:
+        
+        np.save(os.path.join(directory,name+'.npy'),arrays[name])
+        
+    return {'directory':directory,'sparse':sp.issparse(utility_matrix),\
+            'shape':utility_matrix.shape,\
+            'compact_scale':utility_matrix.scale if \
+            isinstance(utility_matrix,CompactUtilityMatrix) else None}
+
+def load_utility_matrix_arrays(description):
+    """ Returns the utility_matrix saved by save_utility_matrix_arrays
+    with its arrays memory-mapped read only, so every process that
+    loads it shares the same pages instead of its own copy
+    
+    Args:
+        description: dictionary returned by save_utility_matrix_arrays
+    """
+    
+    # maps the array called name from the directory
+    def load(name):
+        
+        return np.load(os.path.join(description['directory'],name+'.npy'),\
+                       mmap_mode='r')
+    
+    # checks if the matrix is sparse
+    if description['sparse']:
+        
+        return sp.csr_matrix((load('data'),load('indices'),load('indptr')),\
+                             shape=description['shape'],copy=False)
+    
+    # checks if the matrix is compact
+    if description.get('compact_scale') is not None:
+        
+        return CompactUtilityMatrix(load('ratings'),load('seen_bits'),\
+                                    description['compact_scale'])
+        
+    return load('dense')
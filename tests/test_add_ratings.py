@@ -0,0 +1,154 @@
+"""
+Tests that add_ratings gives the same model as building it again from the
+ratings file with the new ratings appended to it
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+import scipy.sparse as sp
+
+from recommender_system.neighbours import create_user_statistics
+from recommender_system.updates import add_ratings
+from recommender_system.utility_matrix import adjust_ratings,\
+    create_utility_matrix
+
+HIGHEST_RATING=5
+
+# the bundled ratings file the batches are taken from
+RATINGS_FILE_NAME=os.path.join(os.path.dirname(os.path.abspath(__file__)),\
+                               '..','ratings_list.csv')
+
+def build_model(file_name,sparse_matrix):
+    """ Returns [utility_matrix,user_index_to_id,movie_index_to_id,
+    user_id_to_index,movie_id_to_index,rating_shifts] built from
+    file_name the way the script builds it
+    """
+
+    utility_matrix,user_index_to_id,movie_index_to_id,\
+        user_id_to_index,movie_id_to_index=\
+        create_utility_matrix(file_name,HIGHEST_RATING,\
+                              return_reverse_maps=True,\
+                              sparse_matrix=sparse_matrix)
+
+    utility_matrix,rating_shifts=adjust_ratings\
+        (utility_matrix,HIGHEST_RATING,return_shifts=True)
+
+    return [utility_matrix,user_index_to_id,movie_index_to_id,\
+            user_id_to_index,movie_id_to_index,rating_shifts]
+
+def dense(matrix):
+    """ Returns matrix as a dense array """
+
+    return matrix.toarray() if sp.issparse(matrix) else np.asarray(matrix)
+
+@pytest.fixture(scope='module')
+def ratings():
+    """ Returns the bundled ratings split into the ratings the model is
+    built from and a list of batches to add to it
+    """
+
+    ratings=pd.read_csv(RATINGS_FILE_NAME)
+    columns=ratings.columns
+
+    # builds the model from most of the file and adds the rest in batches
+    initial_ratings=ratings.iloc[:90000]
+    batches=[ratings.iloc[start:start+4000] \
+             for start in range(90000,len(ratings),4000)]
+
+    # a batch with movies rated again, a new user, a new movie and a
+    # movie rated twice in the same batch
+    first_user_id,first_movie_id=initial_ratings.iloc[0,:2].tolist()
+    new_user_id=int(ratings[columns[0]].max())+1
+    new_movie_id=int(ratings[columns[1]].max())+1
+    timestamp=int(ratings[columns[3]].max())+1
+
+    batches.append(pd.DataFrame\
+        ([[first_user_id,first_movie_id,0.5,timestamp],\
+          [first_user_id,new_movie_id,4.0,timestamp],\
+          [new_user_id,first_movie_id,3.0,timestamp],\
+          [new_user_id,new_movie_id,2.0,timestamp],\
+          [new_user_id,new_movie_id,4.5,timestamp+1]],columns=columns))
+
+    return [initial_ratings,batches]
+
+@pytest.mark.parametrize('sparse_matrix',[False,True])
+def test_add_ratings_matches_rebuild(ratings,sparse_matrix,tmp_path):
+
+    initial_ratings,batches=ratings
+
+    initial_file_name=str(tmp_path/'initial_ratings.csv')
+    all_file_name=str(tmp_path/'all_ratings.csv')
+
+    initial_ratings.to_csv(initial_file_name,index=False)
+    pd.concat([initial_ratings]+batches).to_csv(all_file_name,index=False)
+
+    utility_matrix,user_index_to_id,movie_index_to_id,user_id_to_index,\
+        movie_id_to_index,rating_shifts=\
+        build_model(initial_file_name,sparse_matrix)
+    user_statistics=create_user_statistics(utility_matrix,HIGHEST_RATING)
+
+    # adds the batches one after the other
+    for batch in batches:
+
+        touched_user_ids=set(batch[batch.columns[0]].tolist())
+
+        utility_matrix,rating_shifts,affected_user_ids=add_ratings\
+            (utility_matrix,user_index_to_id,movie_index_to_id,\
+             user_id_to_index,movie_id_to_index,rating_shifts,batch,\
+             HIGHEST_RATING,user_statistics=user_statistics)
+
+        assert touched_user_ids<=set(affected_user_ids)
+
+    rebuilt_utility_matrix,rebuilt_user_index_to_id,\
+        rebuilt_movie_index_to_id,rebuilt_user_id_to_index,\
+        rebuilt_movie_id_to_index,rebuilt_rating_shifts=\
+        build_model(all_file_name,sparse_matrix)
+
+    assert sp.issparse(utility_matrix)==sparse_matrix
+    assert utility_matrix.shape==rebuilt_utility_matrix.shape
+
+    # the new users and movies get the indeces of a rebuild
+    assert user_index_to_id==rebuilt_user_index_to_id
+    assert movie_index_to_id==rebuilt_movie_index_to_id
+    assert user_id_to_index==rebuilt_user_id_to_index
+    assert movie_id_to_index==rebuilt_movie_id_to_index
+
+    np.testing.assert_allclose(rating_shifts,rebuilt_rating_shifts)
+    np.testing.assert_allclose(dense(utility_matrix),\
+                               dense(rebuilt_utility_matrix))
+
+    # the tables are the same as the ones built from the rebuild
+    rebuilt_user_statistics=create_user_statistics\
+        (rebuilt_utility_matrix,HIGHEST_RATING)
+
+    assert set(user_statistics)==set(rebuilt_user_statistics)
+
+    for name in rebuilt_user_statistics:
+
+        np.testing.assert_allclose(dense(user_statistics[name]),\
+                                   dense(rebuilt_user_statistics[name]))
+
+def test_add_ratings_invalidates_affected_users(ratings,tmp_path):
+
+    initial_ratings,batches=ratings
+
+    initial_file_name=str(tmp_path/'initial_ratings.csv')
+    initial_ratings.to_csv(initial_file_name,index=False)
+
+    utility_matrix,user_index_to_id,movie_index_to_id,user_id_to_index,\
+        movie_id_to_index,rating_shifts=build_model(initial_file_name,True)
+
+    # caches a result for every user
+    neighbour_cache={(user_id,10):None for user_id in user_id_to_index}
+
+    affected_user_ids=add_ratings\
+        (utility_matrix,user_index_to_id,movie_index_to_id,\
+         user_id_to_index,movie_id_to_index,rating_shifts,batches[-1],\
+         HIGHEST_RATING,neighbour_cache)[2]
+
+    # only the entries of the affected users are removed
+    assert {user_id for user_id,k_nearest in neighbour_cache}==\
+        set(user_id_to_index)-set(affected_user_ids)
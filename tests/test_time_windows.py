@@ -0,0 +1,62 @@
+"""
+Tests that weighing the ratings with a short half life gives a score to
+every movie the neighbours saw, even when the weights of the old ratings
+are too small for a float
+"""
+
+import os
+import warnings
+
+import numpy as np
+import pytest
+
+from recommender_system.neighbours import create_user_statistics,\
+    k_nearest_neighbours
+from recommender_system.recommendations import unseen_movie_scores
+from recommender_system.time_windows import SECONDS_PER_DAY,\
+    create_time_model
+from recommender_system.utility_matrix import adjust_ratings
+
+HIGHEST_RATING=5
+
+# the bundled ratings file the model is built from
+RATINGS_FILE_NAME=os.path.join(os.path.dirname(os.path.abspath(__file__)),\
+                               '..','ratings_list.csv')
+
+@pytest.mark.parametrize('half_life_days',[1,5])
+def test_short_half_life_gives_finite_scores(half_life_days):
+
+    utility_matrix,user_index_to_id,movie_index_to_id,user_id_to_index,\
+        movie_id_to_index,time_model=create_time_model\
+        (RATINGS_FILE_NAME,HIGHEST_RATING,\
+         half_life_seconds=half_life_days*SECONDS_PER_DAY)
+    utility_matrix=adjust_ratings(utility_matrix,HIGHEST_RATING)
+    user_statistics=create_user_statistics\
+        (utility_matrix,HIGHEST_RATING,time_model)
+
+    # the weights of the oldest ratings are too small for a float
+    assert np.exp2(time_model['log_weights'].data.min())==0
+
+    # every score is a number and nothing is divided by 0
+    with warnings.catch_warnings():
+
+        warnings.simplefilter('error')
+
+        for user_id in list(user_id_to_index)[:200]:
+
+            k_nearest_dict=k_nearest_neighbours\
+                (utility_matrix,user_index_to_id,10,user_id,HIGHEST_RATING,\
+                 1,0.2,user_id_to_index,user_statistics)[0]
+
+            # the users whose ratings weigh nothing still get neighbours
+            assert len(k_nearest_dict)==10
+
+            movies_user_id_hasnt_seen,average_ratings=unseen_movie_scores\
+                (utility_matrix,user_index_to_id,k_nearest_dict,user_id,\
+                 HIGHEST_RATING,True,user_id_to_index,time_model)
+
+            scores=np.array(list(average_ratings.values()))
+
+            assert len(average_ratings)==len(movies_user_id_hasnt_seen)
+            assert np.isfinite(scores).all()
+            assert ((scores>=0) & (scores<=1)).all()